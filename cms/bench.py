@@ -0,0 +1,502 @@
+"""
+benchmarks dos caminhos quentes do CMS.
+
+execute com: python -m cms.bench [nome ...]
+"""
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable
+
+from cms.models import (
+    Content,
+    Language,
+    MediaBlock,
+    MediaFile,
+    MediaType,
+    Post,
+    Site,
+    TextBlock,
+    User,
+    UserRole,
+)
+from cms.services.media_probe import MediaInfo
+
+
+@dataclass
+class BenchResult:
+    name: str
+    iterations: int
+    seconds: float
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.iterations / self.seconds if self.seconds else float("inf")
+
+    @property
+    def microseconds_per_op(self) -> float:
+        return self.seconds / self.iterations * 1_000_000
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<45} {self.iterations:>10} ops  {self.seconds:8.3f}s  "
+            f"{self.microseconds_per_op:8.3f} us/op  {self.ops_per_second:12,.0f} ops/s"
+        )
+
+
+def _timed(name: str, iterations: int, fn: Callable[[], object]) -> BenchResult:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return BenchResult(name, iterations, time.perf_counter() - start)
+
+
+def sample_post(blocks: int = 12) -> Post:
+    """post "popular" usado nos benchmarks, com texto e mídia intercalados."""
+    user = User("Bench", "Mark", "bench@cms.com", "bench", "Bench123", UserRole.ADMIN)
+    user.id = 1
+    site = Site(owner=user, name="Bench blog", description="Benchmarks")
+    site.id = 1
+    media = MediaFile(
+        uploader=user,
+        filename="img_01.jpg",
+        path=Path("static/images/img_01.jpg"),
+        media_type=MediaType.IMAGE,
+        site=site,
+        width=3000,
+        height=2000,
+        duration=None,
+    )
+    media.id = 1
+
+    body = []
+    for order in range(1, blocks + 1):
+        if order % 3 == 0:
+            body.append(MediaBlock(order=order, media=media, alt=f"Imagem {order}"))
+        else:
+            body.append(TextBlock(order=order, text=f"Parágrafo {order}. " * 40))
+
+    post = Post(poster=user, site=site)
+    post.id = 1
+    post.add_content(
+        "pt-br",
+        Content(
+            title="Post popular",
+            body=body,
+            language=Language(name="Português Brasileiro", code="pt-br"),
+        ),
+    )
+    return post
+
+
+def bench_post_render(iterations: int = 1_000_000) -> list[BenchResult]:
+    """renderiza o mesmo post popular muitas vezes, com e sem o cache do Content."""
+    content = sample_post().get_content_by_language()
+
+    def uncached_html():
+        return "\n".join(block.get_html() for block in content.body)
+
+    def uncached_blocks():
+        return tuple(block.get_content() for block in content.body)
+
+    # o caminho sem cache é bem mais lento, então roda com menos iterações
+    uncached_iterations = max(1, iterations // 10)
+    return [
+        _timed("post html (sem cache)", uncached_iterations, uncached_html),
+        _timed("post html (cache do Content)", iterations, content.render_body_html),
+        _timed("blocos do terminal (sem cache)", uncached_iterations, uncached_blocks),
+        _timed("blocos do terminal (cache do Content)", iterations, content.get_rendered_blocks),
+    ]
+
+
+def synthetic_posts(count: int, seed: int = 42) -> list[Post]:
+    """
+    posts com texto sintético: um vocabulário de 50 mil palavras em distribuição
+    de Zipf, como num texto real (poucas palavras muito comuns, muitas raras).
+    """
+    base = sample_post(blocks=1)
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(50_000)]
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    language = base.default_language
+
+    posts = []
+    for post_id in range(1, count + 1):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=40)
+        post = Post(poster=base.poster, site=base.site)
+        post.id = post_id
+        post.add_content(
+            language.code,
+            Content(
+                title=" ".join(words[:6]),
+                body=[TextBlock(order=1, text=" ".join(words[6:]))],
+                language=language,
+            ),
+        )
+        posts.append(post)
+    return posts
+
+
+def bench_search(posts: int = 200_000, iterations: int = 200) -> list[BenchResult]:
+    """consultas de termos comuns, raros e frases num índice com muitos posts."""
+    from cms.services.search import SearchIndex
+
+    corpus = synthetic_posts(posts)
+    index = SearchIndex()
+    start = time.perf_counter()
+    for post in corpus:
+        index.index_post(post)
+    results = [BenchResult(f"indexação ({posts} posts)", posts, time.perf_counter() - start)]
+
+    site = corpus[0].site
+    queries = {
+        "termo raro": "w40000",
+        "dois termos médios": "w900 w1500",
+        "frase": '"w10 w20"',
+        "termo comum": "w5",
+    }
+    for label, query in queries.items():
+        results.append(
+            _timed(f"busca: {label}", iterations, lambda q=query: index.search(site, q, limit=10))
+        )
+    return results
+
+
+def bench_autocomplete(posts: int = 500_000, iterations: int = 10_000) -> list[BenchResult]:
+    """
+    um usuário digitando letra a letra num site grande, com visualizações em
+    distribuição de Zipf, enquanto outros usuários leem posts.
+    """
+    from cms.events import EventManager
+    from cms.models import PostAction, PostAnalyticsEntry
+    from cms.repository import AnalyticsRepository
+    from cms.services.autocomplete import Autocomplete
+
+    corpus = synthetic_posts(posts)
+    site = corpus[0].site
+    events = EventManager()
+    analytics = AnalyticsRepository(events)
+    rng = random.Random(7)
+    popularity = list(accumulate(1 / rank for rank in range(1, posts + 1)))
+    analytics.log_many([
+        PostAnalyticsEntry(user=post.poster, site=site, post=post, action=PostAction.VIEW)
+        for post in rng.choices(corpus, cum_weights=popularity, k=posts)
+    ])
+
+    autocomplete = Autocomplete(analytics)
+    # as visualizações registradas daqui em diante chegam ao ranking pelo evento
+    events.subscribe("POST_VIEWS_COUNTED", autocomplete)
+    start = time.perf_counter()
+    autocomplete.update("POSTS_CREATED", posts=corpus)
+    autocomplete.refresh()
+    results = [BenchResult(f"indexação ({posts} posts)", posts, time.perf_counter() - start)]
+
+    title = corpus[0].get_content_by_language(corpus[0].default_language).title
+    prefixes = [title[:end] for end in range(1, 9)]
+    # a primeira consulta de cada prefixo monta o top-k guardado
+    for prefix in prefixes:
+        autocomplete.complete(site, prefix)
+
+    def typing():
+        for prefix in prefixes:
+            autocomplete.complete(site, prefix)
+
+    results.append(_timed(f"digitação: {len(prefixes)} teclas", iterations, typing))
+
+    viewed = rng.choices(corpus, k=iterations)
+
+    def view_and_type():
+        post = viewed.pop()
+        analytics.log(
+            PostAnalyticsEntry(user=post.poster, site=site, post=post, action=PostAction.VIEW)
+        )
+        autocomplete.complete(site, prefixes[0])
+
+    results.append(_timed("visualização + tecla", iterations, view_and_type))
+    return results
+
+
+def bench_corpus(posts: int = 100_000, iterations: int = 2_000) -> list[BenchResult]:
+    """palavras-chave por TF-IDF e busca de duplicatas por LSH num site grande."""
+    from cms.services.corpus import CorpusIndex
+
+    corpus = synthetic_posts(posts)
+    index = CorpusIndex()
+    start = time.perf_counter()
+    index.update("POSTS_CREATED", posts=corpus)
+    index.refresh()
+    results = [BenchResult(f"indexação ({posts} posts)", posts, time.perf_counter() - start)]
+
+    post = corpus[0]
+    language = post.default_language
+    results.append(
+        _timed("palavras-chave (TF-IDF)", iterations, lambda: index.keywords(post, language))
+    )
+    results.append(
+        _timed("duplicatas de um post (LSH)", iterations, lambda: index.near_duplicates(post))
+    )
+    results.append(_timed("duplicatas do site inteiro", 1, lambda: index.duplicate_pairs(post.site)))
+    return results
+
+
+def _atom(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _synthetic_image(rng: random.Random, width: int, height: int) -> tuple[str, bytes]:
+    kind = rng.choice(("png", "gif", "jpeg", "vp8", "vp8l", "vp8x"))
+    if kind == "png":
+        ihdr = b"IHDR" + struct.pack(">II5B", width, height, 8, 2, 0, 0, 0)
+        chunk = struct.pack(">I", len(ihdr) - 4) + ihdr + struct.pack(">I", zlib.crc32(ihdr))
+        return ".png", b"\x89PNG\r\n\x1a\n" + chunk + rng.randbytes(rng.randrange(64, 4096))
+    if kind == "gif":
+        screen = struct.pack("<HHBBB", width, height, 0xF7, 0, 0)
+        return ".gif", b"GIF89a" + screen + rng.randbytes(512)
+    if kind == "jpeg":
+        # APP0 (JFIF) e um APP1 (EXIF) de tamanho variável antes do SOF, como nas câmeras
+        app0 = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+        exif = rng.randbytes(rng.randrange(0, 60_000))
+        app1 = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+        sof = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, height, width, 3) + bytes(9)
+        return ".jpg", b"\xff\xd8" + app0 + app1 + sof + rng.randbytes(1024) + b"\xff\xd9"
+
+    if kind == "vp8":
+        frame = b"\x10\x02\x00\x9d\x01\x2a" + struct.pack("<HH", width, height)
+        chunk = b"VP8 " + struct.pack("<I", len(frame)) + frame
+    elif kind == "vp8l":
+        bits = (width - 1) | ((height - 1) << 14)
+        chunk = b"VP8L" + struct.pack("<I", 5) + b"\x2f" + bits.to_bytes(4, "little")
+    else:
+        canvas = (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little")
+        chunk = b"VP8X" + struct.pack("<I", 10) + bytes(4) + canvas
+    return ".webp", b"RIFF" + struct.pack("<I", 4 + len(chunk)) + b"WEBP" + chunk
+
+
+def _synthetic_video(
+    rng: random.Random, width: int, height: int, seconds: float
+) -> tuple[str, bytes, bytes]:
+    """extensão, ftyp e moov de um vídeo; os .mov usam o mvhd versão 1 (64 bits)."""
+    timescale = rng.choice((600, 1000, 90000))
+    units = round(seconds * timescale)
+    if rng.random() < 0.3:
+        suffix = ".mov"
+        ftyp = _atom(b"ftyp", b"qt  " + bytes(4) + b"qt  ")
+        mvhd = _atom(b"mvhd", b"\x01" + bytes(19) + struct.pack(">IQ", timescale, units) + bytes(80))
+    else:
+        suffix = ".mp4"
+        ftyp = _atom(b"ftyp", b"isom" + bytes(4) + b"isomiso2mp41")
+        mvhd = _atom(b"mvhd", bytes(12) + struct.pack(">II", timescale, units) + bytes(80))
+
+    def trak(w: int, h: int) -> bytes:
+        tkhd = _atom(b"tkhd", bytes(76) + struct.pack(">II", w << 16, h << 16))
+        return _atom(b"trak", tkhd + _atom(b"mdia", rng.randbytes(rng.randrange(256, 8192))))
+
+    # trilha de áudio (0x0) antes da de vídeo, como em muitos arquivos reais
+    return suffix, ftyp, _atom(b"moov", mvhd + trak(0, 0) + trak(width, height))
+
+
+def synthetic_media(
+    directory: Path,
+    count: int,
+    seed: int = 42,
+    video_bytes: tuple[int, int] = (1 << 20, 64 << 20),
+) -> list[tuple[Path, MediaInfo]]:
+    """
+    grava `count` mídias com cabeçalhos válidos e devolve o que o probe deve
+    ler de cada uma. os vídeos têm o mdat (esparso, com tamanho na faixa
+    `video_bytes`) antes do moov, o pior caso para quem lê o arquivo do começo
+    ao fim.
+    """
+    rng = random.Random(seed)
+    expected = []
+    for index in range(count):
+        width, height = rng.randrange(16, 8000), rng.randrange(16, 8000)
+        if rng.random() < 0.2:
+            seconds = rng.randrange(1_000, 7_200_000) / 1000
+            suffix, ftyp, moov = _synthetic_video(rng, width, height, seconds)
+            mdat_size = rng.randrange(*video_bytes)
+            path = directory / f"video_{index:06d}{suffix}"
+            with open(path, "wb") as file:
+                file.write(ftyp + struct.pack(">I4s", 8 + mdat_size, b"mdat"))
+                file.seek(mdat_size, 1)
+                file.write(moov)
+            expected.append((path, MediaInfo(suffix[1:], width, height, seconds)))
+        else:
+            suffix, data = _synthetic_image(rng, width, height)
+            path = directory / f"img_{index:06d}{suffix}"
+            path.write_bytes(data)
+            kind = "jpeg" if suffix == ".jpg" else suffix[1:]
+            expected.append((path, MediaInfo(kind, width, height)))
+    return expected
+
+
+def bench_media_probe(files: int = 20_000, iterations: int = 10_000) -> list[BenchResult]:
+    """leitura de cabeçalhos das mídias de static/ e de um acervo sintético grande."""
+    from cms.services.media_probe import probe_media
+
+    results = []
+    for path in sorted(Path("static").rglob("*")):
+        if path.is_file():
+            name = f"probe {path.name} ({path.stat().st_size:,} bytes)"
+            results.append(_timed(name, iterations, lambda p=path: probe_media(p)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [path for path, _ in synthetic_media(Path(directory), files)]
+        start = time.perf_counter()
+        for path in paths:
+            probe_media(path)
+        elapsed = time.perf_counter() - start
+    results.append(BenchResult(f"probe acervo sintético ({files} arquivos)", files, elapsed))
+    return results
+
+
+def bench_media_import(files: int = 20_000) -> list[BenchResult]:
+    """
+    importação em lote de uma árvore de mídias (probe, hash e cópia para o
+    armazenamento) e uma segunda importação, para outro site, pelo diário.
+    """
+    from cms.context import AppContext
+    from cms.services.media_import import BulkMediaImporter
+    from cms.services.media_store import MediaStore
+
+    context = AppContext()
+    owner = User("Bench", "Mark", "bench@cms.com", "bench", "Bench123", UserRole.ADMIN)
+    context.user_repo.add_user(owner)
+    sites = []
+    for name in ("Bench import", "Bench retomada"):
+        site = Site(owner=owner, name=name, description="Benchmarks")
+        context.site_repo.add_site(site)
+        sites.append(site)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory) / "acervo"
+        root.mkdir()
+        # subpastas de 1000 arquivos, como num acervo organizado por data
+        for start in range(0, files, 1000):
+            folder = root / f"{start // 1000:04d}"
+            folder.mkdir()
+            count = min(1000, files - start)
+            synthetic_media(folder, count, seed=start, video_bytes=(64 << 10, 1 << 20))
+
+        journal = Path(directory) / "diario.ndjson"
+        store = MediaStore(Path(directory) / "blobs")
+        importer = BulkMediaImporter(context, store=store)
+        for label, site in zip(("importação", "retomada pelo diário"), sites):
+            start = time.perf_counter()
+            summary = importer.import_tree(root, site, owner, journal)
+            elapsed = time.perf_counter() - start
+            results.append(BenchResult(f"{label} ({summary.imported} arquivos)", files, elapsed))
+    return results
+
+
+def bench_media_range(video_mb: int = 512, iterations: int = 2_000) -> list[BenchResult]:
+    """
+    saltos aleatórios num vídeo grande por requisições Range de 1 MiB, numa
+    conexão keep-alive por loopback, e a mídia inteira uma vez.
+    """
+    import asyncio
+
+    from cms.web.http_server import HttpServer, Request, Response
+    from cms.web.media_streaming import MediaStreamer
+
+    owner = User("Bench", "Mark", "bench@cms.com", "bench", "Bench123", UserRole.ADMIN)
+    site = Site(owner=owner, name="Bench mídia", description="Benchmarks")
+    chunk = 1 << 20
+
+    class _MediaServer(HttpServer):
+        def __init__(self, media: MediaFile):
+            super().__init__(port=0)
+            self.media = media
+            self.streamer = MediaStreamer()
+
+        async def dispatch(self, request: Request) -> Response:
+            return self.streamer.serve(request, self.media)
+
+    async def fetch(reader, writer, range_header: str | None) -> int:
+        extra = f"Range: {range_header}\r\n" if range_header else ""
+        writer.write(f"GET /media HTTP/1.1\r\nHost: bench\r\n{extra}\r\n".encode())
+        length = 0
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        return length
+
+    async def run(path: Path) -> list[BenchResult]:
+        media = MediaFile(
+            uploader=owner,
+            filename="bench.mp4",
+            path=path,
+            media_type=MediaType.VIDEO,
+            site=site,
+            width=None,
+            height=None,
+            duration=None,
+        )
+        media.id = 1
+        server = _MediaServer(media)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        rng = random.Random(42)
+        size = video_mb << 20
+        try:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                offset = rng.randrange(0, size - chunk)
+                await fetch(reader, writer, f"bytes={offset}-{offset + chunk - 1}")
+            seeks = time.perf_counter() - start
+
+            start = time.perf_counter()
+            await fetch(reader, writer, None)
+            whole = time.perf_counter() - start
+        finally:
+            writer.close()
+            await server.close()
+        return [
+            BenchResult(f"Range de 1 MiB em vídeo de {video_mb} MiB", iterations, seeks),
+            BenchResult(f"vídeo inteiro ({video_mb} MiB)", 1, whole),
+        ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "bench.mp4"
+        with open(path, "wb") as file:
+            # arquivo esparso: o conteúdo não importa, só o caminho de envio
+            file.truncate(video_mb << 20)
+        return asyncio.run(run(path))
+
+
+BENCHMARKS: dict[str, Callable[[], list[BenchResult]]] = {
+    "post_render": bench_post_render,
+    "search": bench_search,
+    "autocomplete": bench_autocomplete,
+    "corpus": bench_corpus,
+    "media_probe": bench_media_probe,
+    "media_import": bench_media_import,
+    "media_range": bench_media_range,
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    names = (argv if argv is not None else sys.argv[1:]) or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Benchmarks desconhecidos: {', '.join(unknown)}")
+        print(f"Disponíveis: {', '.join(BENCHMARKS)}")
+        return 1
+
+    for name in names:
+        print(f"== {name}")
+        for result in BENCHMARKS[name]():
+            print(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,731 @@
+"""
+CLI headless do CMS, para operações e rotinas agendadas.
+
+não monta o menu do terminal nem carrega os dados de exemplo (a não ser com
+--populate). lê e escreve NDJSON em streaming e chama direto os repositórios e
+serviços. a vazão de cada comando vai para stderr, deixando stdout para os dados.
+
+os dados vivem em memória: --load carrega um conjunto de dados exportado antes
+do comando e --save grava o resultado no final (.gz comprime com gzip).
+
+execute com: python -m cms <comando> ...   (ou: python main.py <comando> ...)
+
+exemplos:
+    python -m cms --populate export posts > posts.ndjson
+    python -m cms --populate export dataset -o dados.ndjson.gz
+    python -m cms --load dados.ndjson.gz --save dados.ndjson.gz import posts novos.ndjson
+    python -m cms --populate report sites
+    python -m cms --populate report seo --site meu-blog
+    python -m cms --populate share --endpoint http://127.0.0.1:8090 --queue fila.ndjson
+    python -m cms --load dados.ndjson --save dados.ndjson import-media acervo/ --site meu-blog
+    python -m cms --populate translate --to en-us --glossary glossario.json --memory tm.ndjson
+    python -m cms --load dados.ndjson.gz gc-media --keep outro.ndjson.gz --delete
+    python -m cms bench post_render
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import batched
+from typing import Iterable, Iterator
+
+from cms.context import AppContext
+from cms.exceptions import CMSException, LanguageError, ValidationError
+from cms.models import (
+    AnalyticsEntry,
+    Comment,
+    Language,
+    PostAction,
+    PostAnalyticsEntry,
+    SiteAction,
+    SiteAnalyticsEntry,
+)
+from cms.services.dataset_io import (
+    DatasetImporter,
+    comment_to_dict,
+    dataset_content_hashes,
+    entry_to_dict,
+    iter_dataset,
+    post_to_dict,
+    save_dataset,
+)
+from cms.services.media_import import BulkMediaImporter
+from cms.services.media_store import GC_MIN_AGE
+from cms.services.storage_quota import SiteReconciliation
+from cms.services.translation import (
+    DEFAULT_BATCH_SIZE as TRANSLATION_BATCH_SIZE,
+    BatchTranslator,
+    DictionaryTranslationEngine,
+    TranslationMemory,
+)
+from cms.services.ndjson import STDIO, open_text, read_ndjson, write_ndjson
+from cms.services.notification_adapter import SilentNotificationAdapter
+from cms.services.post_builder import PostSpec
+from cms.services.post_management_facade import PostManagementFacade
+from cms.services.seo_analyzier import SeoAuditor
+from cms.services.social_media import SocialMedia
+from cms.services.social_publisher import HttpSocialClient, ShareQueue, SocialPublisher
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class _Throughput:
+    """conta registros e, ao sair, reporta a vazão em stderr."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+
+    def __enter__(self) -> "_Throughput":
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return
+        elapsed = time.perf_counter() - self.__start
+        rate = self.count / elapsed if elapsed else 0.0
+        print(
+            f"{self.label}: {self.count} registros em {elapsed:.2f}s ({rate:,.0f}/s)",
+            file=sys.stderr,
+        )
+
+
+# ---- importação ----
+
+
+def _parse_datetime(record: dict, key: str) -> datetime | None:
+    value = record.get(key)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Campo '{key}' deve estar no formato ISO 8601.")
+
+
+def _required_id(record: dict, key: str) -> int:
+    value = record.get(key)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValidationError(f"Campo '{key}' deve ser um inteiro.")
+    return value
+
+
+def _line_error(line_number: int, error: CMSException) -> ValidationError:
+    return ValidationError(f"Linha {line_number}: {error}")
+
+
+def _post_specs(context: AppContext, records: Iterable[tuple[int, dict]]) -> Iterator[PostSpec]:
+    for line_number, record in records:
+        try:
+            site = context.site_repo.get_site(_required_id(record, "site_id"))
+            poster = context.user_repo.get_user(_required_id(record, "poster_id"))
+            yield PostSpec.from_dict(site, poster, record)
+        except CMSException as e:
+            raise _line_error(line_number, e)
+
+
+def _comments(context: AppContext, records: Iterable[tuple[int, dict]]) -> Iterator[Comment]:
+    for line_number, record in records:
+        try:
+            body = record.get("body")
+            if not isinstance(body, str) or not body.strip():
+                raise ValidationError("Comentário não pode estar vazio.")
+            comment = Comment(
+                post=context.post_repo.get_post(_required_id(record, "post_id")),
+                commenter=context.user_repo.get_user(_required_id(record, "commenter_id")),
+                body=body.strip(),
+            )
+            created_at = _parse_datetime(record, "created_at")
+            if created_at:
+                comment.created_at = created_at
+            yield comment
+        except CMSException as e:
+            raise _line_error(line_number, e)
+
+
+def _entries(context: AppContext, records: Iterable[tuple[int, dict]]) -> Iterator[AnalyticsEntry]:
+    for line_number, record in records:
+        try:
+            user = context.user_repo.get_user(_required_id(record, "user_id"))
+            action = str(record.get("action", "")).upper()
+            metadata = record.get("metadata") or {}
+            if not isinstance(metadata, dict):
+                raise ValidationError("Campo 'metadata' deve ser um objeto.")
+            metadata = {str(key): str(value) for key, value in metadata.items()}
+
+            if "post_id" in record:
+                if action not in PostAction.__members__:
+                    raise ValidationError(f"Ação de post '{action}' não suportada.")
+                post = context.post_repo.get_post(_required_id(record, "post_id"))
+                entry = PostAnalyticsEntry(
+                    user=user, site=post.site, post=post,
+                    action=PostAction[action], metadata=metadata,
+                )
+            else:
+                if action not in SiteAction.__members__:
+                    raise ValidationError(f"Ação de site '{action}' não suportada.")
+                site = context.site_repo.get_site(_required_id(record, "site_id"))
+                entry = SiteAnalyticsEntry(
+                    user=user, site=site, action=SiteAction[action], metadata=metadata
+                )
+
+            created_at = _parse_datetime(record, "created_at")
+            if created_at:
+                entry.created_at = created_at
+            yield entry
+        except CMSException as e:
+            raise _line_error(line_number, e)
+
+
+def import_posts(context: AppContext, records, batch_size: int, meter: _Throughput):
+    facade = PostManagementFacade(context, SilentNotificationAdapter())
+    for batch in batched(_post_specs(context, records), batch_size):
+        meter.count += len(facade.create_posts(list(batch), batch_size))
+
+
+def import_comments(context: AppContext, records, batch_size: int, meter: _Throughput):
+    for batch in batched(_comments(context, records), batch_size):
+        ids = context.comment_repo.add_comments(list(batch))
+        context.analytics_repo.log_many(
+            [
+                PostAnalyticsEntry(
+                    user=comment.commenter,
+                    site=comment.post.site,
+                    post=comment.post,
+                    action=PostAction.COMMENT,
+                    metadata={"comment_id": str(comment_id)},
+                )
+                for comment, comment_id in zip(batch, ids)
+            ]
+        )
+        meter.count += len(ids)
+
+
+def import_events(context: AppContext, records, batch_size: int, meter: _Throughput):
+    for batch in batched(_entries(context, records), batch_size):
+        meter.count += len(context.analytics_repo.log_many(list(batch)))
+
+
+def import_dataset(context: AppContext, records, batch_size: int, meter: _Throughput):
+    counts = DatasetImporter(context, batch_size).import_records(records)
+    meter.count = counts.total()
+    _print_counts(counts)
+
+
+IMPORTERS = {
+    "posts": import_posts,
+    "comments": import_comments,
+    "events": import_events,
+    "dataset": import_dataset,
+}
+
+
+def _print_counts(counts: Counter):
+    print(", ".join(f"{kind}: {n}" for kind, n in counts.items()), file=sys.stderr)
+
+
+# ---- exportação e relatórios ----
+
+
+def _selected_site_id(context: AppContext, domain: str | None) -> int | None:
+    return context.site_repo.get_site_by_domain(domain).id if domain else None
+
+
+def export_records(context: AppContext, kind: str, site_id: int | None) -> Iterator[dict]:
+    if kind == "dataset":
+        if site_id is not None:
+            raise ValidationError("O conjunto de dados completo não é filtrado por site.")
+        yield from iter_dataset(context)
+    elif kind == "posts":
+        for post in context.post_repo.iter_posts():
+            if site_id is None or post.site.id == site_id:
+                yield post_to_dict(post)
+    elif kind == "comments":
+        for comment in context.comment_repo.iter_comments():
+            if site_id is None or comment.post.site.id == site_id:
+                yield comment_to_dict(comment)
+    elif kind == "events":
+        for entry in context.analytics_repo.iter_entries():
+            if site_id is None or entry.site.id == site_id:
+                yield entry_to_dict(entry)
+
+
+def _count_actions(context: AppContext) -> tuple[Counter, Counter]:
+    """uma única passada pelo analytics, em vez de uma consulta por contador."""
+    by_site: Counter = Counter()
+    by_post: Counter = Counter()
+    for entry in context.analytics_repo.iter_entries():
+        by_site[(entry.site.id, entry.action)] += 1
+        if isinstance(entry, PostAnalyticsEntry):
+            by_post[(entry.post.id, entry.action)] += 1
+    return by_site, by_post
+
+
+def seo_records(context: AppContext, site_id: int | None, workers: int | None) -> Iterator[dict]:
+    auditor = SeoAuditor(context, workers) if workers else context.seo_auditor
+    for site in context.site_repo.get_sites():
+        if site_id is not None and site.id != site_id:
+            continue
+        for result in auditor.audit_site(site).results:
+            report = result.report
+            yield {
+                "site_id": site.id,
+                "post_id": result.post.id,
+                "language": result.language.code,
+                "title": report.title,
+                "title_length": report.title_length,
+                "word_count": report.word_count,
+                "top_keywords": report.top_keywords,
+                "repeated_words": report.repeated_words,
+                "media": report.media_count,
+                "missing_alt": report.missing_alt_count,
+                "issues": report.issue_count,
+            }
+
+
+def duplicate_records(context: AppContext, site_id: int | None) -> Iterator[dict]:
+    for site in context.site_repo.get_sites():
+        if site_id is not None and site.id != site_id:
+            continue
+        for match in context.corpus_index.duplicate_pairs(site):
+            yield {
+                "site_id": site.id,
+                "post_id": match.post.id,
+                "language": match.language.code,
+                "other_post_id": match.other_post.id,
+                "other_language": match.other_language.code,
+                "similarity": round(match.similarity, 3),
+            }
+
+
+def share_records(context: AppContext, site_id: int | None) -> Iterator[dict]:
+    for site in context.site_repo.get_sites():
+        if site_id is not None and site.id != site_id:
+            continue
+        for suggestion in context.share_generator.generate_site(site):
+            yield {
+                "site_id": site.id,
+                "post_id": suggestion.post.id,
+                "platform": suggestion.platform.name.lower(),
+                "language": suggestion.language.code,
+                "text": suggestion.text,
+                "characters": len(suggestion.text),
+                "fits": suggestion.fits,
+            }
+
+
+def dedup_records(context: AppContext, site_id: int | None) -> Iterator[dict]:
+    if site_id is not None:
+        raise ValidationError("O relatório de deduplicação cobre o armazenamento inteiro.")
+    report = context.media_store.dedup_report(top=None)
+    print(
+        f"blobs: {report.blobs}, mídias: {report.references}, "
+        f"em disco: {report.stored_bytes:,} bytes, economizados: {report.saved_bytes:,} bytes",
+        file=sys.stderr,
+    )
+    for blob in report.shared:
+        yield {
+            "content_hash": blob.digest,
+            "size": blob.size,
+            "references": len(blob.medias),
+            "saved_bytes": blob.saved_bytes,
+            "medias": [
+                {"media_id": media.id, "site_id": media.site.id, "filename": media.filename}
+                for media in blob.medias
+            ],
+        }
+
+
+def storage_records(context: AppContext, site_id: int | None) -> Iterator[dict]:
+    accounting = context.storage_accounting
+    for site in context.site_repo.get_sites():
+        if site_id is not None and site.id != site_id:
+            continue
+        usage = accounting.usage(site)
+        quota = accounting.quota(site)
+        yield {
+            "site_id": site.id,
+            "domain": site.get_domain(),
+            "bytes": usage.bytes,
+            "medias": usage.count,
+            "max_bytes": quota.max_bytes,
+            "max_files": quota.max_files,
+        }
+
+
+def reconciliation_records(results: list[SiteReconciliation]) -> Iterator[dict]:
+    for result in results:
+        yield {
+            "site_id": result.site.id,
+            "domain": result.site.get_domain(),
+            "consistent": result.consistent,
+            "counted_bytes": result.counted.bytes,
+            "counted_medias": result.counted.count,
+            "disk_bytes": result.on_disk.bytes,
+            "disk_medias": result.on_disk.count,
+            "missing": [media.id for media in result.missing],
+            "resized": [media.id for media in result.resized],
+        }
+
+
+def report_records(context: AppContext, kind: str, site_id: int | None) -> Iterator[dict]:
+    by_site, by_post = _count_actions(context)
+
+    if kind == "sites":
+        posts_per_site = Counter(post.site.id for post in context.post_repo.iter_posts())
+        for site in context.site_repo.get_sites():
+            if site_id is not None and site.id != site_id:
+                continue
+            yield {
+                "site_id": site.id,
+                "domain": site.get_domain(),
+                "name": site.name,
+                "posts": posts_per_site[site.id],
+                "accesses": by_site[(site.id, SiteAction.ACCESS)],
+                "post_creations": by_site[(site.id, SiteAction.CREATE_POST)],
+                "media_uploads": by_site[(site.id, SiteAction.UPLOAD_MEDIA)],
+                "post_views": by_site[(site.id, PostAction.VIEW)],
+                "post_comments": by_site[(site.id, PostAction.COMMENT)],
+                "post_shares": by_site[(site.id, PostAction.SHARE)],
+            }
+    elif kind == "posts":
+        for post in context.post_repo.iter_posts():
+            if site_id is not None and post.site.id != site_id:
+                continue
+            yield {
+                "post_id": post.id,
+                "site_id": post.site.id,
+                "title": post.get_default_title(),
+                "scheduled_to": post.scheduled_to.isoformat(),
+                "views": by_post[(post.id, PostAction.VIEW)],
+                "comments": by_post[(post.id, PostAction.COMMENT)],
+                "shares": by_post[(post.id, PostAction.SHARE)],
+            }
+
+
+# ---- comandos ----
+
+
+def _cmd_import(context: AppContext, args) -> int:
+    with open_text(args.file) as stream, _Throughput(f"import {args.kind}") as meter:
+        IMPORTERS[args.kind](context, read_ndjson(stream), args.batch_size, meter)
+    return 0
+
+
+def _cmd_export(context: AppContext, args) -> int:
+    site_id = _selected_site_id(context, args.site)
+    with open_text(args.output, "w") as stream, _Throughput(f"export {args.kind}") as meter:
+        meter.count = write_ndjson(stream, export_records(context, args.kind, site_id))
+    return 0
+
+
+def _cmd_report(context: AppContext, args) -> int:
+    site_id = _selected_site_id(context, args.site)
+    if args.kind == "seo":
+        records = seo_records(context, site_id, args.workers)
+    elif args.kind == "duplicates":
+        records = duplicate_records(context, site_id)
+    elif args.kind == "shares":
+        records = share_records(context, site_id)
+    elif args.kind == "dedup":
+        records = dedup_records(context, site_id)
+    elif args.kind == "storage":
+        records = storage_records(context, site_id)
+    else:
+        records = report_records(context, args.kind, site_id)
+    with open_text(args.output, "w") as stream, _Throughput(f"report {args.kind}") as meter:
+        meter.count = write_ndjson(stream, records)
+    return 0
+
+
+def _cmd_share(context: AppContext, args) -> int:
+    queue = ShareQueue(args.queue)
+    client = HttpSocialClient(args.endpoint)
+    publisher = SocialPublisher(context, client, queue)
+    platforms = [SocialMedia[name.upper()] for name in args.platform or [p.name for p in SocialMedia]]
+
+    if not args.resume:
+        sites = context.site_repo.get_sites()
+        if args.site:
+            sites = [context.site_repo.get_site_by_domain(args.site)]
+        # só os posts já publicados; os agendados entram numa próxima execução.
+        # o que a fila já conhece (pendente ou publicado) não é enfileirado de novo
+        posts = [post for site in sites for post in context.post_repo.get_site_posts(site)]
+        jobs = publisher.enqueue_posts(posts, platforms)
+        print(f"{len(jobs)} compartilhamentos novos na fila.", file=sys.stderr)
+
+    with _Throughput("share") as meter:
+        pending = queue.pending_count()
+        publisher.start()
+        try:
+            queue.wait_until_drained()
+        finally:
+            publisher.stop()
+            client.close()
+            queue.close()
+        failed = queue.failed_jobs()
+        meter.count = pending - len(failed)
+
+    for job in failed:
+        print(f"Falhou: post {job.post_id} em {job.platform.value} ({job.language}): {job.error}",
+              file=sys.stderr)
+    for job, error in publisher.unlogged:
+        print(f"Publicado sem registro no analytics: post {job.post_id} em "
+              f"{job.platform.value} ({job.language}): {error}", file=sys.stderr)
+    return 1 if failed or publisher.unlogged else 0
+
+
+def _cmd_import_media(context: AppContext, args) -> int:
+    site = context.site_repo.get_site_by_domain(args.site)
+    uploader = context.user_repo.get_user(args.uploader_id) if args.uploader_id else site.owner
+    importer = BulkMediaImporter(context, args.workers, args.batch_size)
+    last_report = 0.0
+
+    def progress(done: int, total: int):
+        nonlocal last_report
+        now = time.monotonic()
+        if done == total or now - last_report >= 1.0:
+            last_report = now
+            print(f"mídias: {done}/{total} ({done / total:.0%})", file=sys.stderr)
+
+    with _Throughput("import-media") as meter:
+        summary = importer.import_tree(args.directory, site, uploader, args.journal, progress)
+        meter.count = summary.imported
+
+    print(
+        f"encontradas: {summary.found}, importadas: {summary.imported} "
+        f"(arquivos novos no armazenamento: {summary.stored}, lidas do diário: "
+        f"{summary.resumed}), já no site: {summary.skipped}, com erro: {len(summary.failed)}",
+        file=sys.stderr,
+    )
+    for path, error in summary.failed:
+        print(f"Falhou: {path}: {error}", file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+def _cmd_reconcile_storage(context: AppContext, args) -> int:
+    with _Throughput("reconcile-storage") as meter:
+        medias = list(context.media_repo.iter_medias())
+        results = context.storage_accounting.reconcile(medias, args.workers, args.fix)
+        meter.count = len(medias)
+    with open_text(args.output, "w") as stream:
+        write_ndjson(stream, reconciliation_records(results))
+
+    drifted = [result for result in results if not result.consistent]
+    if drifted:
+        state = "corrigidos" if args.fix else "divergentes"
+        print(f"{len(drifted)} sites com contadores {state}.", file=sys.stderr)
+    return 1 if drifted and not args.fix else 0
+
+
+def _cmd_gc_media(context: AppContext, args) -> int:
+    live: set[str] = set()
+    for path in args.keep:
+        live |= dataset_content_hashes(path)
+    with _Throughput("gc-media") as meter:
+        report = context.media_store.collect_garbage(live, args.min_age, args.delete)
+        meter.count = report.scanned
+    with open_text(args.output, "w") as stream:
+        write_ndjson(stream, ({"path": str(path), "size": size} for path, size in report.unreferenced))
+
+    state = "apagados" if args.delete else "sem referência (use --delete para apagar)"
+    print(
+        f"blobs: {report.scanned}, em uso: {report.live}, recentes: {report.recent}, "
+        f"{state}: {len(report.unreferenced)} ({report.freed_bytes:,} bytes)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _language(context: AppContext, code: str) -> Language:
+    language = context.lang_service.find_language(code)
+    if language is None:
+        raise LanguageError(f"Idioma '{code}' não suportado.")
+    return language
+
+
+def _cmd_translate(context: AppContext, args) -> int:
+    target = _language(context, args.to)
+    source = _language(context, args.source) if args.source else None
+    site_id = _selected_site_id(context, args.site)
+    posts = [
+        post for post in context.post_repo.iter_posts()
+        if site_id is None or post.site.id == site_id
+    ]
+    engine = DictionaryTranslationEngine.from_file(args.glossary)
+    memory = TranslationMemory(args.memory) if args.memory else None
+    translator = BatchTranslator(context, engine, memory, args.workers, args.batch_size)
+
+    try:
+        with _Throughput(f"translate {target.code}") as meter:
+            summary = translator.translate_posts(posts, target, source)
+            meter.count = summary.translated
+    finally:
+        if memory:
+            memory.close()
+
+    print(
+        f"traduzidos: {summary.translated}, já no idioma: {summary.skipped}, "
+        f"segmentos: {summary.segments} (enviados ao motor: {summary.engine_segments}, "
+        f"reaproveitados: {summary.reused}), com erro: {len(summary.failed)}",
+        file=sys.stderr,
+    )
+    for post_id, error in summary.failed:
+        print(f"Falhou: post {post_id}: {error}", file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+def _cmd_bench(context: AppContext, args) -> int:
+    from cms.bench import main as bench_main
+
+    return bench_main(args.names)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cms", description="CLI headless do CMS.")
+    parser.add_argument(
+        "--populate", action="store_true", help="carrega os dados de exemplo antes do comando"
+    )
+    parser.add_argument(
+        "--load", metavar="ARQUIVO", help="carrega um conjunto de dados (.ndjson ou .ndjson.gz)"
+    )
+    parser.add_argument(
+        "--save", metavar="ARQUIVO", help="grava o conjunto de dados ao final do comando"
+    )
+    parser.add_argument(
+        "--analytics-pipeline", action="store_true",
+        help="analytics no processo agregador (como CMS_ANALYTICS_PIPELINE=1); só contadores",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="importa registros NDJSON")
+    importer.add_argument("kind", choices=list(IMPORTERS))
+    importer.add_argument("file", nargs="?", default=STDIO, help="arquivo NDJSON (padrão: stdin)")
+    importer.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    importer.set_defaults(handler=_cmd_import)
+
+    exporter = commands.add_parser("export", help="exporta registros como NDJSON")
+    exporter.add_argument("kind", choices=["posts", "comments", "events", "dataset"])
+    exporter.add_argument("--site", help="domínio do site (padrão: todos)")
+    exporter.add_argument("-o", "--output", default=STDIO, help="arquivo de saída (padrão: stdout)")
+    exporter.set_defaults(handler=_cmd_export)
+
+    report = commands.add_parser("report", help="relatórios em NDJSON (analytics, SEO, compartilhamento)")
+    report.add_argument(
+        "kind", choices=["sites", "posts", "seo", "duplicates", "shares", "dedup", "storage"]
+    )
+    report.add_argument("--site", help="domínio do site (padrão: todos)")
+    report.add_argument(
+        "--workers", type=int, default=None, help="processos da auditoria de SEO (padrão: CPUs)"
+    )
+    report.add_argument("-o", "--output", default=STDIO, help="arquivo de saída (padrão: stdout)")
+    report.set_defaults(handler=_cmd_report)
+
+    share = commands.add_parser("share", help="publica os posts nas redes sociais")
+    share.add_argument("--endpoint", required=True, help="URL da API (ex: o cms.web.social_stub)")
+    share.add_argument("--site", help="domínio do site (padrão: todos)")
+    share.add_argument(
+        "--platform", action="append", choices=[p.name.lower() for p in SocialMedia],
+        help="rede social (repetível; padrão: todas)",
+    )
+    share.add_argument("--queue", help="diário da fila; com ele a publicação pode ser retomada")
+    share.add_argument(
+        "--resume", action="store_true", help="só publica o que já está na fila, sem enfileirar"
+    )
+    share.set_defaults(handler=_cmd_share)
+
+    media = commands.add_parser("import-media", help="importa as mídias de uma árvore de diretórios")
+    media.add_argument("directory", help="raiz da árvore")
+    media.add_argument("--site", required=True, help="domínio do site")
+    media.add_argument(
+        "--uploader-id", type=int, help="id do usuário que envia (padrão: dono do site)"
+    )
+    media.add_argument("--workers", type=int, default=None, help="threads de leitura")
+    media.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    media.add_argument("--journal", help="diário da importação; com ele a importação é retomada")
+    media.set_defaults(handler=_cmd_import_media)
+
+    reconcile = commands.add_parser(
+        "reconcile-storage", help="confere os contadores de armazenamento com o disco"
+    )
+    reconcile.add_argument("--workers", type=int, default=None, help="threads de stat")
+    reconcile.add_argument(
+        "--fix", action="store_true", help="corrige os contadores e tamanhos a partir do disco"
+    )
+    reconcile.add_argument("-o", "--output", default=STDIO, help="arquivo de saída (padrão: stdout)")
+    reconcile.set_defaults(handler=_cmd_reconcile_storage)
+
+    gc = commands.add_parser(
+        "gc-media", help="aponta ou apaga os arquivos de mídia que nenhum conjunto de dados usa"
+    )
+    gc.add_argument(
+        "--keep", action="append", default=[], metavar="ARQUIVO",
+        help="outro conjunto de dados que usa o mesmo armazenamento (repetível)",
+    )
+    gc.add_argument(
+        "--min-age", type=float, default=GC_MIN_AGE,
+        help=f"segundos em que um blob novo é mantido (padrão: {GC_MIN_AGE:.0f})",
+    )
+    gc.add_argument("--delete", action="store_true", help="apaga os blobs sem referência")
+    gc.add_argument("-o", "--output", default=STDIO, help="arquivo de saída (padrão: stdout)")
+    gc.set_defaults(handler=_cmd_gc_media)
+
+    translate = commands.add_parser("translate", help="traduz os posts em lote para um idioma")
+    translate.add_argument("--to", required=True, metavar="CÓDIGO", help="idioma de destino")
+    translate.add_argument(
+        "--from", dest="source", metavar="CÓDIGO",
+        help="idioma de origem, quando o post o tem (padrão: idioma padrão do post)",
+    )
+    translate.add_argument("--site", help="domínio do site (padrão: todos)")
+    translate.add_argument(
+        "--glossary", required=True, help='glossário JSON ({"pt-br>en-us": {"texto": "text"}})'
+    )
+    translate.add_argument(
+        "--memory", help="memória de tradução (NDJSON); lida no início e acrescida das traduções novas"
+    )
+    translate.add_argument("--workers", type=int, default=None, help="threads do motor")
+    translate.add_argument("--batch-size", type=int, default=TRANSLATION_BATCH_SIZE)
+    translate.set_defaults(handler=_cmd_translate)
+
+    bench = commands.add_parser("bench", help="roda os benchmarks de cms.bench")
+    bench.add_argument("names", nargs="*", help="benchmarks a rodar (padrão: todos)")
+    bench.set_defaults(handler=_cmd_bench)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, "batch_size", 1) < 1:
+        print("Erro: --batch-size deve ser positivo.", file=sys.stderr)
+        return 2
+
+    context = AppContext()
+    try:
+        if args.analytics_pipeline:
+            # antes de carregar dados, para os eventos irem para o agregador
+            context.enable_analytics_pipeline()
+        if args.populate:
+            from cms.populate import populate
+
+            populate(context)
+        if args.load:
+            with _Throughput(f"load {args.load}") as meter:
+                counts = DatasetImporter(context).load(args.load)
+                meter.count = counts.total()
+
+        status = args.handler(context, args)
+
+        if args.save and status == 0:
+            with _Throughput(f"save {args.save}") as meter:
+                meter.count = save_dataset(context, args.save).total()
+        return status
+    except (CMSException, OSError) as e:
+        if isinstance(e, BrokenPipeError):
+            # saída cortada por `head` e afins
+            sys.stderr.close()
+            return 0
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
@@ -15,7 +15,27 @@ from cms.repository import (
 from cms.services.languages import LanguageService
 from cms.events import EventManager
 from cms.services.analytics_proxy import AnalyticsRepositoryProxy
+from cms.services.analytics_pipeline import AnalyticsIngestionClient
+from cms.services.autocomplete import Autocomplete
+from cms.services.corpus import CorpusIndex
+from cms.services.media_store import MediaStore
+from cms.services.media_usage import MediaUsageIndex
+from cms.services.scheduler import PostScheduler
+from cms.services.search import SearchIndex
+from cms.services.seo_analyzier import SeoAuditor
+from cms.services.social_media import SocialShareGenerator
+from cms.services.site_template import SiteTemplateCache
+from cms.services.storage_quota import StorageAccounting
+from cms.services.translation import TranslationMemory
 
+# eventos que viram entradas de analytics
+ANALYTICS_EVENTS = ("SITE_ACCESSED", "POST_VIEWED", "POST_COMMENTED")
+# eventos que trazem posts novos ou com conteúdo novo, para os índices
+POST_CONTENT_EVENTS = ("POST_CREATED", "POSTS_CREATED", "POST_CONTENT_ADDED", "POSTS_CONTENT_ADDED")
+# onde ficam os arquivos das mídias (um por conteúdo)
+MEDIA_ROOT = os.environ.get("CMS_MEDIA_ROOT", "media_store")
+# com 1, o analytics roda no pipeline multiprocesso (ver enable_analytics_pipeline)
+ANALYTICS_PIPELINE = os.environ.get("CMS_ANALYTICS_PIPELINE", "0") not in ("", "0")
 
 
 # aplicar o sigleton aqui, parece encaixar bem
@@ -30,37 +50,171 @@ class AppContext:
                 if cls._instance is None:
                     # Cria a instância
                     inst = super(AppContext, cls).__new__(cls)
-                    
-                    inst.__event_manager = EventManager()
-                    analytics_observer = AnalyticsRepository() # observador
-                    
-                    inst.__site_repo = SiteRepository()
-                    inst.__post_repo = PostRepository()
-                    inst.__user_repo = UserRepository()
-                    inst.__comment_repo = CommentRepository()
-                    inst.__media_repo = MediaRepository()
-                    inst.__permission_repo = PermissionRepository()
-                    inst.__lang_service = LanguageService()
-                    
-                    # atribui o observador criado à sua property
-                    inst.__analytics_repo = analytics_observer
-                    
-                    # inscreve o Analytics para ouvir os eventos que importam
-                    inst.__event_manager.subscribe("SITE_ACCESSED", analytics_observer)
-                    inst.__event_manager.subscribe("POST_VIEWED", analytics_observer)
-                    inst.__event_manager.subscribe("POST_COMMENTED", analytics_observer)
-                    
+                    inst.__build()
                     cls._instance = inst
         return cls._instance
 
+    def __build(self):
+        self.__event_manager = EventManager()
+        analytics_observer = AnalyticsRepository(self.__event_manager) # observador
+
+        self.__site_repo = SiteRepository()
+        self.__post_repo = PostRepository(self.__event_manager)
+        self.__user_repo = UserRepository()
+        self.__comment_repo = CommentRepository()
+        self.__media_repo = MediaRepository(self.__event_manager)
+        self.__permission_repo = PermissionRepository()
+        self.__lang_service = LanguageService()
+
+        # atribui o observador criado à sua property
+        self.__analytics_repo = analytics_observer
+        self.__subscribe_analytics(analytics_observer)
+
+        # uso das mídias nos posts; quando uma mídia muda, renova só os conteúdos que a mostram.
+        # inscrito antes do cache das páginas, que é invalidado pelo mesmo evento
+        self.__media_usage = MediaUsageIndex()
+        for event_type in (*POST_CONTENT_EVENTS, "MEDIA_UPDATED"):
+            self.__event_manager.subscribe(event_type, self.__media_usage)
+
+        # cache das páginas iniciais, invalidado por eventos
+        self.__template_cache = SiteTemplateCache(self.__post_repo, analytics_observer)
+        self.__event_manager.subscribe("POST_CREATED", self.__template_cache)
+        self.__event_manager.subscribe("POSTS_CREATED", self.__template_cache)
+        self.__event_manager.subscribe("SITE_TEMPLATE_CHANGED", self.__template_cache)
+        self.__event_manager.subscribe("POST_PUBLISHED", self.__template_cache)
+        # uma tradução nova muda a página inicial no idioma dela
+        self.__event_manager.subscribe("POST_CONTENT_ADDED", self.__template_cache)
+        self.__event_manager.subscribe("POSTS_CONTENT_ADDED", self.__template_cache)
+        self.__event_manager.subscribe("MEDIA_UPDATED", self.__template_cache)
+
+        # publica os posts agendados na hora; posts novos acordam a thread
+        self.__scheduler = PostScheduler(self.__post_repo)
+        self.__event_manager.subscribe("POST_CREATED", self.__scheduler)
+        self.__event_manager.subscribe("POSTS_CREATED", self.__scheduler)
+
+        # índice de busca, atualizado a cada post novo ou conteúdo adicionado
+        self.__search_index = SearchIndex()
+        for event_type in POST_CONTENT_EVENTS:
+            self.__event_manager.subscribe(event_type, self.__search_index)
+
+        # frequências de documento e assinaturas para TF-IDF e duplicatas
+        self.__corpus_index = CorpusIndex()
+        for event_type in POST_CONTENT_EVENTS:
+            self.__event_manager.subscribe(event_type, self.__corpus_index)
+
+        # autocompletar de títulos e mídias, ranqueado por visualizações
+        self.__autocomplete = Autocomplete(analytics_observer)
+        for event_type in (
+            *POST_CONTENT_EVENTS,
+            "POST_VIEWS_COUNTED",
+            "MEDIA_ADDED",
+            "MEDIAS_ADDED",
+            "MEDIA_REMOVED",
+            "MEDIA_UPDATED",
+        ):
+            self.__event_manager.subscribe(event_type, self.__autocomplete)
+
+        # referências dos blobs das mídias deste processo (os arquivos só saem pelo gc-media)
+        self.__media_store = MediaStore(MEDIA_ROOT)
+        for event_type in ("MEDIA_ADDED", "MEDIAS_ADDED", "MEDIA_REMOVED"):
+            self.__event_manager.subscribe(event_type, self.__media_store)
+
+        # bytes e mídias por site, para as cotas de armazenamento
+        self.__storage_accounting = StorageAccounting()
+        for event_type in ("MEDIA_ADDED", "MEDIAS_ADDED", "MEDIA_REMOVED"):
+            self.__event_manager.subscribe(event_type, self.__storage_accounting)
+
+        # traduções já feitas, reaproveitadas entre posts
+        self.__translation_memory = TranslationMemory()
+
+        # relatórios de SEO guardados pelo hash do conteúdo entre auditorias
+        self.__seo_auditor = SeoAuditor(self)
+        # sugestões de compartilhamento guardadas até o post mudar
+        self.__share_generator = SocialShareGenerator(self)
+
+        if ANALYTICS_PIPELINE:
+            self.enable_analytics_pipeline()
+
+    def __subscribe_analytics(self, analytics_observer):
+        # inscreve o Analytics para ouvir os eventos que importam
+        for event_type in ANALYTICS_EVENTS:
+            self.__event_manager.subscribe(event_type, analytics_observer)
+
+    def enable_analytics_pipeline(
+        self, staleness: float = 1.0
+    ) -> AnalyticsIngestionClient:
+        """
+        troca o repositório de analytics pelo cliente do pipeline multiprocesso.
+        as contagens respondidas podem atrasar no máximo `staleness` segundos.
+        o pipeline só guarda contadores: exportar eventos e os relatórios que
+        percorrem as entradas passam a falhar. ligado por CMS_ANALYTICS_PIPELINE=1
+        ou --analytics-pipeline na CLI, antes de carregar dados.
+        """
+        if isinstance(self.__analytics_repo, AnalyticsIngestionClient):
+            return self.__analytics_repo
+
+        client = AnalyticsIngestionClient(self.__event_manager, staleness=staleness).start()
+        for event_type in ANALYTICS_EVENTS:
+            self.__event_manager.unsubscribe(event_type, self.__analytics_repo)
+        self.__analytics_repo = client
+        self.__subscribe_analytics(client)
+        self.__template_cache.analytics_repo = client
+        self.__template_cache.invalidate()
+        self.__autocomplete.analytics_repo = client
+        return client
+
     @property
     def event_manager(self) -> EventManager:
         return self.__event_manager
 
     @property
-    def analytics_repo(self) -> AnalyticsRepository:
+    def analytics_repo(self) -> AnalyticsRepository | AnalyticsIngestionClient:
         return self.__analytics_repo
 
+    @property
+    def template_cache(self) -> SiteTemplateCache:
+        return self.__template_cache
+
+    @property
+    def scheduler(self) -> PostScheduler:
+        return self.__scheduler
+
+    @property
+    def search_index(self) -> SearchIndex:
+        return self.__search_index
+
+    @property
+    def corpus_index(self) -> CorpusIndex:
+        return self.__corpus_index
+
+    @property
+    def autocomplete(self) -> Autocomplete:
+        return self.__autocomplete
+
+    @property
+    def media_store(self) -> MediaStore:
+        return self.__media_store
+
+    @property
+    def storage_accounting(self) -> StorageAccounting:
+        return self.__storage_accounting
+
+    @property
+    def media_usage(self) -> MediaUsageIndex:
+        return self.__media_usage
+
+    @property
+    def translation_memory(self) -> TranslationMemory:
+        return self.__translation_memory
+
+    @property
+    def seo_auditor(self) -> SeoAuditor:
+        return self.__seo_auditor
+
+    @property
+    def share_generator(self) -> SocialShareGenerator:
+        return self.__share_generator
+
     @property
     def site_repo(self) -> SiteRepository:
         return self.__site_repo
@@ -97,13 +251,7 @@ class AppContext:
         )
 
     def reset_context(self):
-        self.__event_manager = EventManager()
-        analytics_observer = AnalyticsRepository() # observador
-        self.__site_repo = SiteRepository()
-        self.__post_repo = PostRepository()
-        self.__user_repo = UserRepository()
-        self.__media_repo = MediaRepository()
-        self.__comment_repo = CommentRepository()
-        self.__analytics_repo = AnalyticsRepository()
-        self.__permission_repo = PermissionRepository()
-        self.__lang_service = LanguageService()
+        if isinstance(self.__analytics_repo, AnalyticsIngestionClient):
+            self.__analytics_repo.stop()
+        self.__scheduler.stop()
+        self.__build()
@@ -84,6 +84,17 @@ class MediaError(CMSException):
     pass
 
 
+class QuotaExceededError(MediaError):
+    """
+    Lançada quando uma importação passaria da cota de armazenamento do site.
+
+    Exemplos:
+    - Arquivo maior que o espaço restante do site
+    - Site já tem o número máximo de mídias
+    """
+    pass
+
+
 class LanguageError(CMSException):
     """
     Lançada quando há erro ao processar idiomas.
@@ -142,3 +153,19 @@ class OperationFailedError(CMSException):
     - Falha ao processar adapters de notificação
     """
     pass
+
+
+class SocialPublishError(CMSException):
+    """
+    Lançada quando a publicação numa rede social falha.
+
+    Exemplos:
+    - Plataforma fora do ar ou respondendo com erro (pode tentar de novo)
+    - Cota da API excedida (retry_after diz em quantos segundos tentar de novo)
+    - Texto recusado pela plataforma (permanent: não adianta tentar de novo)
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None, permanent: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.permanent = permanent
@@ -1,9 +1,10 @@
+import html
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
 from abc import ABC, abstractmethod
-from typing import TypedDict
+from typing import Iterator, TypedDict
 
 
 class UserRole(Enum):
@@ -90,9 +91,13 @@ class MediaFile(ABC):
     path: Path
     media_type: MediaType
     site: Site
-    width: str
-    height: str
+    width: int | None
+    height: int | None
+    # em segundos, só para vídeos
     duration: float | None
+    # tamanho em bytes e hash do conteúdo, quando o arquivo foi lido
+    size: int | None = None
+    content_hash: str | None = None
 
     @property
     def url(self):
@@ -101,6 +106,8 @@ class MediaFile(ABC):
 
     @property
     def dimension(self):
+        if self.width is None or self.height is None:
+            return "desconhecida"
         return f"{self.width}X{self.height}"
 
 
@@ -116,6 +123,14 @@ class ContentBlock(ABC):
     def get_content(self) -> str:
         pass
 
+    def get_html(self) -> str:
+        # HTML publicável do bloco; por padrão é o mesmo conteúdo exibido
+        return self.get_content()
+
+    def iter_html(self) -> Iterator[str]:
+        # blocos grandes podem sobrescrever para gerar o HTML em pedaços
+        yield self.get_html()
+
 
 @dataclass
 class TextBlock(ContentBlock):
@@ -124,6 +139,10 @@ class TextBlock(ContentBlock):
     def get_content(self) -> str:
         return f"<p>{self.text}</p>"
 
+    def get_html(self) -> str:
+        # o texto vem do autor (ou da API): no HTML publicado ele é escapado
+        return f"<p>{html.escape(self.text)}</p>"
+
 
 @dataclass
 class MediaBlock(ContentBlock):
@@ -140,6 +159,14 @@ class MediaBlock(ContentBlock):
 
         return content
 
+    def get_html(self) -> str:
+        # na versão publicada a mídia aponta para a URL pública, não o nome do arquivo
+        src = html.escape(self.media.url, quote=True)
+        alt = html.escape(self.alt, quote=True)
+        if self.media.media_type == MediaType.IMAGE:
+            return f'<img src="{src}" alt="{alt}" />'
+        return f'<video src="{src}" title="{alt}" controls></video>'
+
 
 @dataclass
 class CaroulselBlock(ContentBlock):
@@ -147,7 +174,25 @@ class CaroulselBlock(ContentBlock):
     alt: str
 
     def get_content(self) -> str:
-        return ""
+        return "\n".join(self.iter_items())
+
+    def iter_items(self) -> Iterator[str]:
+        # cada item do carrossel é renderizado só quando é consumido
+        for media in self.medias:
+            yield MediaBlock(order=self.order, media=media, alt=self.alt).get_content()
+
+    def get_html(self) -> str:
+        return "".join(self.iter_html())
+
+    def iter_html(self) -> Iterator[str]:
+        yield "<div class='carousel'>"
+        for media in self.medias:
+            yield MediaBlock(order=self.order, media=media, alt=self.alt).get_html()
+        yield "</div>"
+
+
+# posts maiores que isso não guardam cache de renderização, só fazem streaming
+RENDER_CACHE_MAX_BLOCKS = 500
 
 
 @dataclass
@@ -155,6 +200,59 @@ class Content(ABC):
     title: str
     body: list[ContentBlock]
     language: Language
+    # cache da renderização, preenchido no primeiro uso e limpo pelo Post.add_content
+    __rendered_blocks: tuple[str, ...] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    __body_html: str | None = field(default=None, init=False, repr=False, compare=False)
+
+    def get_rendered_blocks(self) -> tuple[str, ...]:
+        """conteúdo de cada bloco como é exibido no terminal."""
+        if self.__rendered_blocks is not None:
+            return self.__rendered_blocks
+
+        rendered = tuple(block.get_content() for block in self.body)
+        if self._is_cacheable():
+            self.__rendered_blocks = rendered
+        return rendered
+
+    def render_body_html(self) -> str:
+        """corpo completo em HTML publicável, montado uma única vez."""
+        if self.__body_html is not None:
+            return self.__body_html
+
+        body_html = "".join(self._iter_blocks_html())
+        if self._is_cacheable():
+            self.__body_html = body_html
+        return body_html
+
+    def iter_rendered_blocks(self) -> Iterator[str]:
+        """gera os blocos do terminal um a um, sem montar a lista inteira."""
+        if self._is_cacheable():
+            yield from self.get_rendered_blocks()
+            return
+        for block in self.body:
+            yield block.get_content()
+
+    def iter_body_html(self) -> Iterator[str]:
+        """gera o corpo em HTML bloco a bloco (e item a item nos carrosséis)."""
+        if self._is_cacheable():
+            yield self.render_body_html()
+            return
+        yield from self._iter_blocks_html()
+
+    def _iter_blocks_html(self) -> Iterator[str]:
+        for i, block in enumerate(self.body):
+            if i:
+                yield "\n"
+            yield from block.iter_html()
+
+    def _is_cacheable(self) -> bool:
+        return len(self.body) <= RENDER_CACHE_MAX_BLOCKS
+
+    def invalidate_render_cache(self):
+        self.__rendered_blocks = None
+        self.__body_html = None
 
 
 @dataclass
@@ -164,12 +262,27 @@ class Post:
     site: Site
     scheduled_to: datetime = field(default_factory=datetime.now)
     created_at: datetime = field(default_factory=datetime.now)
+    # incrementada a cada conteúdo adicionado, serve para detectar mudanças
+    version: int = field(init=False, default=0)
+    updated_at: datetime = field(init=False, default_factory=datetime.now)
     __content_by_language: dict[LanguageCode, Content] = field(
         init=False, default_factory=dict[LanguageCode, Content]
     )
 
     def add_content(self, lang: LanguageCode, content: Content):
+        previous = self.__content_by_language.get(lang)
+        if previous:
+            previous.invalidate_render_cache()
+        content.invalidate_render_cache()
+
         self.__content_by_language[lang] = content
+        self.version += 1
+        self.updated_at = datetime.now()
+
+    def touch(self):
+        # a renderização mudou sem conteúdo novo (ex: uma mídia usada foi renomeada)
+        self.version += 1
+        self.updated_at = datetime.now()
 
     @property
     def default_language(self) -> Language:
@@ -178,36 +291,47 @@ class Post:
         return next(iter(self.__content_by_language.values())).language
 
     def is_visible(self) -> bool:
-        return self.scheduled_to >= datetime.now()
+        return self.scheduled_to <= datetime.now()
 
     def display_post(self, language: Language | None = None):
+        for line in self.iter_display_lines(language):
+            print(line)
+
+    def iter_display_lines(self, language: Language | None = None) -> Iterator[str]:
+        """gera a visualização do terminal linha a linha, bloco a bloco."""
         content = self.get_content_by_language(language)
 
-        print(f"[{content.language.code}] ", content.title)
-        print(f"Data de criação: {self.created_at}")
-        print(" ")
-        for block in content.body:
-            block.display_content()
-        print(" ")
-        print(f"Criado por: {self.poster.username}")
-        print(" ")
-        print(" ")
+        yield f"[{content.language.code}]  {content.title}"
+        yield f"Data de criação: {self.created_at}"
+        yield " "
+        for rendered in content.iter_rendered_blocks():
+            yield rendered
+            yield " "
+        yield " "
+        yield f"Criado por: {self.poster.username}"
+        yield " "
+        yield " "
 
     def display_post_short(self, language: Language | None = None):
+        print(self.format_post_short(language))
+
+    def format_post_short(self, language: Language | None = None) -> str:
         content = self.get_content_by_language(language)
 
-        print(f"[{content.language.code}] ", content.title)
-        print(f"{self.poster.username}@{self.created_at}")
-        print(" ")
+        return (
+            f"[{content.language.code}]  {content.title}\n"
+            f"{self.poster.username}@{self.created_at}\n"
+            " "
+        )
 
     def format_post_to_social_network(self, language: Language | None = None) -> str:
         SIZE_LIMIT = 100
         content = self.get_content_by_language(language)
 
         block_to_display = None
-        for block in content.body:
+        for block, rendered in zip(content.body, content.get_rendered_blocks()):
             if isinstance(block, TextBlock):
-                block_to_display = block
+                block_to_display = rendered
                 break
 
         s = f"[{content.language.code}] {content.title}\n"
@@ -215,8 +339,8 @@ class Post:
         s += "\n"
 
         if block_to_display:
-            s += block_to_display.get_content()[:SIZE_LIMIT]
-            s += "\n" if len(block_to_display.get_content()) < SIZE_LIMIT else "...\n"
+            s += block_to_display[:SIZE_LIMIT]
+            s += "\n" if len(block_to_display) < SIZE_LIMIT else "...\n"
 
         s += "\n"
         s += f"Veja o post completo em: {self.site.get_url()}\n"
@@ -224,10 +348,18 @@ class Post:
         return s
 
     def display_first_post_image(self):
+        block = self.get_first_media_block()
+        if block:
+            block.display_content()
+
+    def get_first_media_block(self) -> MediaBlock | None:
         for block in self.__content_by_language[self.default_language.code].body:
             if isinstance(block, MediaBlock):
-                block.display_content()
-                return
+                return block
+        return None
+
+    def has_language(self, language: Language) -> bool:
+        return language.code in self.__content_by_language
 
     def get_content_by_language(self, language: Language | None = None) -> Content:
         if not language:
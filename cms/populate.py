@@ -4,6 +4,7 @@ from cms.models import (
     Content,
     MediaBlock,
     MediaFile,
+    MediaType,
     Permission,
     Post,
     PostAction,
@@ -15,6 +16,7 @@ from cms.models import (
     User,
     UserRole,
 )
+from cms.services.media_probe import probe_media
 from cms.utils import infer_media_type
 from cms.context import AppContext
 
@@ -112,7 +114,7 @@ def populate(context: AppContext):
                 MediaBlock(
                     order=2,
                     alt="Some video",
-                    media=context.media_repo.get_media_by_id(5),
+                    media=_first_media_of_type(context, site, MediaType.VIDEO),
                 ),
                 TextBlock(
                     order=3,
@@ -199,23 +201,36 @@ def populate(context: AppContext):
     )
 
 
+def _first_media_of_type(context: AppContext, site: Site, media_type: MediaType) -> MediaFile:
+    # a ordem de importação depende do sistema de arquivos, então não dá para fixar o id
+    return next(
+        media
+        for media in context.media_repo.get_site_medias(site)
+        if media.media_type == media_type
+    )
+
+
 def _populate_medias(context: AppContext, uploader: User, selected_site: Site):
     folder = Path("static")
     for filepath in folder.rglob("*"):
         if filepath.is_file():
             filepath = filepath.resolve()
             media_type = infer_media_type(filepath.suffix)
+            info = probe_media(filepath)
+            blob = context.media_store.put(filepath)
 
             context.media_repo.add_midia(
                 MediaFile(
                     uploader=uploader,
                     filename=filepath.name,
-                    path=filepath,
+                    path=blob.path,
                     media_type=media_type,
                     site=selected_site,
-                    width="1000",
-                    height="1000",
-                    duration=None,
+                    width=info.width,
+                    height=info.height,
+                    duration=info.duration,
+                    size=blob.size,
+                    content_hash=blob.digest,
                 )
             )
 
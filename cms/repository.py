@@ -1,9 +1,13 @@
+import heapq
+import threading
+from collections import Counter
 from datetime import datetime
 from typing import Iterator
 from itertools import count
 from cms.models import (
     AnalyticsEntry,
     Comment,
+    Content,
     MediaFile,
     Permission,
     Post,
@@ -14,7 +18,7 @@ from cms.models import (
     SiteAnalyticsEntry,
     User,
 )
-from cms.events import Observer
+from cms.events import EventManager, Observer
 from cms.exceptions import (
     ValidationError,
     PermissionDeniedError,
@@ -42,6 +46,18 @@ class UserRepository:
     def get_users(self) -> list[User]:
         return list(self.__users.values())
 
+    def get_user(self, user_id: int) -> User:
+        """
+        recupera um usuário pelo ID.
+
+        raises:
+            ResourceNotFoundError: Se usuário não existe
+        """
+        user = self.__users.get(user_id)
+        if not user:
+            raise ResourceNotFoundError(f"Usuário com ID {user_id} não encontrado.")
+        return user
+
     def validate_user(self, username: str, password: str) -> User:
         """
         valida as credenciais do usuário.
@@ -84,10 +100,16 @@ class UserRepository:
 class AnalyticsRepository(Observer):
     __entries: dict[int, AnalyticsEntry]
     __id_counter: Iterator[int]
+    # contadores mantidos a cada log, para as consultas serem O(1)
+    __site_counts: Counter[tuple[SiteAction | PostAction, int]]
+    __post_counts: Counter[tuple[PostAction, int]]
 
-    def __init__(self):
+    def __init__(self, event_manager: EventManager | None = None):
         self.__entries = {}
         self.__id_counter = count(1)
+        self.__site_counts = Counter()
+        self.__post_counts = Counter()
+        self.__event_manager = event_manager
 
     def update(self, event_type: str, *args, **kwargs) -> None:
         # define como a interface do observador deve ser
@@ -119,7 +141,7 @@ class AnalyticsRepository(Observer):
                 site=site,
                 post=post,
                 action=PostAction.COMMENT,
-                metadata={"comment_id": str(comment_id)}
+                metadata={"comment_id": str(kwargs.get('comment_id'))}
             )
 
         if(entry):
@@ -129,8 +151,43 @@ class AnalyticsRepository(Observer):
         entry_id = next(self.__id_counter)
         entry.id = entry_id
         self.__entries.update({entry_id: entry})
+        self.__count(entry)
+        self.__notify_views([entry])
         return entry_id
 
+    def log_many(self, entries: list[AnalyticsEntry]) -> list[int]:
+        """registra várias entradas de uma vez (inserção em lote)."""
+        ids = [next(self.__id_counter) for _ in entries]
+        for entry_id, entry in zip(ids, entries):
+            entry.id = entry_id
+            self.__count(entry)
+        self.__entries.update(zip(ids, entries))
+        self.__notify_views(entries)
+        return ids
+
+    def __notify_views(self, entries: list[AnalyticsEntry]):
+        # qualquer visualização registrada (menu, API, importação) chega aos rankings
+        if not self.__event_manager:
+            return
+        viewed = {
+            entry.post.id: entry.post
+            for entry in entries
+            if isinstance(entry, PostAnalyticsEntry) and entry.action == PostAction.VIEW
+        }
+        if viewed:
+            self.__event_manager.notify("POST_VIEWS_COUNTED", posts=list(viewed.values()))
+
+    def __count(self, entry: AnalyticsEntry):
+        if isinstance(entry, PostAnalyticsEntry):
+            self.__site_counts[(entry.action, entry.site.id)] += 1
+            self.__post_counts[(entry.action, entry.post.id)] += 1
+        elif isinstance(entry, SiteAnalyticsEntry):
+            self.__site_counts[(entry.action, entry.site.id)] += 1
+
+    def iter_entries(self) -> Iterator[AnalyticsEntry]:
+        """percorre todas as entradas em ordem de inserção, sem copiar."""
+        yield from self.__entries.values()
+
     def show_logs(self, limit: int = 5):
         entries = sorted(
             [e for e in self.__entries.values()], key=lambda x: x.created_at
@@ -148,15 +205,7 @@ class AnalyticsRepository(Observer):
         return self._get_site_info_by_action(site_id, SiteAction.UPLOAD_MEDIA)
 
     def _get_site_info_by_action(self, site_id: int, action: SiteAction) -> int:
-        return len(
-            [
-                entry
-                for entry in self.__entries.values()
-                if isinstance(entry, SiteAnalyticsEntry)
-                and entry.action == action
-                and site_id == entry.site.id
-            ]
-        )
+        return self.__site_counts[(action, site_id)]
 
     def get_site_total_post_views(self, site_id: int) -> int:
         return self._get_site_total_post_info_by_action(site_id, PostAction.VIEW)
@@ -170,15 +219,7 @@ class AnalyticsRepository(Observer):
     def _get_site_total_post_info_by_action(
         self, site_id: int, action: PostAction
     ) -> int:
-        return len(
-            [
-                entry
-                for entry in self.__entries.values()
-                if isinstance(entry, PostAnalyticsEntry)
-                and entry.action == action
-                and site_id == entry.site.id
-            ]
-        )
+        return self.__site_counts[(action, site_id)]
 
     def get_post_views(self, post_id: int) -> int:
         return self._get_post_info_by_action(post_id, PostAction.VIEW)
@@ -189,35 +230,61 @@ class AnalyticsRepository(Observer):
     def get_post_comments(self, post_id: int) -> int:
         return self._get_post_info_by_action(post_id, PostAction.COMMENT)
 
+    def get_posts_views(self, post_ids: list[int]) -> list[int]:
+        """visualizações de vários posts de uma vez, na ordem de `post_ids`."""
+        return [self.__post_counts[(PostAction.VIEW, post_id)] for post_id in post_ids]
+
+    def get_posts_comments(self, post_ids: list[int]) -> list[int]:
+        return [self.__post_counts[(PostAction.COMMENT, post_id)] for post_id in post_ids]
+
     def _get_post_info_by_action(self, post_id: int, action: PostAction) -> int:
-        return len(
-            [
-                entry
-                for entry in self.__entries.values()
-                if isinstance(entry, PostAnalyticsEntry)
-                and entry.action == action
-                and post_id == entry.post.id
-            ]
-        )
+        return self.__post_counts[(action, post_id)]
 
 
 class SiteRepository:
     __sites: dict[int, Site]
+    __sites_by_domain: dict[str, Site]
     __id_counter: Iterator[int]
 
     def __init__(self):
         self.__sites = {}
+        self.__sites_by_domain = {}
         self.__id_counter = count(1)
 
     def add_site(self, site: Site) -> int:
         site_id = next(self.__id_counter)
         site.id = site_id
         self.__sites.update({site_id: site})
+        self.__sites_by_domain.setdefault(site.get_domain(), site)
         return site_id
 
+    def get_site_by_domain(self, domain: str) -> Site:
+        """
+        recupera um site pelo domínio (Site.get_domain).
+
+        raises:
+            ResourceNotFoundError: Se nenhum site usa esse domínio
+        """
+        site = self.__sites_by_domain.get(domain)
+        if not site:
+            raise ResourceNotFoundError(f"Site '{domain}' não encontrado.")
+        return site
+
     def get_sites(self) -> list[Site]:
         return [site for site in self.__sites.values()]
 
+    def get_site(self, site_id: int) -> Site:
+        """
+        recupera um site pelo ID.
+
+        raises:
+            ResourceNotFoundError: Se site não existe
+        """
+        site = self.__sites.get(site_id)
+        if not site:
+            raise ResourceNotFoundError(f"Site com ID {site_id} não encontrado.")
+        return site
+
     def get_user_sites(self, user: User) -> list[Site]:
         return [site for site in self.__sites.values() if site.owner.id == user.id]
 
@@ -236,6 +303,9 @@ class PermissionRepository:
     def has_permission(self, user: User, site: Site) -> bool:
         return True if self.__permissions.get((user.id, site.id)) else False
 
+    def iter_permissions(self) -> Iterator[Permission]:
+        yield from self.__permissions.values()
+
     def get_not_managers(self, site: Site, repo: UserRepository) -> list[User]:
         has_permission = [
             permission.user.id
@@ -248,65 +318,254 @@ class PermissionRepository:
 
 
 class PostRepository:
+    """
+    guarda os posts e o índice dos publicados por site.
+
+    um post agendado fica num heap por data até scheduled_to chegar; então
+    publish_due o move para o índice de publicados e emite POST_PUBLISHED.
+    o PostScheduler chama publish_due na hora certa, e as leituras também
+    chamam, então o índice nunca fica atrasado mesmo sem a thread rodando.
+
+    os observadores de POST_PUBLISHED rodam na thread que chamou publish_due:
+    a do agendador ou a de quem estiver lendo (inclusive os workers da API de
+    escrita), então precisam ser seguros entre threads.
+    """
+
     __posts: dict[int, Post]
     __id_counter: Iterator[int]
 
-    def __init__(self):
+    def __init__(self, event_manager: EventManager | None = None):
         self.__posts = {}
         self.__id_counter = count(1)
+        self.__event_manager = event_manager
+        # site_id -> posts publicados, na ordem em que ficaram visíveis
+        self.__published: dict[int, dict[int, Post]] = {}
+        # heaps de (scheduled_to, post_id): um geral, para o agendador, e um por site
+        self.__schedule: list[tuple[datetime, int]] = []
+        self.__site_schedules: dict[int, list[tuple[datetime, int]]] = {}
+        self.__schedule_lock = threading.Lock()
 
     def add_post(self, post: Post) -> int:
         post_id = next(self.__id_counter)
         post.id = post_id
         self.__posts.update({post_id: post})
+        with self.__schedule_lock:
+            self.__place([post], datetime.now())
+
+        # avisa os observadores (caches, índices) que um post novo existe
+        if self.__event_manager:
+            self.__event_manager.notify("POST_CREATED", site=post.site, post=post)
         return post_id
 
-    def get_site_posts(self, site: Site) -> list[Post]:
-        posts: list[Post] = []
-        now = datetime.now()
-        for post in self.__posts.values():
-            if post.site.id == site.id and post.scheduled_to < now:
-                posts.append(post)
+    def add_posts(self, posts: list[Post]) -> list[int]:
+        """
+        insere vários posts de uma vez (inserção em lote).
+        os observadores recebem um único evento POSTS_CREATED para o lote.
+        """
+        ids = [next(self.__id_counter) for _ in posts]
+        for post_id, post in zip(ids, posts):
+            post.id = post_id
+        self.__posts.update(zip(ids, posts))
+        with self.__schedule_lock:
+            self.__place(posts, datetime.now())
+
+        if self.__event_manager and posts:
+            self.__event_manager.notify("POSTS_CREATED", posts=posts)
+        return ids
+
+    def add_content(self, post: Post, content: Content):
+        """
+        adiciona um conteúdo (ex: uma tradução) ao post com Post.add_content e
+        avisa os observadores com POST_CONTENT_ADDED.
+        """
+        post.add_content(content.language.code, content)
 
-        return posts
+        if self.__event_manager:
+            self.__event_manager.notify(
+                "POST_CONTENT_ADDED", site=post.site, post=post, language=content.language
+            )
+
+    def add_contents(self, contents: list[tuple[Post, Content]]):
+        """
+        adiciona vários conteúdos (ex: traduções) de uma vez, com Post.add_content.
+        os observadores recebem um único evento POSTS_CONTENT_ADDED para o lote.
+        """
+        for post, content in contents:
+            post.add_content(content.language.code, content)
+
+        if self.__event_manager and contents:
+            self.__event_manager.notify(
+                "POSTS_CONTENT_ADDED", posts=[post for post, _ in contents]
+            )
+
+    def get_post(self, post_id: int) -> Post:
+        """
+        recupera um post pelo ID.
+
+        raises:
+            ResourceNotFoundError: Se post não existe
+        """
+        post = self.__posts.get(post_id)
+        if not post:
+            raise ResourceNotFoundError(f"Post com ID {post_id} não encontrado.")
+        return post
+
+    def iter_posts(self) -> Iterator[Post]:
+        """percorre todos os posts, inclusive os agendados, sem copiar."""
+        yield from self.__posts.values()
+
+    def get_site_posts(self, site: Site) -> list[Post]:
+        """posts visíveis do site, na ordem em que foram publicados."""
+        self.publish_due()
+        # copiado sob a trava: o agendador insere no índice de outra thread
+        with self.__schedule_lock:
+            return list(self.__published.get(site.id, {}).values())
+
+    def is_published(self, post: Post) -> bool:
+        self.publish_due()
+        with self.__schedule_lock:
+            return post.id in self.__published.get(post.site.id, {})
+
+    def get_next_scheduled_time(self, site: Site) -> datetime | None:
+        """retorna quando o próximo post agendado do site fica visível."""
+        self.publish_due()
+        with self.__schedule_lock:
+            schedule = self.__site_schedules.get(site.id)
+            return schedule[0][0] if schedule else None
+
+    def get_next_publish_time(self) -> datetime | None:
+        """quando o próximo post agendado, de qualquer site, fica visível."""
+        with self.__schedule_lock:
+            return self.__schedule[0][0] if self.__schedule else None
+
+    def publish_due(self, now: datetime | None = None) -> list[Post]:
+        """
+        publica os posts agendados até `now` e emite POST_PUBLISHED para cada
+        um. custa O(log n) por post publicado e O(1) quando não há nenhum.
+        """
+        now = now or datetime.now()
+        schedule = self.__schedule
+        published: list[Post] = []
+        with self.__schedule_lock:
+            while schedule and schedule[0][0] <= now:
+                _, post_id = heapq.heappop(schedule)
+                post = self.__posts[post_id]
+                # o heap geral sai em ordem, então o post é o primeiro do heap do site
+                site_schedule = self.__site_schedules[post.site.id]
+                heapq.heappop(site_schedule)
+                if not site_schedule:
+                    del self.__site_schedules[post.site.id]
+                self.__published.setdefault(post.site.id, {})[post_id] = post
+                published.append(post)
+
+        # fora do lock: os observadores podem ler o repositório
+        if self.__event_manager:
+            for post in published:
+                self.__event_manager.notify("POST_PUBLISHED", site=post.site, post=post)
+        return published
+
+    def __place(self, posts: list[Post], now: datetime):
+        scheduled: list[tuple[datetime, int]] = []
+        by_site: dict[int, list[tuple[datetime, int]]] = {}
+        for post in posts:
+            if post.scheduled_to <= now:
+                self.__published.setdefault(post.site.id, {})[post.id] = post
+                continue
+            entry = (post.scheduled_to, post.id)
+            scheduled.append(entry)
+            by_site.setdefault(post.site.id, []).append(entry)
+
+        _heap_extend(self.__schedule, scheduled)
+        for site_id, entries in by_site.items():
+            _heap_extend(self.__site_schedules.setdefault(site_id, []), entries)
+
+
+def _heap_extend(heap: list, entries: list):
+    # lotes grandes (importações) reconstroem o heap em O(n)
+    if len(entries) > len(heap):
+        heap.extend(entries)
+        heapq.heapify(heap)
+    else:
+        for entry in entries:
+            heapq.heappush(heap, entry)
 
 
 class CommentRepository:
     __comments: dict[int, Comment]
+    __comments_by_post: dict[int, list[Comment]]
     __id_counter: Iterator[int]
 
     def __init__(self):
         self.__comments = {}
+        self.__comments_by_post = {}
         self.__id_counter = count(1)
 
     def add_comment(self, comment: Comment) -> int:
         comment_id = next(self.__id_counter)
         comment.id = comment_id
         self.__comments.update({comment_id: comment})
+        self.__comments_by_post.setdefault(comment.post.id, []).append(comment)
         return comment_id
 
+    def add_comments(self, comments: list[Comment]) -> list[int]:
+        """insere vários comentários de uma vez (inserção em lote)."""
+        ids = [next(self.__id_counter) for _ in comments]
+        for comment_id, comment in zip(ids, comments):
+            comment.id = comment_id
+            self.__comments_by_post.setdefault(comment.post.id, []).append(comment)
+        self.__comments.update(zip(ids, comments))
+        return ids
+
     def get_post_comments(self, post: Post) -> list[Comment]:
-        return [
-            comment
-            for comment in self.__comments.values()
-            if comment.post.id == post.id
-        ]
+        return list(self.__comments_by_post.get(post.id, []))
+
+    def iter_comments(self) -> Iterator[Comment]:
+        yield from self.__comments.values()
 
 
 class MediaRepository:
     __medias: dict[int, MediaFile]
     __id_counter: Iterator[int]
 
-    def __init__(self):
+    def __init__(self, event_manager: EventManager | None = None):
         self.__medias = {}
         self.__id_counter = count(1)
+        self.__event_manager = event_manager
+        # (site_id, hash do conteúdo) -> mídia, para achar reimportações
+        self.__by_hash: dict[tuple[int, str], MediaFile] = {}
 
     def add_midia(self, media: MediaFile) -> int:
         media_id = next(self.__id_counter)
         media.id = media_id
         self.__medias.update({media_id: media})
+        self.__index_hash(media)
+
+        if self.__event_manager:
+            self.__event_manager.notify("MEDIA_ADDED", site=media.site, media=media)
         return media_id
 
+    def add_medias(self, medias: list[MediaFile]) -> list[int]:
+        """
+        insere várias mídias de uma vez (inserção em lote).
+        os observadores recebem um único evento MEDIAS_ADDED para o lote.
+        """
+        ids = [next(self.__id_counter) for _ in medias]
+        for media_id, media in zip(ids, medias):
+            media.id = media_id
+            self.__index_hash(media)
+        self.__medias.update(zip(ids, medias))
+
+        if self.__event_manager and medias:
+            self.__event_manager.notify("MEDIAS_ADDED", medias=medias)
+        return ids
+
+    def iter_medias(self) -> Iterator[MediaFile]:
+        yield from self.__medias.values()
+
+    def get_site_media_by_hash(self, site: Site, content_hash: str) -> MediaFile | None:
+        """a mídia do site com esse conteúdo, se ele já foi importado."""
+        return self.__by_hash.get((site.id, content_hash))
+
     def get_site_medias(self, site: Site) -> list[MediaFile]:
         return [media for media in self.__medias.values() if media.site.id == site.id]
 
@@ -333,4 +592,31 @@ class MediaRepository:
             raise RepositoryError(f"Erro ao recuperar mídia: {str(e)}")
 
     def remove_media(self, media_id: int):
-        self.__medias.pop(media_id)
+        media = self.__medias.pop(media_id)
+        if media.content_hash and self.__by_hash.get((media.site.id, media.content_hash)) is media:
+            del self.__by_hash[(media.site.id, media.content_hash)]
+
+        if self.__event_manager:
+            self.__event_manager.notify("MEDIA_REMOVED", site=media.site, media=media)
+
+    def rename_media(self, media_id: int, filename: str) -> MediaFile:
+        """
+        troca o nome público da mídia; os posts que a usam passam a apontar para o novo nome.
+
+        raises:
+            ValidationError: Se media_id ou o nome são inválidos
+            ResourceNotFoundError: Se mídia não existe
+        """
+        filename = filename.strip()
+        if not filename or "/" in filename:
+            raise ValidationError(f"Nome de mídia inválido: '{filename}'.")
+        media = self.get_media_by_id(media_id)
+        media.filename = filename
+
+        if self.__event_manager:
+            self.__event_manager.notify("MEDIA_UPDATED", site=media.site, media=media)
+        return media
+
+    def __index_hash(self, media: MediaFile):
+        if media.content_hash:
+            self.__by_hash.setdefault((media.site.id, media.content_hash), media)
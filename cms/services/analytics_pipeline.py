@@ -0,0 +1,359 @@
+"""
+pipeline de ingestão de analytics em um processo separado.
+
+os produtores (menus, fachada, observadores) não constroem mais objetos
+AnalyticsEntry: eles empurram tuplas compactas numa multiprocessing.Queue.
+um processo agregador é o dono dos contadores e responde as consultas de
+contagem pela mesma fila, com a resposta voltando por um Pipe.
+
+o agregador guarda só contadores e os eventos mais recentes, não as entradas:
+iter_entries (exportação, relatórios por entrada) não é suportado.
+"""
+import multiprocessing
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from cms.events import EventManager, Observer
+from cms.exceptions import OperationFailedError
+from cms.models import (
+    AnalyticsEntry,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    SiteAction,
+    SiteAnalyticsEntry,
+)
+
+# escopo do evento, primeiro campo da tupla compacta
+SCOPE_SITE = 0
+SCOPE_POST = 1
+
+# tupla compacta: (escopo, action, user_id, site_id, post_id, timestamp)
+type CompactEvent = tuple[int, int, int, int, int, float]
+# chave de contagem: (escopo, action, site_id, post_id); 0 significa "qualquer"
+type CounterKey = tuple[int, int, int, int]
+
+_event_map: dict[str, tuple[int, int]] = {
+    "SITE_ACCESSED": (SCOPE_SITE, SiteAction.ACCESS.value),
+    "POST_VIEWED": (SCOPE_POST, PostAction.VIEW.value),
+    "POST_COMMENTED": (SCOPE_POST, PostAction.COMMENT.value),
+}
+
+
+def _run_aggregator(events, results, history_size: int):
+    """
+    laço do processo agregador. consome lotes de eventos e consultas na ordem
+    em que chegaram, então uma consulta sempre enxerga os eventos enviados antes dela.
+    """
+    counters: Counter[CounterKey] = Counter()
+    recent: deque[CompactEvent] = deque(maxlen=history_size)
+
+    while True:
+        message = events.get()
+        kind = message[0]
+
+        if kind == "events":
+            for scope, action, _user_id, site_id, post_id, _ts in message[1]:
+                counters[(scope, action, site_id, 0)] += 1
+                if post_id:
+                    counters[(scope, action, 0, post_id)] += 1
+            recent.extend(message[1])
+        elif kind == "query":
+            results.send([counters[key] for key in message[1]])
+        elif kind == "recent":
+            results.send(list(recent)[-message[1]:])
+        elif kind == "stop":
+            results.send(None)
+            break
+
+
+def _viewed_posts(entries: list[AnalyticsEntry]) -> list[Post]:
+    viewed = {
+        entry.post.id: entry.post
+        for entry in entries
+        if isinstance(entry, PostAnalyticsEntry) and entry.action == PostAction.VIEW
+    }
+    return list(viewed.values())
+
+
+class AnalyticsProducer:
+    """
+    lado produtor do pipeline. acumula tuplas num buffer local e envia em lotes,
+    para não pagar uma serialização por evento. pode ser passado para outros processos.
+    """
+
+    def __init__(self, events, batch_size: int = 256, max_delay: float = 0.5):
+        self._events = events
+        self._batch_size = batch_size
+        self._max_delay = max_delay
+        self._buffer: list[CompactEvent] = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # o buffer e o lock são locais a cada processo
+        return {
+            "_events": self._events,
+            "_batch_size": self._batch_size,
+            "_max_delay": self._max_delay,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._buffer = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+
+    def push(self, event: CompactEvent):
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(event)
+            if (
+                len(self._buffer) >= self._batch_size
+                or time.monotonic() - self._oldest >= self._max_delay
+            ):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._events.put(("events", self._buffer))
+            self._buffer = []
+
+
+class AnalyticsIngestionClient(Observer):
+    """
+    substituto do AnalyticsRepository no modo de ingestão multiprocesso.
+    tem a mesma interface de log/contagem, mas delega tudo ao agregador.
+    as contagens ficam em cache por no máximo `staleness` segundos.
+    """
+
+    def __init__(
+        self,
+        event_manager: EventManager | None = None,
+        staleness: float = 1.0,
+        batch_size: int = 256,
+        history_size: int = 1000,
+    ):
+        if staleness < 0:
+            raise ValueError("staleness não pode ser negativo.")
+
+        self.__event_manager = event_manager
+        self.__staleness = staleness
+        self.__batch_size = batch_size
+        self.__history_size = history_size
+        self.__cache: dict[CounterKey, tuple[int, float]] = {}
+        self.__cache_lock = threading.Lock()
+        self.__query_lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__process = None
+        self.__producer: AnalyticsProducer | None = None
+
+    def start(self) -> "AnalyticsIngestionClient":
+        if self.__process is not None:
+            return self
+
+        mp = multiprocessing.get_context("spawn")
+        self.__events = mp.Queue()
+        self.__results, child_results = mp.Pipe(duplex=False)
+        self.__process = mp.Process(
+            target=_run_aggregator,
+            args=(self.__events, child_results, self.__history_size),
+            name="cms-analytics-aggregator",
+            daemon=True,
+        )
+        self.__process.start()
+        # o buffer nunca segura eventos por mais da metade da janela de staleness
+        self.__producer = AnalyticsProducer(
+            self.__events, self.__batch_size, self.__staleness / 2
+        )
+
+        self.__stopped.clear()
+        threading.Thread(
+            target=self.__flush_periodically, name="cms-analytics-flusher", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        if self.__process is None:
+            return
+        self.__stopped.set()
+        self.__request(("stop",))
+        self.__process.join()
+        self.__process = None
+
+    @property
+    def producer(self) -> AnalyticsProducer:
+        """produtor que pode ser entregue a processos de trabalho."""
+        if self.__producer is None:
+            raise OperationFailedError("O pipeline de analytics não foi iniciado.")
+        return self.__producer
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        mapped = _event_map.get(event_type)
+        if not mapped:
+            return
+
+        user = kwargs.get("user")
+        site = kwargs.get("site")
+        post = kwargs.get("post")
+        scope, action = mapped
+        self.producer.push(
+            (
+                scope,
+                action,
+                user.id if user else 0,
+                site.id if site else 0,
+                post.id if post else 0,
+                time.time(),
+            )
+        )
+        if event_type == "POST_VIEWED" and post is not None:
+            self.__notify_views([post])
+
+    def log(self, entry: AnalyticsEntry) -> int:
+        self.__push_entry(entry)
+        self.__notify_views(_viewed_posts([entry]))
+        # no pipeline os ids são atribuídos apenas no agregador
+        return 0
+
+    def log_many(self, entries: list[AnalyticsEntry]) -> list[int]:
+        for entry in entries:
+            self.__push_entry(entry)
+        self.__notify_views(_viewed_posts(entries))
+        return [0] * len(entries)
+
+    def __push_entry(self, entry: AnalyticsEntry):
+        if isinstance(entry, PostAnalyticsEntry):
+            scope, post_id = SCOPE_POST, entry.post.id
+        elif isinstance(entry, SiteAnalyticsEntry):
+            scope, post_id = SCOPE_SITE, 0
+        else:
+            raise OperationFailedError(f"Entrada de analytics não suportada: {entry}")
+
+        self.producer.push(
+            (
+                scope,
+                entry.action.value,
+                entry.user.id,
+                entry.site.id,
+                post_id,
+                entry.created_at.timestamp(),
+            )
+        )
+
+    def iter_entries(self):
+        """
+        raises:
+            OperationFailedError: Sempre; o agregador não guarda as entradas
+        """
+        raise OperationFailedError(
+            "O pipeline de analytics só guarda contadores; exportar eventos e os "
+            "relatórios por entrada exigem rodar sem o pipeline (CMS_ANALYTICS_PIPELINE)."
+        )
+
+    def show_logs(self, limit: int = 5):
+        self.producer.flush()
+        for scope, action, user_id, site_id, post_id, ts in self.__request(
+            ("recent", limit)
+        ):
+            created_at = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+            if scope == SCOPE_SITE:
+                print(f"Site {site_id} - User {user_id}@{created_at} - {SiteAction(action)}")
+            else:
+                print(f"Site {site_id} - Post {post_id}")
+                print(f"  User {user_id}@{created_at} - {PostAction(action)}")
+
+    def get_site_accesses(self, site_id: int) -> int:
+        return self._count((SCOPE_SITE, SiteAction.ACCESS.value, site_id, 0))
+
+    def get_site_post_creation_count(self, site_id: int) -> int:
+        return self._count((SCOPE_SITE, SiteAction.CREATE_POST.value, site_id, 0))
+
+    def get_site_media_upload_count(self, site_id: int) -> int:
+        return self._count((SCOPE_SITE, SiteAction.UPLOAD_MEDIA.value, site_id, 0))
+
+    def get_site_total_post_views(self, site_id: int) -> int:
+        return self._count((SCOPE_POST, PostAction.VIEW.value, site_id, 0))
+
+    def get_site_total_post_shares(self, site_id: int) -> int:
+        return self._count((SCOPE_POST, PostAction.SHARE.value, site_id, 0))
+
+    def get_site_total_post_comments(self, site_id: int) -> int:
+        return self._count((SCOPE_POST, PostAction.COMMENT.value, site_id, 0))
+
+    def get_post_views(self, post_id: int) -> int:
+        return self._count((SCOPE_POST, PostAction.VIEW.value, 0, post_id))
+
+    def get_post_shares(self, post_id: int) -> int:
+        return self._count((SCOPE_POST, PostAction.SHARE.value, 0, post_id))
+
+    def get_post_comments(self, post_id: int) -> int:
+        return self._count((SCOPE_POST, PostAction.COMMENT.value, 0, post_id))
+
+    def get_posts_views(self, post_ids: list[int]) -> list[int]:
+        """visualizações de vários posts numa única ida ao agregador."""
+        return self.get_counts(
+            [(SCOPE_POST, PostAction.VIEW.value, 0, post_id) for post_id in post_ids]
+        )
+
+    def get_posts_comments(self, post_ids: list[int]) -> list[int]:
+        return self.get_counts(
+            [(SCOPE_POST, PostAction.COMMENT.value, 0, post_id) for post_id in post_ids]
+        )
+
+    def get_counts(self, keys: list[CounterKey]) -> list[int]:
+        """
+        consulta várias chaves numa única ida ao agregador. útil para ordenar
+        muitos posts por visualização sem uma chamada de IPC por post.
+        """
+        now = time.monotonic()
+        # o cliente é compartilhado pelas threads da API de escrita e do front end
+        with self.__cache_lock:
+            counts = {}
+            missing = []
+            for key in dict.fromkeys(keys):
+                cached = self.__cache.get(key)
+                if cached is None or now - cached[1] > self.__staleness:
+                    missing.append(key)
+                else:
+                    counts[key] = cached[0]
+
+        if missing:
+            self.producer.flush()
+            values = self.__request(("query", missing))
+            with self.__cache_lock:
+                for key, value in zip(missing, values):
+                    self.__cache[key] = (value, now)
+            counts.update(zip(missing, values))
+
+        return [counts[key] for key in keys]
+
+    def _count(self, key: CounterKey) -> int:
+        return self.get_counts([key])[0]
+
+    def __notify_views(self, posts: list[Post]):
+        # mesmo aviso do AnalyticsRepository, para o autocompletar reordenar
+        if self.__event_manager and posts:
+            self.__event_manager.notify("POST_VIEWS_COUNTED", posts=posts)
+
+    def __request(self, message: tuple):
+        if self.__process is None:
+            raise OperationFailedError("O pipeline de analytics não foi iniciado.")
+        with self.__query_lock:
+            self.__events.put(message)
+            try:
+                return self.__results.recv()
+            except EOFError:
+                raise OperationFailedError("O processo agregador de analytics foi encerrado.")
+
+    def __flush_periodically(self):
+        interval = max(self.__staleness / 2, 0.01)
+        while not self.__stopped.wait(interval):
+            self.__producer.flush()
@@ -62,9 +62,18 @@ class AnalyticsRepositoryProxy(AnalyticsRepository):
     def get_post_comments(self, post_id: int) -> int:
         return self.__real_repo.get_post_comments(post_id)
 
+    def get_posts_views(self, post_ids: list[int]) -> list[int]:
+        return self.__real_repo.get_posts_views(post_ids)
+
+    def get_posts_comments(self, post_ids: list[int]) -> list[int]:
+        return self.__real_repo.get_posts_comments(post_ids)
+
     def log(self, entry: AnalyticsEntry) -> int:
         return self.__real_repo.log(entry)
 
+    def log_many(self, entries: list[AnalyticsEntry]) -> list[int]:
+        return self.__real_repo.log_many(entries)
+
     def show_logs(self, limit: int = 5) -> None:
         if self.__current_user.role != UserRole.ADMIN:
             raise PermissionError("Apenas admins podem ver logs do sistema.")
@@ -0,0 +1,297 @@
+"""
+autocompletar de títulos de posts e nomes de arquivos de mídia, por site.
+
+as chaves (texto dobrado, sem acentos) de cada site ficam num vetor ordenado, e
+um prefixo vira uma faixa contígua desse vetor, achada por bisect. faixas
+pequenas são ranqueadas na hora; para os prefixos com muitas chaves (os
+primeiros caracteres digitados) o top-k por visualizações é guardado e mantido
+incrementalmente: visualizações só crescem, então basta oferecer ao top-k de
+cada prefixo o post que acabou de ser visto.
+
+como o SearchIndex, é um observador: posts novos, conteúdo adicionado, mídias
+adicionadas/removidas e visualizações são enfileirados e aplicados na próxima
+consulta.
+"""
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from cms.events import Observer
+from cms.models import MediaFile, Post, Site
+from cms.services.text_processing import fold_text
+
+POST_KIND = "post"
+MEDIA_KIND = "media"
+
+# maior k servido pelos top-k guardados; acima disso a faixa é ranqueada na hora
+MAX_K = 20
+# faixas até esse tamanho são ranqueadas na hora, sem guardar nada
+DIRECT_MAX_RANGE = 16
+# prefixos com top-k guardado por site; os menos usados são descartados
+MAX_CACHED_PREFIXES = 4096
+# acima dessa quantidade de chaves novas num site, ordena tudo de uma vez
+BULK_SORT_MIN = 64
+
+_KEY_END = chr(0x10FFFF)
+
+# chave: (texto dobrado, tipo, id, texto original)
+type _Key = tuple[str, str, int, str]
+# entrada de um top-k: (-visualizações, texto dobrado, tipo, id, texto original)
+type _Ranked = tuple[int, str, str, int, str]
+
+
+@dataclass
+class Completion:
+    kind: str
+    item: Post | MediaFile
+    text: str
+    views: int
+
+
+class _SiteCompletions:
+    """chaves ordenadas de um site e os top-k guardados por prefixo."""
+
+    __slots__ = ("keys", "tops")
+
+    def __init__(self):
+        self.keys: list[_Key] = []
+        self.tops: OrderedDict[str, list[_Ranked]] = OrderedDict()
+
+    def key_range(self, prefix: str) -> tuple[int, int]:
+        keys = self.keys
+        return bisect_left(keys, (prefix,)), bisect_left(keys, (prefix + _KEY_END,))
+
+
+class Autocomplete(Observer):
+    def __init__(self, analytics_repo):
+        self.analytics_repo = analytics_repo
+        self.__sites: dict[int, _SiteCompletions] = {}
+        # (tipo, id) -> item e suas chaves (texto dobrado, texto original)
+        self.__items: dict[tuple[str, int], Post | MediaFile] = {}
+        self.__item_keys: dict[tuple[str, int], list[tuple[str, str]]] = {}
+        self.__versions: dict[int, int] = {}
+        self.__pending_posts: dict[int, Post] = {}
+        # media_id -> mídia adicionada, ou None se foi removida
+        self.__pending_medias: dict[int, MediaFile | None] = {}
+        self.__viewed: set[int] = set()
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        with self.__lock:
+            if event_type == "POST_VIEWS_COUNTED":
+                self.__viewed.update(post.id for post in kwargs["posts"])
+            elif event_type in ("MEDIA_ADDED", "MEDIA_UPDATED"):
+                self.__pending_medias[kwargs["media"].id] = kwargs["media"]
+            elif event_type == "MEDIA_REMOVED":
+                self.__pending_medias[kwargs["media"].id] = None
+            elif event_type == "MEDIAS_ADDED":
+                for media in kwargs["medias"]:
+                    self.__pending_medias[media.id] = media
+            else:
+                post = kwargs.get("post")
+                if post is not None:
+                    self.__pending_posts[post.id] = post
+                for post in kwargs.get("posts", ()):
+                    self.__pending_posts[post.id] = post
+
+    def refresh(self):
+        """aplica agora as mudanças pendentes (ex: logo depois de uma importação)."""
+        with self.__lock:
+            self.__drain()
+
+    def complete(
+        self,
+        site: Site,
+        prefix: str,
+        limit: int = 10,
+        include_scheduled: bool = True,
+    ) -> list[Completion]:
+        """
+        os itens do site cujo título (ou nome de arquivo) começa com o prefixo,
+        dos posts mais vistos para os menos vistos; mídias vêm depois, em
+        ordem alfabética. cada post aparece uma vez, mesmo com vários idiomas.
+        """
+        folded = fold_text(prefix)
+        if prefix[-1:].isspace() and folded:
+            # o espaço final indica que a palavra acabou
+            folded += " "
+        if not folded or limit < 1:
+            return []
+
+        with self.__lock:
+            self.__drain()
+            completions = self.__sites.get(site.id)
+            if completions is None:
+                return []
+
+            now = datetime.now()
+            items = self.__items
+
+            def visible(ranked: _Ranked) -> bool:
+                if include_scheduled or ranked[2] != POST_KIND:
+                    return True
+                return items[(POST_KIND, ranked[3])].scheduled_to <= now
+
+            top = None
+            cached = self.__cached_top(completions, folded) if limit <= MAX_K else None
+            if cached is not None:
+                top = [ranked for ranked in cached if visible(ranked)][:limit]
+                if len(top) < limit and len(cached) == MAX_K:
+                    # posts agendados ocuparam o top-k guardado
+                    top = None
+            if top is None:
+                lo, hi = completions.key_range(folded)
+                top = self.__rank(completions.keys[lo:hi], limit, visible)
+
+            return [
+                Completion(kind, items[(kind, item_id)], text, -negative_views)
+                for negative_views, _, kind, item_id, text in top
+            ]
+
+    def __cached_top(self, completions: _SiteCompletions, prefix: str) -> list[_Ranked] | None:
+        """o top-k guardado do prefixo, montado na hora se a faixa for grande."""
+        tops = completions.tops
+        top = tops.get(prefix)
+        if top is not None:
+            tops.move_to_end(prefix)
+            return top
+
+        lo, hi = completions.key_range(prefix)
+        if hi - lo <= DIRECT_MAX_RANGE:
+            return None
+        top = tops[prefix] = self.__rank(completions.keys[lo:hi], MAX_K)
+        if len(tops) > MAX_CACHED_PREFIXES:
+            tops.popitem(last=False)
+        return top
+
+    def __rank(self, keys: list[_Key], limit: int, accept=None) -> list[_Ranked]:
+        # as chaves estão ordenadas, então a primeira de cada item é a menor
+        first: dict[tuple[str, int], tuple[str, str]] = {}
+        for folded, kind, item_id, text in keys:
+            first.setdefault((kind, item_id), (folded, text))
+        views = self.__views([item_id for kind, item_id in first if kind == POST_KIND])
+        candidates = (
+            (-views.get(item_id, 0) if kind == POST_KIND else 0, folded, kind, item_id, text)
+            for (kind, item_id), (folded, text) in first.items()
+        )
+        if accept is not None:
+            candidates = filter(accept, candidates)
+        return heapq.nsmallest(limit, candidates)
+
+    def __views(self, post_ids: list[int]) -> dict[int, int]:
+        # uma consulta para todos os posts (no pipeline, uma ida ao agregador)
+        if not post_ids:
+            return {}
+        return dict(zip(post_ids, self.analytics_repo.get_posts_views(post_ids)))
+
+    def __drain(self):
+        added: dict[int, list[_Key]] = {}
+
+        pending_posts, self.__pending_posts = self.__pending_posts, {}
+        for post in pending_posts.values():
+            if self.__versions.get(post.id) == post.version:
+                continue
+            titles = {}
+            for language in post.get_languages():
+                title = post.get_content_by_language(language).title
+                titles.setdefault(fold_text(title), title)
+            self.__remove((POST_KIND, post.id))
+            self.__add(post.site.id, POST_KIND, post, titles, added)
+            self.__versions[post.id] = post.version
+
+        pending_medias, self.__pending_medias = self.__pending_medias, {}
+        for media_id, media in pending_medias.items():
+            self.__remove((MEDIA_KIND, media_id))
+            if media is not None:
+                keys = {fold_text(media.filename): media.filename}
+                self.__add(media.site.id, MEDIA_KIND, media, keys, added)
+
+        viewed, self.__viewed = self.__viewed, set()
+        viewed = [
+            post_id
+            for post_id in viewed
+            if (POST_KIND, post_id) in self.__item_keys
+            and self.__sites[self.__items[(POST_KIND, post_id)].site.id].tops
+        ]
+        # só importam os posts oferecidos a algum top-k guardado: as visualizações
+        # dos novos e dos vistos vêm numa consulta só
+        offered = {
+            key[2]
+            for site_id, keys in added.items()
+            if self.__sites[site_id].tops
+            for key in keys
+            if key[1] == POST_KIND
+        }
+        views = self.__views([*offered.union(viewed)])
+
+        for site_id, keys in added.items():
+            completions = self.__sites[site_id]
+            if len(keys) > BULK_SORT_MIN:
+                completions.keys.extend(keys)
+                completions.keys.sort()
+            else:
+                for key in keys:
+                    insort(completions.keys, key)
+            for folded, kind, item_id, _ in keys:
+                item_views = views.get(item_id, 0) if kind == POST_KIND else 0
+                self.__offer(completions, kind, item_id, folded, item_views)
+
+        for post_id in viewed:
+            post = self.__items[(POST_KIND, post_id)]
+            completions = self.__sites[post.site.id]
+            for folded, _ in self.__item_keys[(POST_KIND, post_id)]:
+                self.__offer(completions, POST_KIND, post_id, folded, views[post_id])
+
+    def __add(self, site_id: int, kind: str, item, keys: dict[str, str], added: dict):
+        if site_id not in self.__sites:
+            self.__sites[site_id] = _SiteCompletions()
+        self.__items[(kind, item.id)] = item
+        self.__item_keys[(kind, item.id)] = sorted(keys.items())
+        added.setdefault(site_id, []).extend(
+            (folded, kind, item.id, text) for folded, text in keys.items()
+        )
+
+    def __remove(self, item_key: tuple[str, int]):
+        keys = self.__item_keys.pop(item_key, None)
+        if keys is None:
+            return
+        item = self.__items.pop(item_key)
+        completions = self.__sites[item.site.id]
+        kind, item_id = item_key
+        for folded, text in keys:
+            key = (folded, kind, item_id, text)
+            index = bisect_left(completions.keys, key)
+            if index < len(completions.keys) and completions.keys[index] == key:
+                del completions.keys[index]
+            # um top-k que tinha o item não sabe quem entra no lugar: é refeito
+            for end in range(1, len(folded) + 1):
+                top = completions.tops.get(folded[:end])
+                if top is not None and any(r[2] == kind and r[3] == item_id for r in top):
+                    del completions.tops[folded[:end]]
+
+    def __offer(
+        self, completions: _SiteCompletions, kind: str, item_id: int, folded: str, views: int
+    ):
+        """oferece o item aos top-k guardados dos prefixos da chave."""
+        tops = completions.tops
+        if not tops:
+            return
+        item_keys = self.__item_keys[(kind, item_id)]
+        for end in range(1, len(folded) + 1):
+            prefix = folded[:end]
+            top = tops.get(prefix)
+            if top is None:
+                continue
+            # a menor chave do item com esse prefixo é a que aparece no resultado
+            key_folded, text = next(k for k in item_keys if k[0].startswith(prefix))
+            ranked = (-views, key_folded, kind, item_id, text)
+            for index, other in enumerate(top):
+                if other[2] == kind and other[3] == item_id:
+                    del top[index]
+                    break
+            if len(top) < MAX_K or ranked < top[-1]:
+                insort(top, ranked)
+                del top[MAX_K:]
@@ -0,0 +1,301 @@
+"""
+índice de corpus por site: palavras-chave por TF-IDF e conteúdo quase duplicado.
+
+as frequências de documento (em quantos conteúdos do site e idioma cada termo
+aparece) dizem se uma palavra-chave é distintiva ou só comum no site inteiro.
+
+para duplicatas, cada conteúdo (post, idioma) recebe uma assinatura MinHash dos
+seus shingles (sequências de 3 palavras). a assinatura é calculada com um único
+hash por shingle (one permutation hashing): o hash escolhe um dos compartimentos
+e o mínimo de cada compartimento forma a assinatura; compartimentos vazios
+copiam o vizinho (densificação). as assinaturas são cortadas em faixas, e cada
+faixa vai para uma tabela de hash do site (LSH), sem separar idiomas: conteúdo
+copiado para outro idioma também é encontrado. uma consulta só compara o
+conteúdo com quem caiu em alguma faixa igual, sem percorrer o site.
+
+como o SearchIndex, é um observador: os posts ficam pendentes e são indexados
+na próxima consulta, e só quando Post.version muda.
+"""
+import heapq
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from itertools import combinations
+
+from cms.events import Observer
+from cms.models import Language, LanguageCode, Post, Site
+from cms.services.text_processing import STOPWORDS, iter_content_text, tokenize
+
+SHINGLE_SIZE = 3
+MINHASH_SIZE = 64
+# 16 faixas de 4: pares com similaridade ~0.5 já têm chance de 50% de colidir
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_SIZE // LSH_BANDS
+DUPLICATE_MIN_SIMILARITY = 0.8
+
+_HASH_MASK = (1 << 64) - 1
+_BIN_BITS = MINHASH_SIZE.bit_length() - 1
+_EMPTY = _HASH_MASK
+
+# (post_id, idioma)
+type DocKey = tuple[int, LanguageCode]
+
+
+@dataclass
+class KeywordSuggestion:
+    term: str
+    count: int
+    document_frequency: int
+    score: float
+
+
+@dataclass
+class DuplicateMatch:
+    post: Post
+    language: Language
+    other_post: Post
+    other_language: Language
+    similarity: float
+
+
+def minhash_signature(tokens: list[str]) -> tuple[int, ...]:
+    """assinatura MinHash dos shingles de palavras do texto."""
+    if len(tokens) >= SHINGLE_SIZE:
+        shingles = {
+            " ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)
+        }
+    else:
+        shingles = {" ".join(tokens)}
+
+    mins = [_EMPTY] * MINHASH_SIZE
+    for shingle in shingles:
+        value = hash(shingle) & _HASH_MASK
+        slot = value & (MINHASH_SIZE - 1)
+        value >>= _BIN_BITS
+        if value < mins[slot]:
+            mins[slot] = value
+
+    # densificação: o compartimento vazio pega o valor do próximo não vazio
+    if _EMPTY in mins:
+        for slot in range(MINHASH_SIZE):
+            offset = 1
+            while mins[slot] == _EMPTY and offset < MINHASH_SIZE:
+                donor = mins[(slot + offset) % MINHASH_SIZE]
+                if donor != _EMPTY:
+                    # o deslocamento entra no valor para não criar colisões artificiais
+                    mins[slot] = (donor + offset * 0x9E3779B97F4A7C15) & _HASH_MASK
+                offset += 1
+    return tuple(mins)
+
+
+def signature_similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """estimativa da similaridade de Jaccard entre os dois conjuntos de shingles."""
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_SIZE
+
+
+class _SiteCorpus:
+    """frequências de documento por idioma e as tabelas LSH de um site."""
+
+    __slots__ = ("doc_freq", "doc_count", "buckets")
+
+    def __init__(self):
+        self.doc_freq: dict[LanguageCode, Counter[str]] = {}
+        self.doc_count: Counter[LanguageCode] = Counter()
+        # (faixa, valores da faixa) -> conteúdos
+        self.buckets: dict[tuple[int, tuple[int, ...]], set[DocKey]] = {}
+
+
+class CorpusIndex(Observer):
+    def __init__(self):
+        self.__sites: dict[int, _SiteCorpus] = {}
+        self.__term_counts: dict[DocKey, Counter[str]] = {}
+        self.__signatures: dict[DocKey, tuple[int, ...]] = {}
+        self.__posts: dict[int, Post] = {}
+        self.__languages: dict[int, dict[LanguageCode, Language]] = {}
+        self.__versions: dict[int, int] = {}
+        self.__pending: dict[int, Post] = {}
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        post = kwargs.get("post")
+        posts = kwargs.get("posts", ())
+        with self.__lock:
+            if post is not None:
+                self.__pending[post.id] = post
+            for post in posts:
+                self.__pending[post.id] = post
+
+    def index_post(self, post: Post):
+        """(re)indexa o post agora, se ele mudou desde a última indexação."""
+        with self.__lock:
+            self.__index(post)
+
+    def refresh(self):
+        """indexa agora os posts pendentes (ex: logo depois de uma importação)."""
+        with self.__lock:
+            self.__drain()
+
+    def keywords(self, post: Post, language: Language, limit: int = 10) -> list[KeywordSuggestion]:
+        """
+        termos do conteúdo com maior TF-IDF em relação aos outros conteúdos do
+        site no mesmo idioma: frequentes no post e raros no resto do site.
+        """
+        with self.__lock:
+            self.__drain()
+            self.__index(post)
+            counts = self.__term_counts.get((post.id, language.code))
+            if not counts:
+                return []
+
+            corpus = self.__sites[post.site.id]
+            doc_freq = corpus.doc_freq[language.code]
+            total = corpus.doc_count[language.code]
+            suggestions = (
+                KeywordSuggestion(
+                    term,
+                    count,
+                    doc_freq[term],
+                    (1 + math.log(count)) * math.log((1 + total) / (1 + doc_freq[term])),
+                )
+                for term, count in counts.items()
+            )
+            return heapq.nlargest(limit, suggestions, key=lambda suggestion: suggestion.score)
+
+    def near_duplicates(
+        self,
+        post: Post,
+        language: Language | None = None,
+        min_similarity: float = DUPLICATE_MIN_SIMILARITY,
+    ) -> list[DuplicateMatch]:
+        """
+        conteúdos do mesmo site, em qualquer idioma, quase iguais ao do post.
+        sem idioma, compara todos os idiomas do post.
+        """
+        with self.__lock:
+            self.__drain()
+            self.__index(post)
+            codes = [language.code] if language else list(self.__languages.get(post.id, ()))
+            corpus = self.__sites.get(post.site.id)
+            matches: list[DuplicateMatch] = []
+            for code in codes:
+                key = (post.id, code)
+                signature = self.__signatures.get(key)
+                if signature is None:
+                    continue
+                candidates: set[DocKey] = set()
+                for band in range(LSH_BANDS):
+                    candidates |= corpus.buckets.get(self.__band(signature, band), set())
+                candidates = {other for other in candidates if other[0] != post.id}
+                matches.extend(self.__verified(key, candidates, min_similarity))
+            matches.sort(key=lambda match: -match.similarity)
+            return matches
+
+    def duplicate_pairs(
+        self, site: Site, min_similarity: float = DUPLICATE_MIN_SIMILARITY
+    ) -> list[DuplicateMatch]:
+        """
+        todos os pares de conteúdos quase duplicados do site, de posts
+        diferentes. só os pares que colidem em alguma faixa são comparados.
+        """
+        with self.__lock:
+            self.__drain()
+            corpus = self.__sites.get(site.id)
+            if corpus is None:
+                return []
+
+            seen: set[tuple[DocKey, DocKey]] = set()
+            matches: list[DuplicateMatch] = []
+            for members in corpus.buckets.values():
+                if len(members) < 2:
+                    continue
+                for a, b in combinations(sorted(members), 2):
+                    if a[0] == b[0] or (a, b) in seen:
+                        continue
+                    seen.add((a, b))
+                    matches.extend(self.__verified(a, (b,), min_similarity))
+            matches.sort(key=lambda match: -match.similarity)
+            return matches
+
+    def __verified(self, key: DocKey, candidates, min_similarity: float) -> list[DuplicateMatch]:
+        signature = self.__signatures[key]
+        matches = []
+        for other in candidates:
+            similarity = signature_similarity(signature, self.__signatures[other])
+            if similarity >= min_similarity:
+                matches.append(
+                    DuplicateMatch(
+                        self.__posts[key[0]],
+                        self.__languages[key[0]][key[1]],
+                        self.__posts[other[0]],
+                        self.__languages[other[0]][other[1]],
+                        similarity,
+                    )
+                )
+        return matches
+
+    @staticmethod
+    def __band(signature: tuple[int, ...], band: int) -> tuple[int, tuple[int, ...]]:
+        return band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+
+    def __drain(self):
+        pending, self.__pending = self.__pending, {}
+        for post in pending.values():
+            self.__index(post)
+
+    def __index(self, post: Post):
+        if self.__versions.get(post.id) == post.version:
+            return
+
+        self.__remove(post.id)
+        corpus = self.__sites.get(post.site.id)
+        if corpus is None:
+            corpus = self.__sites[post.site.id] = _SiteCorpus()
+
+        languages: dict[LanguageCode, Language] = {}
+        for language in post.get_languages():
+            content = post.get_content_by_language(language)
+            tokens: list[str] = []
+            for text in iter_content_text(content):
+                tokens.extend(tokenize(text, keep_stopwords=True))
+            if not tokens:
+                continue
+
+            key = (post.id, language.code)
+            counts = Counter(token for token in tokens if token not in STOPWORDS)
+            self.__term_counts[key] = counts
+            corpus.doc_freq.setdefault(language.code, Counter()).update(counts.keys())
+            corpus.doc_count[language.code] += 1
+
+            signature = self.__signatures[key] = minhash_signature(tokens)
+            for band in range(LSH_BANDS):
+                corpus.buckets.setdefault(self.__band(signature, band), set()).add(key)
+            languages[language.code] = language
+
+        self.__posts[post.id] = post
+        self.__languages[post.id] = languages
+        self.__versions[post.id] = post.version
+
+    def __remove(self, post_id: int):
+        post = self.__posts.pop(post_id, None)
+        if post is None:
+            return
+        corpus = self.__sites[post.site.id]
+        for code in self.__languages.pop(post_id, {}):
+            key = (post_id, code)
+            counts = self.__term_counts.pop(key)
+            doc_freq = corpus.doc_freq[code]
+            for term in counts:
+                doc_freq[term] -= 1
+                if not doc_freq[term]:
+                    del doc_freq[term]
+            corpus.doc_count[code] -= 1
+
+            signature = self.__signatures.pop(key)
+            for band in range(LSH_BANDS):
+                bucket_key = self.__band(signature, band)
+                bucket = corpus.buckets[bucket_key]
+                bucket.discard(key)
+                if not bucket:
+                    del corpus.buckets[bucket_key]
+        self.__versions.pop(post_id, None)
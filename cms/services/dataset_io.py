@@ -0,0 +1,489 @@
+"""
+exportação e importação do conjunto de dados completo do CMS em NDJSON.
+
+o arquivo começa com um cabeçalho e segue com um registro por linha, na ordem
+de dependência: usuários, sites, permissões, mídias, posts (com todos os
+Contents e blocos), comentários e eventos de analytics. cada registro tem um
+campo "kind" e referencia os outros só pelo id de origem.
+
+os dois lados trabalham em streaming. a exportação é uma cadeia de geradores
+sobre os repositórios; a importação lê uma linha por vez, guarda apenas os
+mapas de id de origem -> id novo (eventos não entram em mapa nenhum) e grava
+em lotes com as inserções em lote dos repositórios. com isso milhões de linhas
+de analytics passam com memória constante além da que o próprio repositório
+ocupa.
+"""
+import os
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from cms.context import AppContext
+from cms.exceptions import CMSException, ValidationError
+from cms.models import (
+    AnalyticsEntry,
+    CaroulselBlock,
+    Comment,
+    Content,
+    ContentBlock,
+    MediaBlock,
+    MediaFile,
+    MediaType,
+    Permission,
+    Post,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    SiteTemplateType,
+    TextBlock,
+    User,
+    UserRole,
+)
+from cms.services.ndjson import open_text, read_ndjson, write_ndjson
+
+DATASET_FORMAT = "cms-dataset"
+DATASET_VERSION = 1
+DEFAULT_BATCH_SIZE = 1000
+
+# chaves de metadata do analytics que guardam ids e precisam ser remapeadas
+_METADATA_REFS = {"post_id": "post", "comment_id": "comment"}
+
+
+# ---- serialização ----
+
+
+def user_to_dict(user: User) -> dict:
+    return {
+        "id": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "email": user.email,
+        "username": user.username,
+        "password": user.password,
+        "role": user.role.name,
+    }
+
+
+def site_to_dict(site: Site) -> dict:
+    return {
+        "id": site.id,
+        "owner_id": site.owner.id,
+        "name": site.name,
+        "description": site.description,
+        "template": site.template.name,
+    }
+
+
+def permission_to_dict(permission: Permission) -> dict:
+    return {"user_id": permission.user.id, "site_id": permission.site.id}
+
+
+def media_to_dict(media: MediaFile) -> dict:
+    return {
+        "id": media.id,
+        "uploader_id": media.uploader.id,
+        "site_id": media.site.id,
+        "filename": media.filename,
+        "path": str(media.path),
+        "media_type": media.media_type.name,
+        "width": media.width,
+        "height": media.height,
+        "duration": media.duration,
+        "size": media.size,
+        "content_hash": media.content_hash,
+    }
+
+
+def block_to_dict(block: ContentBlock) -> dict:
+    if isinstance(block, TextBlock):
+        return {"type": "text", "text": block.text}
+    if isinstance(block, MediaBlock):
+        return {"type": "media", "media_id": block.media.id, "alt": block.alt}
+    if isinstance(block, CaroulselBlock):
+        return {
+            "type": "carousel",
+            "media_ids": [media.id for media in block.medias],
+            "alt": block.alt,
+        }
+    raise ValidationError(f"Bloco não suportado: {type(block).__name__}")
+
+
+def post_to_dict(post: Post) -> dict:
+    return {
+        "id": post.id,
+        "site_id": post.site.id,
+        "poster_id": post.poster.id,
+        "created_at": post.created_at.isoformat(),
+        "scheduled_to": post.scheduled_to.isoformat(),
+        "contents": [
+            {
+                "language": language.code,
+                "title": content.title,
+                "blocks": [block_to_dict(block) for block in content.body],
+            }
+            for language in post.get_languages()
+            for content in (post.get_content_by_language(language),)
+        ],
+    }
+
+
+def comment_to_dict(comment: Comment) -> dict:
+    return {
+        "id": comment.id,
+        "post_id": comment.post.id,
+        "commenter_id": comment.commenter.id,
+        "body": comment.body,
+        "created_at": comment.created_at.isoformat(),
+    }
+
+
+def entry_to_dict(entry: AnalyticsEntry) -> dict:
+    record = {
+        "id": entry.id,
+        "user_id": entry.user.id,
+        "site_id": entry.site.id,
+        "action": entry.action.name,
+        "created_at": entry.created_at.isoformat(),
+    }
+    if isinstance(entry, PostAnalyticsEntry):
+        record["post_id"] = entry.post.id
+    if entry.metadata:
+        record["metadata"] = entry.metadata
+    return record
+
+
+# ---- exportação ----
+
+
+def _tagged(kind: str, to_dict: Callable, items: Iterable) -> Iterator[dict]:
+    for item in items:
+        record = to_dict(item)
+        record["kind"] = kind
+        yield record
+
+
+def iter_dataset(context: AppContext) -> Iterator[dict]:
+    """gera o cabeçalho e todos os registros, na ordem de dependência."""
+    yield {"kind": "header", "format": DATASET_FORMAT, "version": DATASET_VERSION}
+    yield from _tagged("user", user_to_dict, context.user_repo.get_users())
+    yield from _tagged("site", site_to_dict, context.site_repo.get_sites())
+    yield from _tagged("permission", permission_to_dict, context.permission_repo.iter_permissions())
+    yield from _tagged("media", media_to_dict, context.media_repo.iter_medias())
+    yield from _tagged("post", post_to_dict, context.post_repo.iter_posts())
+    yield from _tagged("comment", comment_to_dict, context.comment_repo.iter_comments())
+    yield from _tagged("event", entry_to_dict, context.analytics_repo.iter_entries())
+
+
+def count_kinds(records: Iterable[dict], counts: Counter) -> Iterator[dict]:
+    """repassa os registros contando quantos de cada tipo passaram."""
+    for record in records:
+        counts[record["kind"]] += 1
+        yield record
+
+
+def save_dataset(context: AppContext, path: str, compressed: bool | None = None) -> Counter:
+    """
+    grava o conjunto de dados em `path` ("-" é stdout). arquivos comuns são
+    escritos num temporário e só substituem o destino no final.
+    """
+    counts: Counter = Counter()
+    if path == "-":
+        with open_text(path, "w", compressed) as stream:
+            write_ndjson(stream, count_kinds(iter_dataset(context), counts))
+        return counts
+
+    target = Path(path)
+    tmp_path = target.with_name(target.name + ".tmp")
+    if compressed is None:
+        compressed = target.name.endswith(".gz")
+    with open_text(str(tmp_path), "w", compressed) as stream:
+        write_ndjson(stream, count_kinds(iter_dataset(context), counts))
+    os.replace(tmp_path, target)
+    return counts
+
+
+def dataset_content_hashes(path: str) -> set[str]:
+    """hashes dos blobs usados pelas mídias de um conjunto de dados, sem importá-lo."""
+    with open_text(path) as stream:
+        return {
+            record["content_hash"]
+            for _, record in read_ndjson(stream)
+            if record.get("kind") == "media" and record.get("content_hash")
+        }
+
+
+# ---- importação ----
+
+
+def _parse_datetime(value) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Data inválida: {value!r}.")
+
+
+def _parse_dimension(value) -> int | None:
+    # exportações antigas guardavam as dimensões como texto
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Dimensão inválida: {value!r}.")
+
+
+class DatasetImporter:
+    """
+    carrega um conjunto de dados exportado por iter_dataset no AppContext.
+    os objetos recebem ids novos; as referências entre registros são
+    resolvidas pelos mapas de id de origem -> id novo.
+    """
+
+    def __init__(self, context: AppContext, batch_size: int = DEFAULT_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser positivo.")
+        self.__context = context
+        self.__batch_size = batch_size
+        self.__ids: dict[str, dict[int, int]] = {
+            "user": {},
+            "site": {},
+            "media": {},
+            "post": {},
+            "comment": {},
+        }
+        self.__last: dict[str, tuple[int, object]] = {}
+        # registros já convertidos esperando a próxima inserção em lote
+        self.__pending_kind: str | None = None
+        self.__pending_sources: list[int] = []
+        self.__pending: list = []
+        self.__readers: dict[str, Callable[[dict], object]] = {
+            "user": self.__read_user,
+            "site": self.__read_site,
+            "permission": self.__read_permission,
+            "media": self.__read_media,
+            "post": self.__read_post,
+            "comment": self.__read_comment,
+            "event": self.__read_event,
+        }
+
+    def load(self, path: str, compressed: bool | None = None) -> Counter:
+        with open_text(path, "r", compressed) as stream:
+            return self.import_records(read_ndjson(stream))
+
+    def import_records(self, records: Iterable[tuple[int, dict]]) -> Counter:
+        """
+        importa registros (número da linha, objeto) e retorna a contagem por tipo.
+
+        raises:
+            ValidationError: Se o cabeçalho falta ou um registro é inválido
+        """
+        counts: Counter = Counter()
+        header_seen = False
+
+        for line_number, record in records:
+            kind = record.get("kind")
+            try:
+                if not header_seen:
+                    self.__check_header(record)
+                    header_seen = True
+                    continue
+
+                reader = self.__readers.get(kind)
+                if reader is None:
+                    raise ValidationError(f"Tipo de registro '{kind}' desconhecido.")
+                if kind != self.__pending_kind:
+                    # referências só podem apontar para o que já foi gravado
+                    self.__flush()
+                    self.__pending_kind = kind
+
+                item = reader(record)
+                if item is not None:
+                    self.__pending.append(item)
+                    self.__pending_sources.append(record.get("id"))
+                    if len(self.__pending) >= self.__batch_size:
+                        self.__flush()
+                counts[kind] += 1
+            except CMSException as e:
+                raise ValidationError(f"Linha {line_number}: {e}")
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValidationError(f"Linha {line_number}: registro '{kind}' malformado ({e}).")
+
+        if not header_seen:
+            raise ValidationError("Conjunto de dados vazio.")
+        self.__flush()
+        return counts
+
+    @staticmethod
+    def __check_header(record: dict):
+        if record.get("kind") != "header" or record.get("format") != DATASET_FORMAT:
+            raise ValidationError("Cabeçalho do conjunto de dados ausente.")
+        if record.get("version") != DATASET_VERSION:
+            raise ValidationError(f"Versão {record.get('version')} não suportada.")
+
+    def __flush(self):
+        if not self.__pending:
+            return
+
+        kind, items, sources = self.__pending_kind, self.__pending, self.__pending_sources
+        self.__pending, self.__pending_sources = [], []
+
+        context = self.__context
+        if kind == "post":
+            new_ids = context.post_repo.add_posts(items)
+        elif kind == "comment":
+            new_ids = context.comment_repo.add_comments(items)
+        elif kind == "event":
+            context.analytics_repo.log_many(items)
+            return
+        else:
+            return
+
+        self.__ids[kind].update(zip(sources, new_ids))
+
+    def __resolve(self, kind: str, source_id, getter: Callable[[int], object]):
+        # linhas vizinhas costumam apontar para o mesmo objeto (ex: eventos de um post)
+        last = self.__last.get(kind)
+        if last and last[0] == source_id:
+            return last[1]
+
+        new_id = self.__ids[kind].get(source_id)
+        if new_id is None:
+            raise ValidationError(f"Referência a {kind} {source_id} inexistente.")
+        item = getter(new_id)
+        self.__last[kind] = (source_id, item)
+        return item
+
+    def __user(self, source_id) -> User:
+        return self.__resolve("user", source_id, self.__context.user_repo.get_user)
+
+    def __site(self, source_id) -> Site:
+        return self.__resolve("site", source_id, self.__context.site_repo.get_site)
+
+    def __media(self, source_id) -> MediaFile:
+        return self.__resolve("media", source_id, self.__context.media_repo.get_media_by_id)
+
+    def __post(self, source_id) -> Post:
+        return self.__resolve("post", source_id, self.__context.post_repo.get_post)
+
+    # usuários, sites, permissões e mídias são poucos: gravados um a um
+
+    def __read_user(self, record: dict) -> None:
+        user = User(
+            first_name=record["first_name"],
+            last_name=record["last_name"],
+            email=record["email"],
+            username=record["username"],
+            password=record["password"],
+            role=UserRole[record["role"]],
+        )
+        self.__ids["user"][record["id"]] = self.__context.user_repo.add_user(user)
+
+    def __read_site(self, record: dict) -> None:
+        site = Site(
+            owner=self.__user(record["owner_id"]),
+            name=record["name"],
+            description=record["description"],
+            template=SiteTemplateType[record.get("template", "LATEST_POSTS")],
+        )
+        self.__ids["site"][record["id"]] = self.__context.site_repo.add_site(site)
+
+    def __read_permission(self, record: dict) -> None:
+        self.__context.permission_repo.grant_permission(
+            Permission(user=self.__user(record["user_id"]), site=self.__site(record["site_id"]))
+        )
+
+    def __read_media(self, record: dict) -> None:
+        media = MediaFile(
+            uploader=self.__user(record["uploader_id"]),
+            filename=record["filename"],
+            path=Path(record["path"]),
+            media_type=MediaType[record["media_type"]],
+            site=self.__site(record["site_id"]),
+            width=_parse_dimension(record.get("width")),
+            height=_parse_dimension(record.get("height")),
+            duration=record.get("duration"),
+            size=record.get("size"),
+            content_hash=record.get("content_hash"),
+        )
+        self.__ids["media"][record["id"]] = self.__context.media_repo.add_midia(media)
+
+    def __read_post(self, record: dict) -> Post:
+        post = Post(
+            poster=self.__user(record["poster_id"]),
+            site=self.__site(record["site_id"]),
+            scheduled_to=_parse_datetime(record["scheduled_to"]),
+            created_at=_parse_datetime(record["created_at"]),
+        )
+        lang_service = self.__context.lang_service
+        for content in record["contents"]:
+            language = lang_service.get_language_by_code(content["language"])
+            body = [
+                self.__read_block(order, block)
+                for order, block in enumerate(content["blocks"], start=1)
+            ]
+            post.add_content(
+                language.code, Content(title=content["title"], body=body, language=language)
+            )
+        return post
+
+    def __read_block(self, order: int, block: dict) -> ContentBlock:
+        kind = block["type"]
+        if kind == "text":
+            return TextBlock(order=order, text=block["text"])
+        if kind == "media":
+            return MediaBlock(order=order, media=self.__media(block["media_id"]), alt=block["alt"])
+        if kind == "carousel":
+            return CaroulselBlock(
+                order=order,
+                medias=[self.__media(media_id) for media_id in block["media_ids"]],
+                alt=block["alt"],
+            )
+        raise ValidationError(f"Tipo de bloco '{kind}' não suportado.")
+
+    def __read_comment(self, record: dict) -> Comment:
+        return Comment(
+            post=self.__post(record["post_id"]),
+            commenter=self.__user(record["commenter_id"]),
+            body=record["body"],
+            created_at=_parse_datetime(record["created_at"]),
+        )
+
+    def __read_event(self, record: dict) -> AnalyticsEntry:
+        user = self.__user(record["user_id"])
+        created_at = _parse_datetime(record["created_at"])
+        metadata = self.__remap_metadata(record.get("metadata"))
+
+        if "post_id" in record:
+            post = self.__post(record["post_id"])
+            return PostAnalyticsEntry(
+                user=user,
+                site=post.site,
+                post=post,
+                action=PostAction[record["action"]],
+                created_at=created_at,
+                metadata=metadata,
+            )
+        return SiteAnalyticsEntry(
+            user=user,
+            site=self.__site(record["site_id"]),
+            action=SiteAction[record["action"]],
+            created_at=created_at,
+            metadata=metadata,
+        )
+
+    def __remap_metadata(self, metadata: dict | None) -> dict[str, str]:
+        if not metadata:
+            return {}
+        if not isinstance(metadata, dict):
+            raise ValidationError("Campo 'metadata' deve ser um objeto.")
+        remapped = {str(key): str(value) for key, value in metadata.items()}
+        for key, kind in _METADATA_REFS.items():
+            value = remapped.get(key)
+            if value is not None and value.isdigit():
+                new_id = self.__ids[kind].get(int(value))
+                if new_id is not None:
+                    remapped[key] = str(new_id)
+        return remapped
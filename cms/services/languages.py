@@ -1,5 +1,52 @@
+import os
+from functools import lru_cache
+from typing import Sequence
+
 from cms.models import Language, LanguageCode, Post
 
+# combinações (Accept-Language, idiomas disponíveis) guardadas na negociação
+NEGOTIATION_CACHE_SIZE = 1024
+# Accept-Language maiores que isso são cortados (o cabeçalho vem do cliente)
+MAX_ACCEPT_LANGUAGE_RANGES = 20
+
+
+def parse_accept_language(header: str) -> list[tuple[str, float]]:
+    """
+    faixas de idioma de um Accept-Language, da preferida para a menos preferida.
+    faixas com q=0 ("não aceito") vêm no fim.
+    """
+    ranges: list[tuple[str, float, int]] = []
+    for position, item in enumerate(header.split(",")[:MAX_ACCEPT_LANGUAGE_RANGES]):
+        tag, _, params = item.partition(";")
+        tag = tag.strip().lower().replace("_", "-")
+        if not tag:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((tag, quality, position))
+    # empates mantêm a ordem do cabeçalho
+    ranges.sort(key=lambda item: (-item[1], item[2]))
+    return [(tag, quality) for tag, quality, _ in ranges]
+
+
+def system_accept_language() -> str | None:
+    """
+    as preferências de idioma do sistema (LANGUAGE, LC_ALL ou LANG, como
+    "pt_BR.UTF-8") no formato de um Accept-Language, para o menu de terminal.
+    """
+    value = os.environ.get("LANGUAGE") or os.environ.get("LC_ALL") or os.environ.get("LANG")
+    if not value:
+        return None
+    tags = [tag.split(".")[0].split("@")[0].replace("_", "-") for tag in value.split(":")]
+    tags = [tag for tag in tags if tag and tag not in ("C", "POSIX")]
+    return ", ".join(f"{tag};q={1 - i / 10:.1f}" for i, tag in enumerate(tags[:10])) or None
+
 
 class LanguageService:
     __supported_languages: list[Language]
@@ -16,20 +63,72 @@ class LanguageService:
             Language(name="Chinês", code="zh"),
             Language(name="Japonês", code="ja"),
         ]
-
-    def get_language_by_code(self, code: LanguageCode) -> Language:
+        # código ou apelido (já normalizado) -> idioma; a ordem dá prioridade ao primeiro
+        self.__by_alias: dict[LanguageCode, Language] = {}
         for lang in self.__supported_languages:
-            if lang.is_language(code):
-                return lang
+            for alias in [lang.code, *lang.aliases]:
+                self.__by_alias.setdefault(alias.lower().strip(), lang)
+        self.__negotiate_codes = lru_cache(maxsize=NEGOTIATION_CACHE_SIZE)(
+            self.__negotiate_uncached
+        )
 
-        raise ValueError("Language not found.")
+    def find_language(self, code: LanguageCode) -> Language | None:
+        return self.__by_alias.get(code.lower().strip())
+
+    def get_language_by_code(self, code: LanguageCode) -> Language:
+        lang = self.find_language(code)
+        if lang is None:
+            raise ValueError("Language not found.")
+        return lang
 
     def get_missing_languages(self, post: Post) -> list[Language]:
-        return [
-            lang
-            for lang in self.__supported_languages
-            if lang not in post.get_languages()
-        ]
+        present = {lang.code for lang in post.get_languages()}
+        return [lang for lang in self.__supported_languages if lang.code not in present]
+
+    def negotiate(
+        self, accept_language: str | None, available: Sequence[Language] | None = None
+    ) -> Language | None:
+        """
+        o idioma de `available` (padrão: os suportados) que melhor atende o
+        Accept-Language, ou None se nenhum é aceito. cada faixa é procurada
+        inteira e depois sem os sufixos ("pt-br-x" -> "pt-br" -> "pt"); "*"
+        aceita o primeiro disponível. o resultado fica num cache LRU.
+        """
+        if not accept_language:
+            return None
+        languages = self.__supported_languages if available is None else available
+        codes = tuple(lang.code for lang in languages)
+        code = self.__negotiate_codes(accept_language, codes)
+        if code is None:
+            return None
+        return next(lang for lang in languages if lang.code == code)
+
+    def __negotiate_uncached(
+        self, accept_language: str, codes: tuple[LanguageCode, ...]
+    ) -> LanguageCode | None:
+        ranges = parse_accept_language(accept_language)
+        # q=0 recusa o idioma mesmo que um "*" o aceitaria
+        refused = {
+            lang.code
+            for tag, quality in ranges
+            if quality == 0 and (lang := self.__lookup(tag)) is not None
+        }
+        for tag, quality in ranges:
+            if quality == 0:
+                break
+            if tag == "*":
+                return next((code for code in codes if code not in refused), None)
+            lang = self.__lookup(tag)
+            if lang is not None and lang.code in codes and lang.code not in refused:
+                return lang.code
+        return None
+
+    def __lookup(self, tag: str) -> Language | None:
+        while True:
+            lang = self.__by_alias.get(tag)
+            if lang is not None or "-" not in tag:
+                return lang
+            tag = tag.rsplit("-", 1)[0]
 
     def select_from_supported_languages(self) -> Language | None:
         return LanguageService.select_language(self.__supported_languages)
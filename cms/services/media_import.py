@@ -0,0 +1,279 @@
+"""
+importação em lote de mídias a partir de uma árvore de diretórios.
+
+a árvore é listada com os.scandir e filtrada pelas extensões que
+infer_media_type aceita. cada arquivo é lido num pool de threads: o cabeçalho
+pelo probe e o conteúdo inteiro pelo hash (hashlib e a leitura do disco soltam
+o GIL, então as threads rendem de verdade). os resultados entram no
+MediaRepository em lotes, com uma única escrita de UPLOAD_MEDIA no analytics
+por lote. o conteúdo vai para o MediaStore, e o que o site já tem (mesmo
+hash) não é importado de novo. os arquivos que passariam da cota de
+armazenamento do site ficam de fora, como falhas.
+
+com um diário, cada arquivo lido vira uma linha NDJSON com o resultado. numa
+nova execução (depois de uma queda, por exemplo), os arquivos do diário que
+não mudaram (mesmo tamanho e mtime) são registrados direto, sem ler de novo.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from itertools import batched
+from pathlib import Path
+from typing import Callable, Iterator
+
+from cms.exceptions import CMSException, MediaError, QuotaExceededError, ValidationError
+from cms.models import MediaFile, MediaType, Site, SiteAction, SiteAnalyticsEntry, User
+from cms.services.media_probe import probe_media
+from cms.services.media_store import MediaStore, StoredBlob, hash_file
+from cms.services.storage_quota import StorageReservation
+from cms.utils import MEDIA_EXTENSIONS, infer_media_type
+
+DEFAULT_BATCH_SIZE = 1000
+# leitura de disco e hash soltam o GIL; mais threads que CPUs escondem a latência do disco
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+@dataclass
+class InspectedMedia:
+    """o que foi lido de um arquivo; é também a linha do diário."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    media_type: str
+    width: int | None
+    height: int | None
+    duration: float | None
+    content_hash: str
+
+
+@dataclass
+class MediaImportSummary:
+    found: int = 0
+    imported: int = 0
+    # lidos do diário, sem abrir o arquivo de novo
+    resumed: int = 0
+    # conteúdo que o site já tinha (reimportações e cópias dentro da árvore)
+    skipped: int = 0
+    # blobs novos gravados no armazenamento; o resto já estava lá
+    stored: int = 0
+    failed: list[tuple[str, str]] = field(default_factory=list)
+
+
+# (arquivos processados, total)
+type ProgressCallback = Callable[[int, int], None]
+
+
+def iter_media_files(root: str | Path) -> Iterator[Path]:
+    """percorre a árvore e devolve os arquivos com extensão de mídia suportada."""
+    stack = [Path(root)]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(Path(entry.path))
+                elif os.path.splitext(entry.name)[1].lower() in MEDIA_EXTENSIONS:
+                    yield Path(entry.path)
+
+
+def inspect_media(path: Path) -> InspectedMedia:
+    """
+    lê o cabeçalho e o hash de um arquivo.
+
+    raises:
+        MediaError: Se o arquivo não pode ser lido ou não é uma mídia válida
+    """
+    # o cabeçalho primeiro: um arquivo inválido não chega a ser lido inteiro
+    info = probe_media(path)
+    try:
+        stat = path.stat()
+        content_hash, _ = hash_file(path)
+    except OSError as e:
+        raise MediaError(f"Não foi possível ler a mídia '{path}': {e.strerror}.")
+    return InspectedMedia(
+        path=str(path),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        media_type=infer_media_type(path.suffix).name,
+        width=info.width,
+        height=info.height,
+        duration=info.duration,
+        content_hash=content_hash,
+    )
+
+
+class BulkMediaImporter:
+    def __init__(
+        self,
+        context,
+        workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        store: MediaStore | None = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser positivo.")
+        self.__context = context
+        self.__store = store or context.media_store
+        self.__workers = workers or DEFAULT_WORKERS
+        self.__batch_size = batch_size
+
+    def import_tree(
+        self,
+        root: str | Path,
+        site: Site,
+        uploader: User,
+        journal: str | Path | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> MediaImportSummary:
+        """
+        importa todas as mídias da árvore para o site.
+
+        raises:
+            ValidationError: Se a raiz não é um diretório
+        """
+        root = Path(root).resolve()
+        if not root.is_dir():
+            raise ValidationError(f"Diretório não encontrado: {root}.")
+
+        journaled = _read_journal(journal) if journal else {}
+        paths = list(iter_media_files(root))
+        summary = MediaImportSummary(found=len(paths))
+        media_repo = self.__context.media_repo
+        accounting = self.__context.storage_accounting
+        store = self.__store
+
+        journal_file = open(journal, "a", encoding="utf-8") if journal else None
+        try:
+            with ThreadPoolExecutor(self.__workers, thread_name_prefix="cms-media-import") as pool:
+                done = 0
+                for batch in batched(paths, self.__batch_size):
+                    # hash -> arquivo, para o mesmo conteúdo entrar uma vez só
+                    new: dict[str, InspectedMedia] = {}
+                    reservations: list[StorageReservation] = []
+                    fresh: list[InspectedMedia] = []
+                    results = pool.map(partial(_inspect_or_resume, journaled=journaled), batch)
+                    for path, result in zip(batch, results):
+                        if isinstance(result, CMSException):
+                            summary.failed.append((str(path), str(result)))
+                            continue
+                        if result is journaled.get(str(path)):
+                            summary.resumed += 1
+                        else:
+                            fresh.append(result)
+                        digest = result.content_hash
+                        if digest in new or media_repo.get_site_media_by_hash(site, digest):
+                            summary.skipped += 1
+                            continue
+                        try:
+                            # o que já entrou no lote fica reservado na cota até ser registrado
+                            reservations.append(accounting.reserve(site, result.size))
+                        except QuotaExceededError as e:
+                            summary.failed.append((str(path), str(e)))
+                            continue
+                        new[digest] = result
+
+                    try:
+                        # só o conteúdo novo é copiado para o armazenamento, também no pool
+                        stored: list[tuple[InspectedMedia, StoredBlob]] = []
+                        blobs = pool.map(partial(_store, store), new.values())
+                        for item, blob in zip(new.values(), blobs):
+                            if isinstance(blob, CMSException):
+                                summary.failed.append((item.path, str(blob)))
+                            else:
+                                stored.append((item, blob))
+                                summary.stored += blob.created
+
+                        self.__register(stored, site, uploader)
+                    finally:
+                        for reservation in reservations:
+                            reservation.release()
+                    summary.imported += len(stored)
+                    if journal_file and fresh:
+                        journal_file.writelines(
+                            json.dumps(asdict(item), ensure_ascii=False) + "\n" for item in fresh
+                        )
+                        journal_file.flush()
+
+                    done += len(batch)
+                    if progress:
+                        progress(done, len(paths))
+        finally:
+            if journal_file:
+                journal_file.close()
+        return summary
+
+    def __register(
+        self, stored: list[tuple[InspectedMedia, StoredBlob]], site: Site, uploader: User
+    ):
+        if not stored:
+            return
+        medias = [
+            MediaFile(
+                uploader=uploader,
+                filename=os.path.basename(item.path),
+                path=blob.path,
+                media_type=MediaType[item.media_type],
+                site=site,
+                width=item.width,
+                height=item.height,
+                duration=item.duration,
+                size=item.size,
+                content_hash=item.content_hash,
+            )
+            for item, blob in stored
+        ]
+        ids = self.__context.media_repo.add_medias(medias)
+        self.__context.analytics_repo.log_many(
+            [
+                SiteAnalyticsEntry(
+                    user=uploader,
+                    site=site,
+                    action=SiteAction.UPLOAD_MEDIA,
+                    metadata={"media_id": str(media_id)},
+                )
+                for media_id in ids
+            ]
+        )
+
+
+def _inspect_or_resume(
+    path: Path, journaled: dict[str, InspectedMedia]
+) -> InspectedMedia | CMSException:
+    # roda nas threads do pool: o erro volta como valor para não parar o lote
+    known = journaled.get(str(path))
+    try:
+        if known is not None:
+            stat = path.stat()
+            if (stat.st_size, stat.st_mtime_ns) == (known.size, known.mtime_ns):
+                return known
+        return inspect_media(path)
+    except OSError as e:
+        return MediaError(f"Não foi possível ler a mídia '{path}': {e.strerror}.")
+    except CMSException as e:
+        return e
+
+
+def _store(store: MediaStore, item: InspectedMedia) -> StoredBlob | CMSException:
+    try:
+        return store.put(item.path, item.content_hash)
+    except CMSException as e:
+        return e
+
+
+def _read_journal(journal: str | Path) -> dict[str, InspectedMedia]:
+    """linhas do diário por caminho; uma linha cortada no fim (queda) é ignorada."""
+    journaled: dict[str, InspectedMedia] = {}
+    try:
+        with open(journal, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    item = InspectedMedia(**json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                journaled[item.path] = item
+    except FileNotFoundError:
+        pass
+    return journaled
@@ -0,0 +1,205 @@
+"""
+leitura das dimensões e da duração das mídias pelo cabeçalho do arquivo.
+
+o formato é reconhecido pelos primeiros bytes, não pela extensão. cada leitor
+só lê os poucos bytes que interessam e pula o resto com seek: o IHDR do PNG, o
+descritor de tela do GIF, o primeiro chunk do WebP, os marcadores do JPEG até o
+SOF e, no MP4/MOV, os átomos até o moov, e dentro dele só o mvhd (duração) e o
+tkhd de cada trilha (dimensões). o mdat, que é quase o arquivo todo, nunca é lido.
+"""
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from cms.exceptions import MediaError
+
+# o suficiente para reconhecer qualquer formato suportado
+_SNIFF_SIZE = 32
+# marcadores SOF do JPEG: C0-CF menos DHT (C4), JPG (C8) e DAC (CC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# marcadores sem segmento (sem campo de tamanho)
+_JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xD9)) | {0x01}
+# átomos de topo que podem vir antes do moov
+_MP4_BRANDS = (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot")
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+    format: str
+    width: int | None = None
+    height: int | None = None
+    # em segundos, só para vídeos
+    duration: float | None = None
+
+
+def probe_media(path: str | Path) -> MediaInfo:
+    """
+    lê o cabeçalho do arquivo e devolve formato, dimensões e duração.
+
+    raises:
+        MediaError: Se o arquivo não pode ser lido ou não é um formato suportado
+    """
+    try:
+        with open(path, "rb") as file:
+            head = file.read(_SNIFF_SIZE)
+            return _probe(file, head)
+    except OSError as e:
+        raise MediaError(f"Não foi possível ler a mídia '{path}': {e.strerror}.")
+    except (struct.error, IndexError):
+        raise MediaError(f"Cabeçalho truncado ou corrompido em '{path}'.")
+
+
+def _probe(file: BinaryIO, head: bytes) -> MediaInfo:
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        width, height = struct.unpack_from(">II", head, 16)
+        return MediaInfo("png", width, height)
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        width, height = struct.unpack_from("<HH", head, 6)
+        return MediaInfo("gif", width, height)
+    if head[:2] == b"\xff\xd8":
+        return _probe_jpeg(file)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _probe_webp(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return _probe_avi(file)
+    if head[4:8] in _MP4_BRANDS:
+        # a marca principal "qt  " do ftyp indica um arquivo QuickTime
+        return _probe_mp4(file, "mov" if head[8:12] == b"qt  " else "mp4")
+    raise MediaError("Formato de mídia não reconhecido pelo cabeçalho.")
+
+
+def _probe_jpeg(file: BinaryIO) -> MediaInfo:
+    file.seek(2)
+    while True:
+        byte = file.read(1)
+        if not byte:
+            break
+        if byte != b"\xff":
+            continue
+        marker = file.read(1)[0]
+        # bytes 0xFF extras são preenchimento antes do marcador
+        while marker == 0xFF:
+            marker = file.read(1)[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9:
+            break
+
+        (length,) = struct.unpack(">H", file.read(2))
+        if marker in _JPEG_SOF_MARKERS:
+            # precisão (1 byte), altura e largura
+            _, height, width = struct.unpack(">BHH", file.read(5))
+            return MediaInfo("jpeg", width, height)
+        if marker == 0xDA:
+            # dados comprimidos sem SOF antes: arquivo inválido
+            break
+        file.seek(length - 2, os.SEEK_CUR)
+    raise MediaError("JPEG sem marcador SOF.")
+
+
+def _probe_webp(head: bytes) -> MediaInfo:
+    chunk = head[12:16]
+    if chunk == b"VP8X":
+        # canvas estendido: largura-1 e altura-1 em 24 bits
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+    elif chunk == b"VP8 ":
+        # com perdas: o quadro-chave tem a assinatura 9d 01 2a e depois as dimensões
+        if head[23:26] != b"\x9d\x01\x2a":
+            raise MediaError("WebP com quadro VP8 inválido.")
+        width, height = struct.unpack_from("<HH", head, 26)
+        width &= 0x3FFF
+        height &= 0x3FFF
+    elif chunk == b"VP8L":
+        # sem perdas: 14 bits de largura-1 e 14 de altura-1 depois da assinatura 0x2f
+        bits = int.from_bytes(head[21:25], "little")
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+    else:
+        raise MediaError("WebP sem chunk de imagem.")
+    return MediaInfo("webp", width, height)
+
+
+def _probe_avi(file: BinaryIO) -> MediaInfo:
+    # RIFF (12) + LIST hdrl (12) + avih (8): o cabeçalho principal vem logo depois
+    file.seek(24)
+    if file.read(4) != b"avih":
+        raise MediaError("AVI sem cabeçalho avih.")
+    file.seek(4, os.SEEK_CUR)
+    micro_sec_per_frame, _, _, _, total_frames, _, _, _, width, height = struct.unpack(
+        "<10I", file.read(40)
+    )
+    return MediaInfo("avi", width, height, micro_sec_per_frame * total_frames / 1_000_000)
+
+
+def _iter_atoms(file: BinaryIO, start: int, end: int | None):
+    """percorre os átomos entre start e end, devolvendo (tipo, início dos dados, fim)."""
+    offset = start
+    while end is None or offset + 8 <= end:
+        file.seek(offset)
+        header = file.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        data_start = offset + 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", file.read(8))
+            data_start += 8
+        elif size == 0:
+            # o átomo vai até o fim do arquivo (ou do pai)
+            size = (end if end is not None else os.fstat(file.fileno()).st_size) - offset
+        if size < data_start - offset:
+            raise MediaError("Átomo MP4 com tamanho inválido.")
+        yield kind, data_start, offset + size
+        offset += size
+
+
+def _probe_mp4(file: BinaryIO, format: str) -> MediaInfo:
+    for kind, start, end in _iter_atoms(file, 0, None):
+        if kind == b"moov":
+            return _read_moov(file, format, start, end)
+    raise MediaError("MP4/MOV sem átomo moov.")
+
+
+def _read_moov(file: BinaryIO, format: str, start: int, end: int) -> MediaInfo:
+    duration = None
+    width = height = None
+    for kind, atom_start, atom_end in _iter_atoms(file, start, end):
+        if kind == b"mvhd":
+            duration = _read_mvhd(file, atom_start)
+        elif kind == b"trak" and width is None:
+            # a primeira trilha com dimensões é a de vídeo (áudio tem 0x0)
+            for child, child_start, _ in _iter_atoms(file, atom_start, atom_end):
+                if child == b"tkhd":
+                    width, height = _read_tkhd(file, child_start)
+                    break
+    return MediaInfo(format, width, height, duration)
+
+
+def _read_mvhd(file: BinaryIO, start: int) -> float | None:
+    file.seek(start)
+    version = file.read(4)[0]
+    if version == 1:
+        # criação (8), modificação (8), timescale (4), duração (8)
+        timescale, duration = struct.unpack(">16xIQ", file.read(28))
+    else:
+        timescale, duration = struct.unpack(">8xII", file.read(16))
+    if not timescale:
+        return None
+    return duration / timescale
+
+
+def _read_tkhd(file: BinaryIO, start: int) -> tuple[int | None, int | None]:
+    file.seek(start)
+    version = file.read(4)[0]
+    # largura e altura são os últimos 8 bytes, em ponto fixo 16.16, logo depois
+    # da matriz: a 76 bytes do início na v0 e a 88 na v1 (datas de 64 bits)
+    file.seek(start + (88 if version == 1 else 76))
+    width, height = struct.unpack(">II", file.read(8))
+    width >>= 16
+    height >>= 16
+    if not width or not height:
+        return None, None
+    return width, height
@@ -0,0 +1,234 @@
+"""
+armazenamento das mídias endereçado pelo conteúdo.
+
+cada arquivo é guardado uma única vez, com o hash do conteúdo como nome
+(raiz/ab/abcdef...). o hash é calculado lendo o arquivo em blocos de tamanho
+fixo, e a cópia só acontece se o blob ainda não existe, então importar de novo
+um arquivo conhecido não grava nada. vários MediaFile (de sites diferentes,
+por exemplo) apontam para o mesmo blob.
+
+o MediaStore é um observador do MediaRepository: conta quantas mídias deste
+processo usam cada blob. a raiz é compartilhada entre execuções e processos,
+então remover a última mídia daqui não apaga o arquivo (outro conjunto de
+dados pode apontar para ele); collect_garbage apaga os blobs que nenhuma
+referência viva informada usa.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from cms.events import Observer
+from cms.exceptions import MediaError
+from cms.models import MediaFile
+
+CHUNK_SIZE = 1 << 20
+DIGEST_SIZE = 32
+# blobs mais compartilhados listados no relatório
+TOP_SHARED = 20
+# blobs mais novos que isso não são coletados: uma importação em andamento
+# grava (ou reaproveita) o blob antes de registrar a mídia
+GC_MIN_AGE = 3600.0
+TEMP_PREFIX = ".tmp-"
+
+
+@dataclass(frozen=True)
+class StoredBlob:
+    digest: str
+    size: int
+    path: Path
+    # False quando o blob já existia e nada foi gravado
+    created: bool
+
+
+@dataclass
+class SharedBlob:
+    digest: str
+    size: int
+    medias: list[MediaFile]
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.size * (len(self.medias) - 1)
+
+
+@dataclass
+class DedupReport:
+    blobs: int = 0
+    references: int = 0
+    # bytes em disco e o que ocupariam com uma cópia por mídia
+    stored_bytes: int = 0
+    logical_bytes: int = 0
+    shared: list[SharedBlob] = field(default_factory=list)
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.logical_bytes - self.stored_bytes
+
+
+@dataclass
+class GarbageReport:
+    scanned: int = 0
+    live: int = 0
+    # blobs sem referência viva (e temporários abandonados), apagados ou não
+    unreferenced: list[tuple[Path, int]] = field(default_factory=list)
+    # mais novos que min_age, mantidos mesmo sem referência
+    recent: int = 0
+    deleted: bool = False
+
+    @property
+    def freed_bytes(self) -> int:
+        return sum(size for _, size in self.unreferenced)
+
+
+def hash_file(path: str | Path) -> tuple[str, int]:
+    """hash e tamanho do arquivo, lido em blocos de CHUNK_SIZE num buffer reaproveitado."""
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    size = 0
+    with open(path, "rb", buffering=0) as file:
+        while read := file.readinto(buffer):
+            digest.update(view[:read])
+            size += read
+    return digest.hexdigest(), size
+
+
+class MediaStore(Observer):
+    def __init__(self, root: str | Path):
+        self.root = Path(root).resolve()
+        # digest -> mídias que usam o blob; o tamanho do dicionário é a contagem de referências
+        self.__medias: dict[str, dict[int, MediaFile]] = {}
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        if event_type == "MEDIA_REMOVED":
+            self.release(kwargs["media"])
+            return
+        medias = kwargs["medias"] if event_type == "MEDIAS_ADDED" else [kwargs["media"]]
+        with self.__lock:
+            for media in medias:
+                if self.owns(media):
+                    self.__medias.setdefault(media.content_hash, {})[media.id] = media
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def owns(self, media: MediaFile) -> bool:
+        """se o arquivo da mídia é um blob deste armazenamento."""
+        return bool(media.content_hash) and media.path == self.blob_path(media.content_hash)
+
+    def put(self, source: str | Path, digest: str | None = None) -> StoredBlob:
+        """
+        guarda o arquivo, se o conteúdo ainda não está no armazenamento.
+        um hash já calculado (ex: pela importação em lote) evita ler de novo.
+
+        raises:
+            MediaError: Se o arquivo não pode ser lido ou gravado
+        """
+        try:
+            if digest is None:
+                digest, size = hash_file(source)
+            else:
+                size = os.stat(source).st_size
+            target = self.blob_path(digest)
+            if target.exists():
+                # renova o mtime: o blob reaproveitado fica protegido da coleta até a
+                # mídia ser registrada
+                os.utime(target)
+                return StoredBlob(digest, size, target, created=False)
+
+            # copia para um temporário no mesmo diretório e renomeia: outra
+            # thread guardando o mesmo conteúdo nunca vê um blob pela metade
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=target.parent, prefix=TEMP_PREFIX)
+            try:
+                with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                os.replace(temp, target)
+            except BaseException:
+                os.unlink(temp)
+                raise
+            return StoredBlob(digest, size, target, created=True)
+        except OSError as e:
+            raise MediaError(f"Não foi possível guardar a mídia '{source}': {e.strerror}.")
+
+    def release(self, media: MediaFile):
+        """
+        solta a referência da mídia. o blob fica no disco mesmo sem referências
+        neste processo; só collect_garbage o apaga.
+        """
+        if not self.owns(media):
+            return
+        with self.__lock:
+            digest = media.content_hash
+            medias = self.__medias.get(digest, {})
+            medias.pop(media.id, None)
+            if not medias:
+                self.__medias.pop(digest, None)
+
+    def collect_garbage(
+        self, live_digests: Iterable[str] = (), min_age: float = GC_MIN_AGE, delete: bool = False
+    ) -> GarbageReport:
+        """
+        percorre a raiz e aponta (com delete=True, apaga) os blobs que nenhuma
+        referência viva usa. as mídias deste processo sempre contam como vivas;
+        `live_digests` deve trazer os hashes de todos os outros conjuntos de
+        dados que usam a mesma raiz. blobs e temporários mais novos que
+        `min_age` segundos são mantidos.
+        """
+        live = set(live_digests)
+        with self.__lock:
+            live.update(self.__medias)
+
+        report = GarbageReport(deleted=delete)
+        cutoff = time.time() - min_age
+        if not self.root.is_dir():
+            return report
+        for directory in os.scandir(self.root):
+            if not directory.is_dir(follow_symlinks=False) or len(directory.name) != 2:
+                continue
+            for entry in os.scandir(directory.path):
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                report.scanned += 1
+                if entry.name in live:
+                    report.live += 1
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > cutoff:
+                    report.recent += 1
+                    continue
+                report.unreferenced.append((Path(entry.path), stat.st_size))
+                if delete:
+                    Path(entry.path).unlink(missing_ok=True)
+        return report
+
+    def references(self, digest: str) -> int:
+        with self.__lock:
+            return len(self.__medias.get(digest, ()))
+
+    def dedup_report(self, top: int | None = TOP_SHARED) -> DedupReport:
+        """
+        quanto espaço o compartilhamento de blobs economiza, e os `top` blobs
+        que mais economizam (todos, com top=None).
+        """
+        report = DedupReport()
+        shared: list[SharedBlob] = []
+        with self.__lock:
+            for digest, medias in self.__medias.items():
+                size = next(iter(medias.values())).size or 0
+                report.blobs += 1
+                report.references += len(medias)
+                report.stored_bytes += size
+                report.logical_bytes += size * len(medias)
+                if len(medias) > 1:
+                    shared.append(SharedBlob(digest, size, list(medias.values())))
+        shared.sort(key=lambda blob: -blob.saved_bytes)
+        report.shared = shared[:top]
+        return report
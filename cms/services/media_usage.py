@@ -0,0 +1,133 @@
+"""
+índice reverso de uso das mídias: mídia -> (post, idioma, bloco).
+
+cada MediaBlock e cada mídia de um CaroulselBlock viram uma entrada. o índice
+responde "onde esta mídia é usada" sem percorrer os posts, o que permite listar
+os usos, recusar a remoção de uma mídia ainda usada e, quando a mídia muda,
+invalidar só a renderização dos conteúdos que a mostram.
+
+como o SearchIndex, é um observador: os posts ficam pendentes e são indexados
+na próxima consulta, e só quando Post.version muda.
+"""
+import threading
+from dataclasses import dataclass
+
+from cms.events import Observer
+from cms.exceptions import MediaError
+from cms.models import CaroulselBlock, ContentBlock, Language, MediaBlock, MediaFile, Post
+
+
+@dataclass(frozen=True)
+class MediaUsage:
+    post: Post
+    language: Language
+    block: ContentBlock
+
+
+class MediaUsageIndex(Observer):
+    def __init__(self):
+        # media_id -> post_id -> usos da mídia no post
+        self.__usages: dict[int, dict[int, list[MediaUsage]]] = {}
+        # post_id -> mídias usadas, para desfazer a indexação anterior
+        self.__post_medias: dict[int, set[int]] = {}
+        self.__versions: dict[int, int] = {}
+        self.__pending: dict[int, Post] = {}
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        if event_type == "MEDIA_UPDATED":
+            self.invalidate(kwargs["media"])
+            return
+        post = kwargs.get("post")
+        posts = kwargs.get("posts", ())
+        with self.__lock:
+            if post is not None:
+                self.__pending[post.id] = post
+            for post in posts:
+                self.__pending[post.id] = post
+
+    def refresh(self):
+        """indexa agora os posts pendentes (ex: logo depois de uma importação)."""
+        with self.__lock:
+            self.__drain()
+
+    def usages(self, media: MediaFile) -> list[MediaUsage]:
+        """onde a mídia aparece, em ordem de post, idioma e bloco."""
+        with self.__lock:
+            self.__drain()
+            by_post = self.__usages.get(media.id, {})
+            return [usage for post_id in sorted(by_post) for usage in by_post[post_id]]
+
+    def posts_using(self, media: MediaFile) -> list[Post]:
+        with self.__lock:
+            self.__drain()
+            by_post = self.__usages.get(media.id, {})
+            return [by_post[post_id][0].post for post_id in sorted(by_post)]
+
+    def is_used(self, media: MediaFile) -> bool:
+        with self.__lock:
+            self.__drain()
+            return media.id in self.__usages
+
+    def ensure_unused(self, media: MediaFile):
+        """
+        raises:
+            MediaError: Se a mídia ainda é usada por algum post
+        """
+        posts = self.posts_using(media)
+        if posts:
+            titles = ", ".join(f"'{post.get_default_title()}'" for post in posts[:3])
+            more = f" e mais {len(posts) - 3}" if len(posts) > 3 else ""
+            raise MediaError(
+                f"A mídia '{media.filename}' ainda é usada pelos posts {titles}{more}."
+            )
+
+    def invalidate(self, media: MediaFile) -> list[Post]:
+        """
+        limpa a renderização dos conteúdos que mostram a mídia e marca os posts
+        como alterados, para os caches que olham Post.version renovarem só eles.
+        """
+        touched: list[Post] = []
+        for post in self.posts_using(media):
+            with self.__lock:
+                usages = self.__usages[media.id][post.id]
+            for language in {usage.language.code: usage.language for usage in usages}.values():
+                post.get_content_by_language(language).invalidate_render_cache()
+            post.touch()
+            touched.append(post)
+        return touched
+
+    def __drain(self):
+        pending, self.__pending = self.__pending, {}
+        for post in pending.values():
+            self.__index(post)
+
+    def __index(self, post: Post):
+        if self.__versions.get(post.id) == post.version:
+            return
+
+        self.__remove(post.id)
+        medias: set[int] = set()
+        for language in post.get_languages():
+            for block in post.get_content_by_language(language).body:
+                if isinstance(block, MediaBlock):
+                    block_medias = (block.media,)
+                elif isinstance(block, CaroulselBlock):
+                    block_medias = block.medias
+                else:
+                    continue
+                for media in block_medias:
+                    usage = MediaUsage(post, language, block)
+                    self.__usages.setdefault(media.id, {}).setdefault(post.id, []).append(usage)
+                    medias.add(media.id)
+
+        if medias:
+            self.__post_medias[post.id] = medias
+        self.__versions[post.id] = post.version
+
+    def __remove(self, post_id: int):
+        for media_id in self.__post_medias.pop(post_id, ()):
+            by_post = self.__usages[media_id]
+            by_post.pop(post_id, None)
+            if not by_post:
+                del self.__usages[media_id]
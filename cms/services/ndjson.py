@@ -0,0 +1,80 @@
+"""
+leitura e escrita de NDJSON (um objeto JSON por linha) em streaming.
+
+nada é acumulado em memória: a leitura devolve um registro por vez e a escrita
+consome um iterável de registros. arquivos terminados em .gz são comprimidos
+com gzip de forma transparente.
+"""
+import gzip
+import json
+import sys
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator
+
+from cms.exceptions import ValidationError
+
+STDIO = "-"
+# nível 6 comprime quase tanto quanto o 9 e é bem mais rápido
+GZIP_LEVEL = 6
+
+
+@contextmanager
+def open_text(path: str, mode: str = "r", compressed: bool | None = None) -> Iterator[IO[str]]:
+    """
+    abre um arquivo de texto em UTF-8; "-" é stdin/stdout.
+    `compressed` força (ou desliga) o gzip; por padrão vale a extensão .gz.
+    """
+    if compressed is None:
+        compressed = str(path).endswith(".gz")
+
+    if path == STDIO:
+        if not compressed:
+            yield sys.stdin if "r" in mode else sys.stdout
+            return
+        raw = sys.stdin.buffer if "r" in mode else sys.stdout.buffer
+        with gzip.open(raw, mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL) as f:
+            yield f
+        return
+
+    if compressed:
+        with gzip.open(path, mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL) as f:
+            yield f
+        return
+
+    with open(path, mode, encoding="utf-8", newline="\n") as f:
+        yield f
+
+
+def read_ndjson(stream: IO[str]) -> Iterator[tuple[int, dict]]:
+    """
+    gera (número da linha, objeto) para cada linha não vazia.
+
+    raises:
+        ValidationError: Se uma linha não é um objeto JSON
+    """
+    # raw_decode direto evita as camadas de json.loads, que pesam em milhões de linhas
+    decode = json.JSONDecoder().raw_decode
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record, end = decode(line)
+        except ValueError as e:
+            raise ValidationError(f"Linha {line_number}: JSON inválido ({e}).")
+        # raw_decode para no fim do valor: o resto da linha tem que ser só espaço
+        if line[end:].strip():
+            raise ValidationError(f"Linha {line_number}: conteúdo depois do objeto JSON.")
+        if not isinstance(record, dict):
+            raise ValidationError(f"Linha {line_number}: esperado um objeto JSON.")
+        yield line_number, record
+
+
+def write_ndjson(stream: IO[str], records: Iterable[dict]) -> int:
+    """escreve os registros, um por linha, e retorna quantos foram escritos."""
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    written = 0
+    for record in records:
+        stream.write(encode(record))
+        stream.write("\n")
+        written += 1
+    return written
@@ -25,6 +25,13 @@ class EmailNotificationAdapter(NotificationAdapter):
         print(f"📧 E-mail enviado para {user.email}: {message}")
 
 
+class SilentNotificationAdapter(NotificationAdapter):
+    """Adapter que descarta as notificações (rotinas em lote e scripts)."""
+
+    def notify(self, user: User, message: str) -> None:
+        pass
+
+
 class LogNotificationAdapter(NotificationAdapter):
     """Adapter que registra notificações em log."""
 
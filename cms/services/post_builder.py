@@ -1,7 +1,9 @@
+from dataclasses import dataclass, field
 from datetime import datetime
 from cms.utils import read_datetime_from_cli
 from cms.services.languages import LanguageService
 from cms.models import (
+    LanguageCode,
     Site,
     User,
     MediaFile,
@@ -17,6 +19,88 @@ from cms.context import AppContext
 from cms.exceptions import ValidationError, ResourceNotFoundError, CMSException
 
 
+def _field(data: dict, key: str, kind: type, kind_name: str, default=None):
+    """
+    valor do campo, ou `default` se ausente (ou null).
+
+    raises:
+        ValidationError: Se o campo tem outro tipo
+    """
+    value = data.get(key)
+    if value is None:
+        return default
+    # bool é subclasse de int, mas true não é um ID
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ValidationError(f"Campo '{key}' deve ser {kind_name}.")
+    return value
+
+
+@dataclass
+class BlockSpec:
+    """bloco do corpo de um post: texto, ou mídia da biblioteca do site (por ID)."""
+    text: str | None = None
+    media_id: int | None = None
+    alt: str = ""
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BlockSpec':
+        """
+        lê um bloco no formato {"type": "text", "text": ...} ou
+        {"type": "media", "media_id": ..., "alt": ...}.
+
+        raises:
+            ValidationError: Se o bloco está malformado
+        """
+        if not isinstance(data, dict):
+            raise ValidationError("Bloco deve ser um objeto.")
+        kind = _field(data, "type", str, "um texto", "text")
+        if kind == "text":
+            return cls(text=_field(data, "text", str, "um texto"))
+        if kind == "media":
+            return cls(
+                media_id=_field(data, "media_id", int, "um inteiro"),
+                alt=_field(data, "alt", str, "um texto", ""),
+            )
+        raise ValidationError(f"Tipo de bloco '{kind}' não suportado.")
+
+
+@dataclass
+class PostSpec:
+    """descrição declarativa de um post, usada para criá-lo sem prompts."""
+    site: Site
+    poster: User
+    language: LanguageCode
+    title: str
+    blocks: list[BlockSpec] = field(default_factory=list)
+    scheduled_to: datetime | None = None
+
+    @classmethod
+    def from_dict(cls, site: Site, poster: User, data: dict) -> 'PostSpec':
+        """
+        lê language, title, blocks e scheduled_to (ISO 8601) de um dicionário.
+
+        raises:
+            ValidationError: Se algum campo está malformado
+        """
+        raw_blocks = _field(data, "blocks", list, "uma lista", [])
+
+        scheduled_to = data.get("scheduled_to")
+        if scheduled_to:
+            try:
+                scheduled_to = datetime.fromisoformat(scheduled_to)
+            except (TypeError, ValueError):
+                raise ValidationError("Campo 'scheduled_to' deve estar no formato ISO 8601.")
+
+        return cls(
+            site=site,
+            poster=poster,
+            language=_field(data, "language", str, "um texto") or "pt-br",
+            title=_field(data, "title", str, "um texto", ""),
+            blocks=[BlockSpec.from_dict(block) for block in raw_blocks],
+            scheduled_to=scheduled_to or None,
+        )
+
+
 class PostBuilder:
     """
     implementação do padrão builder para construir um objeto post passo a passo
@@ -117,6 +201,35 @@ class PostBuilder:
             self.__scheduled_to = read_datetime_from_cli()
         return self
 
+    def apply_spec(self, spec: PostSpec) -> 'PostBuilder':
+        """
+        caminho não interativo: configura todas as partes a partir de um
+        PostSpec, validando sem nenhuma entrada do usuário.
+
+        raises:
+            ValidationError: Se idioma, título, blocos ou data são inválidos
+            ResourceNotFoundError: Se uma mídia referenciada não existe
+        """
+        self.reset()
+
+        try:
+            self.__language = self.__lang_service.get_language_by_code(spec.language)
+        except ValueError:
+            raise ValidationError(f"Idioma '{spec.language}' não é suportado.")
+
+        self.__title = (spec.title or "").strip()
+        if not self.__title:
+            raise ValidationError("O título não pode estar vazio.")
+
+        for order, block in enumerate(spec.blocks, start=1):
+            self.__blocks.append(self.__build_block(order, block))
+
+        if spec.scheduled_to is not None:
+            if not isinstance(spec.scheduled_to, datetime):
+                raise ValidationError("A data de agendamento é inválida.")
+            self.__scheduled_to = spec.scheduled_to
+        return self
+
     def build(self) -> Post:
         """
         parte final: monta o objeto post com todas as partes configuradas
@@ -143,6 +256,23 @@ class PostBuilder:
         # Retorna o produto final
         return post
 
+    def __build_block(self, order: int, block: BlockSpec) -> ContentBlock:
+        if block.media_id is None:
+            text = (block.text or "").strip()
+            if not text:
+                raise ValidationError(f"Bloco {order}: texto não pode estar vazio.")
+            return TextBlock(order=order, text=text)
+
+        media = self.__media_repo.get_media_by_id(block.media_id)
+        if media.site.id != self.__site.id:
+            raise ValidationError(
+                f"Bloco {order}: mídia {media.id} não pertence ao site '{self.__site.name}'."
+            )
+        alt = (block.alt or "").strip()
+        if not alt:
+            raise ValidationError(f"Bloco {order}: texto alternativo não pode estar vazio.")
+        return MediaBlock(order=order, media=media, alt=alt)
+
     def __select_media_from_library(self) -> MediaFile | None:
         """
         Método privado auxiliar para encapsular a lógica de seleção de mídia.
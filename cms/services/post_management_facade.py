@@ -1,7 +1,10 @@
-from cms.services.post_builder import PostBuilder
+from itertools import batched
+
+from cms.services.post_builder import PostBuilder, PostSpec
 from cms.services.notification_adapter import NotificationAdapter, ConsoleNotificationAdapter
 from cms.models import Post, Site, User, SiteAnalyticsEntry, SiteAction
 from cms.context import AppContext
+from cms.exceptions import CMSException, ValidationError
 
 
 class PostManagementFacade:
@@ -37,4 +40,59 @@ class PostManagementFacade:
             f"Post '{post.get_default_title()}' criado com sucesso no site '{site.name}'!"
         )
 
-        return post
\ No newline at end of file
+        return post
+
+    def create_posts(self, specs: list[PostSpec], batch_size: int = 1000) -> list[Post]:
+        """
+        versão não interativa e em lote de create_and_register_post.
+        todos os specs são validados antes de qualquer escrita; depois os posts
+        são salvos, logados e notificados em lotes de `batch_size`.
+
+        raises:
+            ValidationError: Se algum spec é inválido (nada é salvo)
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser positivo.")
+
+        posts: list[Post] = []
+        builders: dict[tuple[int, int], PostBuilder] = {}
+        for index, spec in enumerate(specs):
+            key = (spec.site.id, spec.poster.id)
+            builder = builders.get(key)
+            if builder is None:
+                builder = builders[key] = PostBuilder(spec.site, spec.poster)
+            try:
+                posts.append(builder.apply_spec(spec).build())
+            except CMSException as e:
+                raise ValidationError(f"Post {index} ('{spec.title}'): {e}")
+
+        for batch in batched(posts, batch_size):
+            self.__register_batch(list(batch))
+        return posts
+
+    def __register_batch(self, posts: list[Post]):
+        self.__context.post_repo.add_posts(posts)
+        self.__context.analytics_repo.log_many(
+            [
+                SiteAnalyticsEntry(
+                    user=post.poster,
+                    site=post.site,
+                    action=SiteAction.CREATE_POST,
+                    metadata={"post_id": str(post.id)},
+                )
+                for post in posts
+            ]
+        )
+
+        # uma notificação por autor e site no lote, não uma por post
+        created: dict[tuple[int, int], list[Post]] = {}
+        for post in posts:
+            created.setdefault((post.poster.id, post.site.id), []).append(post)
+        for site_posts in created.values():
+            user, site = site_posts[0].poster, site_posts[0].site
+            if len(site_posts) == 1:
+                title = site_posts[0].get_default_title()
+                message = f"Post '{title}' criado com sucesso no site '{site.name}'!"
+            else:
+                message = f"{len(site_posts)} posts criados com sucesso no site '{site.name}'!"
+            self.__notification_adapter.notify(user, message)
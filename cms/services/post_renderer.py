@@ -0,0 +1,87 @@
+"""
+renderização de posts em streaming.
+
+as funções daqui são geradores que produzem o documento HTML em pedaços,
+bloco a bloco, então a memória usada não depende do tamanho do post.
+o terminal (Post.iter_display_lines), a exportação estática e a camada HTTP
+consomem os mesmos geradores de blocos do Content.
+"""
+import html
+from typing import Iterable, Iterator
+
+from cms.models import Comment, Language, Post
+
+# (usuário, corpo, data)
+type CommentSource = tuple[str, str, str]
+
+
+def iter_post_document(
+    *,
+    lang: str,
+    title: str,
+    site_name: str,
+    poster: str,
+    created_at: str,
+    body_chunks: Iterable[str],
+    comments: Iterable[CommentSource] = (),
+    other_languages: Iterable[str] = (),
+    index_href: str = "../../index.html",
+) -> Iterator[str]:
+    """gera uma página HTML de post a partir de dados já extraídos."""
+    yield (
+        "<!DOCTYPE html>\n"
+        f"<html lang='{lang}'>\n"
+        f"<head><meta charset='utf-8'><title>{html.escape(title)} - "
+        f"{html.escape(site_name)}</title></head>\n"
+        "<body>\n"
+        f"<nav><a href='{index_href}'>Início</a> "
+    )
+    yield " ".join(f"<a href='{code}.html'>{code}</a>" for code in other_languages)
+    yield (
+        "</nav>\n"
+        f"<article>\n<h1>{html.escape(title)}</h1>\n"
+        f"<p>{html.escape(poster)}@{created_at}</p>\n"
+    )
+    yield from body_chunks
+    yield "\n</article>\n<section class='comments'>\n<h2>Comentários</h2>\n"
+    separator = ""
+    for username, body, comment_created_at in comments:
+        yield (
+            f"{separator}<div class='comment'><p>{html.escape(body)}</p>"
+            f"<small>{html.escape(username)} @ {comment_created_at}</small></div>"
+        )
+        separator = "\n"
+    yield "\n</section>\n</body>\n</html>\n"
+
+
+def iter_post_html(
+    post: Post,
+    language: Language | None = None,
+    comments: Iterable[Comment] = (),
+    index_href: str = "../../index.html",
+) -> Iterator[str]:
+    """gera a página HTML de um post direto do modelo, sem materializar o corpo."""
+    content = post.get_content_by_language(language)
+    lang = content.language.code
+
+    yield from iter_post_document(
+        lang=lang,
+        title=content.title,
+        site_name=post.site.name,
+        poster=post.poster.username,
+        created_at=str(post.created_at),
+        body_chunks=content.iter_body_html(),
+        comments=(
+            (comment.commenter.username, comment.body, str(comment.created_at))
+            for comment in comments
+        ),
+        other_languages=(
+            other.code for other in post.get_languages() if other.code != lang
+        ),
+        index_href=index_href,
+    )
+
+
+def iter_post_text(post: Post, language: Language | None = None) -> Iterator[str]:
+    """gera a visualização de terminal do post, linha a linha."""
+    return post.iter_display_lines(language)
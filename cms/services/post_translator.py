@@ -1,12 +1,25 @@
-from cms.models import MediaBlock, Post, ContentBlock, Content, TextBlock
-from cms.services.languages import LanguageService
+from cms.models import CaroulselBlock, Language, MediaBlock, Post, ContentBlock, Content, TextBlock
+from cms.context import AppContext
 
 
 class PostTranslator:
     def __init__(self, post: Post):
         self.__post = post
         self.__original_language = post.default_language
-        self.__lang_service = LanguageService()
+        self.__lang_service = AppContext().lang_service
+        self.__memory = AppContext().translation_memory
+
+    def __ask(self, prompt: str, text: str, target: Language) -> str:
+        # o que já foi traduzido (neste ou em outro post) aparece como sugestão
+        source = self.__original_language.code
+        suggestion = self.__memory.lookup(text, source, target.code)
+        if suggestion is None:
+            translation = input(f"{prompt}: ").strip()
+        else:
+            translation = input(f"{prompt} [{suggestion}] (Enter mantém): ").strip() or suggestion
+        if translation:
+            self.__memory.store(text, source, target.code, translation)
+        return translation
 
     def translate(self):
         missing_langs = self.__lang_service.get_missing_languages(self.__post)
@@ -22,12 +35,12 @@ class PostTranslator:
             f"Traduzindo post '{original_content.title}' do idioma {self.__original_language} para {target_language}.\n"
         )
 
-        translated_title = input("Tradução do título: ").strip()
+        translated_title = self.__ask("Tradução do título", original_content.title, target_language)
 
         for block in original_content.body:
             if isinstance(block, TextBlock):
                 print(f"Texto original:\n{block.text}")
-                translated_text = input("Tradução: ").strip()
+                translated_text = self.__ask("Tradução", block.text, target_language)
                 translated_block = TextBlock(
                     order=block.order,
                     text=translated_text,
@@ -35,12 +48,25 @@ class PostTranslator:
             elif isinstance(block, MediaBlock):
                 print(f"Mídia: {block.media.filename} ({block.media.media_type.name})")
                 print(f"Texto alternativo original: {block.alt}")
-                translated_alt = input("Tradução do texto alternativo (alt): ").strip()
+                translated_alt = self.__ask(
+                    "Tradução do texto alternativo (alt)", block.alt, target_language
+                )
                 translated_block = MediaBlock(
                     order=block.order,
                     media=block.media,
                     alt=translated_alt,
                 )
+            elif isinstance(block, CaroulselBlock):
+                print(f"Carrossel: {', '.join(media.filename for media in block.medias)}")
+                print(f"Texto alternativo original: {block.alt}")
+                translated_alt = self.__ask(
+                    "Tradução do texto alternativo (alt)", block.alt, target_language
+                )
+                translated_block = CaroulselBlock(
+                    order=block.order,
+                    medias=list(block.medias),
+                    alt=translated_alt,
+                )
             else:
                 print(f"Tipo de bloco não suportado para tradução: {type(block)}")
                 continue
@@ -53,6 +79,7 @@ class PostTranslator:
             language=target_language,
         )
 
-        self.__post.add_content(target_language.code, translated_content)
+        # pelo repositório, que avisa os índices (busca, autocomplete) e o cache das páginas
+        AppContext().post_repo.add_content(self.__post, translated_content)
         print(f"Tradução para '{target_language}' adicionada ao post.")
         input("Clique Enter para voltar.")
@@ -0,0 +1,84 @@
+"""
+agendador de publicação dos posts.
+
+os posts agendados ficam num heap por data no PostRepository. a thread do
+agendador dorme até o primeiro deles ficar visível, chama publish_due (que move
+os posts para o índice de publicados e emite POST_PUBLISHED) e volta a dormir.
+um post novo acorda a thread, que recalcula o próximo horário; por isso o custo
+não depende de quantos posts estão agendados, só de quantos são publicados.
+"""
+import threading
+from datetime import datetime
+
+from cms.events import Observer
+from cms.models import Post
+from cms.repository import PostRepository
+from cms.services.notification_adapter import NotificationAdapter
+
+# nunca dorme mais do que isso, para não depender de o relógio andar certinho
+MAX_SLEEP = 60.0
+
+
+class PostScheduler(Observer):
+    """
+    publica os posts agendados na hora. use start() para subir a thread e
+    stop() para pará-la; sem ela, as leituras do repositório publicam o que
+    estiver vencido, mas os eventos só saem quando alguém lê.
+    """
+
+    def __init__(self, post_repo: PostRepository):
+        self.__post_repo = post_repo
+        self.__wakeup = threading.Event()
+        self.__stopping = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        # um post novo pode estar agendado antes do horário que a thread espera
+        self.__wakeup.set()
+
+    @property
+    def running(self) -> bool:
+        return self.__thread is not None
+
+    def start(self) -> "PostScheduler":
+        if self.__thread is not None:
+            return self
+        self.__stopping.clear()
+        self.__thread = threading.Thread(target=self.__run, name="cms-scheduler", daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__thread is None:
+            return
+        self.__stopping.set()
+        self.__wakeup.set()
+        self.__thread.join()
+        self.__thread = None
+
+    def __run(self):
+        while not self.__stopping.is_set():
+            # limpa antes de olhar o heap: um post que chegar depois acorda o wait
+            self.__wakeup.clear()
+            next_time = self.__post_repo.get_next_publish_time()
+            timeout = MAX_SLEEP
+            if next_time is not None:
+                timeout = min(timeout, (next_time - datetime.now()).total_seconds())
+            if timeout <= 0:
+                self.__post_repo.publish_due()
+                continue
+            self.__wakeup.wait(timeout)
+
+
+class PublishNotifier(Observer):
+    """avisa o autor quando o post agendado dele é publicado."""
+
+    def __init__(self, notification_adapter: NotificationAdapter):
+        self.__notification_adapter = notification_adapter
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        post: Post = kwargs["post"]
+        self.__notification_adapter.notify(
+            post.poster,
+            f"Post '{post.get_default_title()}' publicado no site '{post.site.name}'!",
+        )
@@ -0,0 +1,374 @@
+"""
+busca textual sobre os posts, com índice invertido por site e idioma.
+
+cada Content é indexado pelo título e pelos blocos de texto, com postings
+posicionais (termo -> post -> posições), e os resultados são ranqueados por
+BM25. frases entre aspas exigem os termos em sequência.
+
+o índice é um observador: recebe os posts de POST_CREATED, POSTS_CREATED e
+POST_CONTENT_ADDED e os enfileira; a fila é indexada na próxima busca, então
+as escritas (inclusive importações em lote) não pagam o custo da indexação.
+um post que já está no índice só é reindexado quando Post.version muda.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from cms.events import Observer
+from cms.models import Language, LanguageCode, Post, Site
+from cms.services.text_processing import STOPWORDS, iter_content_text, tokenize
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# até esse total de postings a consulta pontua todos os candidatos; acima,
+# usa os postings ordenados por impacto e para cedo (algoritmo de limiar)
+EXHAUSTIVE_MAX_POSTINGS = 5000
+# variação tolerada do tamanho médio dos posts antes de reordenar os impactos
+IMPACT_AVG_LEN_DRIFT = 0.1
+
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+
+
+@dataclass
+class SearchResult:
+    post: Post
+    language: Language
+    score: float
+
+    @property
+    def title(self) -> str:
+        return self.post.get_content_by_language(self.language).title
+
+
+class _LanguageIndex:
+    """índice invertido dos posts de um site num idioma."""
+
+    __slots__ = ("postings", "doc_terms", "doc_len", "total_len", "impacts", "impacts_avg_len")
+
+    def __init__(self):
+        # termo -> {post_id: posições}
+        self.postings: dict[str, dict[int, tuple[int, ...]]] = {}
+        # termos de cada post, para conseguir removê-lo sem varrer o índice
+        self.doc_terms: dict[int, tuple[str, ...]] = {}
+        self.doc_len: dict[int, int] = {}
+        self.total_len = 0
+        # termos frequentes: postings ordenados por impacto, (-impacto, post_id)
+        self.impacts: dict[str, list[tuple[float, int]]] = {}
+        self.impacts_avg_len = 0.0
+
+    def add(self, post_id: int, tokens: list[str]):
+        positions: dict[str, list[int]] = {}
+        for position, token in enumerate(tokens):
+            if token not in STOPWORDS:
+                positions.setdefault(token, []).append(position)
+
+        length = sum(len(term_positions) for term_positions in positions.values())
+        self.doc_terms[post_id] = tuple(positions)
+        self.doc_len[post_id] = length
+        self.total_len += length
+
+        postings = self.postings
+        for term, term_positions in positions.items():
+            postings.setdefault(term, {})[post_id] = tuple(term_positions)
+            ordered = self.impacts.get(term)
+            if ordered is not None:
+                insort(ordered, (-self.__impact(len(term_positions), length), post_id))
+
+    def remove(self, post_id: int):
+        length = self.doc_len.pop(post_id, 0)
+        for term in self.doc_terms.pop(post_id, ()):
+            term_postings = self.postings[term]
+            tf = len(term_postings.pop(post_id))
+            if not term_postings:
+                del self.postings[term]
+                self.impacts.pop(term, None)
+                continue
+            ordered = self.impacts.get(term)
+            if ordered is not None:
+                key = (-self.__impact(tf, length), post_id)
+                i = bisect_left(ordered, key)
+                if i < len(ordered) and ordered[i] == key:
+                    del ordered[i]
+                else:
+                    ordered.remove(next(item for item in ordered if item[1] == post_id))
+        self.total_len -= length
+
+    def top(
+        self,
+        terms: list[str],
+        phrases: list[list[str]],
+        limit: int,
+        accept: Callable[[int], bool],
+    ) -> list[tuple[float, int]]:
+        """os `limit` melhores (BM25, post_id) aceitos por `accept`."""
+        if not self.doc_len:
+            return []
+
+        weights = self.__idf_weights(terms)
+        if not weights:
+            return []
+
+        if phrases:
+            # frases exigem todos os termos: parte da interseção dos postings
+            candidates: set[int] | None = None
+            for phrase in phrases:
+                for term in phrase:
+                    if term in STOPWORDS:
+                        continue
+                    keys = self.postings.get(term, {}).keys()
+                    candidates = set(keys) if candidates is None else candidates & keys
+
+            visible = accept
+
+            def accept(post_id: int) -> bool:
+                return (
+                    (candidates is None or post_id in candidates)
+                    and all(self.has_phrase(post_id, phrase) for phrase in phrases)
+                    and visible(post_id)
+                )
+
+            if candidates is not None and len(candidates) <= EXHAUSTIVE_MAX_POSTINGS:
+                return self.__top_of(candidates, weights, limit, accept)
+
+        total_postings = sum(len(self.postings[term]) for term in weights)
+        if total_postings <= EXHAUSTIVE_MAX_POSTINGS:
+            candidates = set()
+            for term in weights:
+                candidates.update(self.postings[term])
+            return self.__top_of(candidates, weights, limit, accept)
+
+        return self.__threshold_top(weights, limit, accept)
+
+    def __idf_weights(self, terms: list[str]) -> dict[str, float]:
+        doc_count = len(self.doc_len)
+        weights: dict[str, float] = {}
+        for term in terms:
+            term_postings = self.postings.get(term)
+            if term_postings and term not in weights:
+                df = len(term_postings)
+                weights[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        return weights
+
+    def __impact(self, tf: int, length: int, avg_len: float | None = None) -> float:
+        # parte do BM25 que depende do post (o idf multiplica depois)
+        avg_len = avg_len or self.impacts_avg_len or self.__avg_len()
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+        return tf * (BM25_K1 + 1) / (tf + norm)
+
+    def __avg_len(self) -> float:
+        return (self.total_len / len(self.doc_len) if self.doc_len else 0.0) or 1.0
+
+    def __score(self, post_id: int, weights: dict[str, float], avg_len: float) -> float:
+        length = self.doc_len[post_id]
+        score = 0.0
+        for term, idf in weights.items():
+            term_positions = self.postings[term].get(post_id)
+            if term_positions:
+                score += idf * self.__impact(len(term_positions), length, avg_len)
+        return score
+
+    def __top_of(self, candidates, weights, limit, accept) -> list[tuple[float, int]]:
+        avg_len = self.__avg_len()
+        return heapq.nlargest(
+            limit,
+            (
+                (self.__score(post_id, weights, avg_len), post_id)
+                for post_id in candidates
+                if accept(post_id)
+            ),
+        )
+
+    def __ordered(self, term: str) -> list[tuple[float, int]]:
+        avg_len = self.__avg_len()
+        if abs(avg_len - self.impacts_avg_len) > IMPACT_AVG_LEN_DRIFT * avg_len:
+            # o tamanho médio mudou muito: as ordens em cache ficaram velhas
+            self.impacts.clear()
+            self.impacts_avg_len = avg_len
+
+        ordered = self.impacts.get(term)
+        if ordered is None:
+            doc_len = self.doc_len
+            ordered = sorted(
+                (-self.__impact(len(term_positions), doc_len[post_id]), post_id)
+                for post_id, term_positions in self.postings[term].items()
+            )
+            self.impacts[term] = ordered
+        return ordered
+
+    def __threshold_top(self, weights, limit, accept) -> list[tuple[float, int]]:
+        """
+        algoritmo de limiar (Fagin): percorre os postings de cada termo do maior
+        para o menor impacto e para quando nenhum post ainda não visto pode
+        superar o k-ésimo melhor score.
+        """
+        avg_len = self.__avg_len()
+        lists = [(idf, self.__ordered(term)) for term, idf in weights.items()]
+        seen: set[int] = set()
+        best: list[tuple[float, int]] = []
+
+        depth = 0
+        while True:
+            threshold = 0.0
+            exhausted = True
+            for idf, ordered in lists:
+                if depth >= len(ordered):
+                    continue
+                exhausted = False
+                negative_impact, post_id = ordered[depth]
+                # a ordem foi calculada com um tamanho médio aproximado
+                threshold += idf * -negative_impact * (1 + IMPACT_AVG_LEN_DRIFT)
+                if post_id in seen:
+                    continue
+                seen.add(post_id)
+                if not accept(post_id):
+                    continue
+                item = (self.__score(post_id, weights, avg_len), post_id)
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+            if exhausted or (len(best) >= limit and best[0][0] >= threshold):
+                break
+            depth += 1
+
+        return sorted(best, reverse=True)
+
+    def has_phrase(self, post_id: int, phrase: list[str]) -> bool:
+        # compara as posições relativas dos termos (stopwords só ocupam posição)
+        anchors = [(offset, term) for offset, term in enumerate(phrase) if term not in STOPWORDS]
+        if not anchors:
+            return True
+
+        first_offset, first_term = anchors[0]
+        starts = {
+            position - first_offset
+            for position in self.postings.get(first_term, {}).get(post_id, ())
+        }
+        for offset, term in anchors[1:]:
+            positions = self.postings.get(term, {}).get(post_id, ())
+            starts &= {position - offset for position in positions}
+            if not starts:
+                return False
+        return bool(starts)
+
+
+class SearchIndex(Observer):
+    def __init__(self):
+        self.__indexes: dict[tuple[int, LanguageCode], _LanguageIndex] = {}
+        self.__posts: dict[int, Post] = {}
+        # versão de cada post no momento em que foi indexado
+        self.__versions: dict[int, int] = {}
+        self.__languages: dict[int, dict[LanguageCode, Language]] = {}
+        self.__pending: dict[int, Post] = {}
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        post = kwargs.get("post")
+        posts = kwargs.get("posts", ())
+        with self.__lock:
+            if post is not None:
+                self.__pending[post.id] = post
+            for post in posts:
+                self.__pending[post.id] = post
+
+    def index_post(self, post: Post):
+        """(re)indexa o post agora, se ele mudou desde a última indexação."""
+        with self.__lock:
+            self.__index(post)
+
+    def refresh(self):
+        """indexa agora os posts pendentes (ex: logo depois de uma importação)."""
+        with self.__lock:
+            self.__drain()
+
+    def search(
+        self,
+        site: Site,
+        query: str,
+        language: Language | None = None,
+        limit: int = 10,
+    ) -> list[SearchResult]:
+        """
+        posts visíveis do site mais relevantes para a consulta, do mais para o
+        menos relevante. sem idioma, busca em todos e fica com o melhor
+        idioma de cada post.
+        """
+        phrases = [tokenize(phrase, keep_stopwords=True) for phrase in _PHRASE_RE.findall(query)]
+        terms = tokenize(_PHRASE_RE.sub(" ", query))
+        for phrase in phrases:
+            terms.extend(term for term in phrase if term not in STOPWORDS)
+        if not terms or limit < 1:
+            return []
+
+        with self.__lock:
+            self.__drain()
+
+            if language:
+                codes = [language.code]
+            else:
+                codes = [code for site_id, code in self.__indexes if site_id == site.id]
+
+            now = datetime.now()
+            posts = self.__posts
+
+            def visible(post_id: int) -> bool:
+                return posts[post_id].scheduled_to <= now
+
+            best: dict[int, tuple[float, LanguageCode]] = {}
+            for code in codes:
+                index = self.__indexes.get((site.id, code))
+                if index is None:
+                    continue
+                for score, post_id in index.top(terms, phrases, limit, visible):
+                    if score > best.get(post_id, (0.0, code))[0]:
+                        best[post_id] = (score, code)
+
+            top = heapq.nlargest(
+                limit, ((score, post_id, code) for post_id, (score, code) in best.items())
+            )
+            return [
+                SearchResult(posts[post_id], self.__languages[post_id][code], score)
+                for score, post_id, code in top
+            ]
+
+    def __drain(self):
+        pending, self.__pending = self.__pending, {}
+        for post in pending.values():
+            self.__index(post)
+
+    def __index(self, post: Post):
+        if self.__versions.get(post.id) == post.version:
+            return
+
+        self.__remove(post.id)
+        languages: dict[LanguageCode, Language] = {}
+        for language in post.get_languages():
+            content = post.get_content_by_language(language)
+            tokens: list[str] = []
+            for text in iter_content_text(content):
+                tokens.extend(tokenize(text, keep_stopwords=True))
+
+            key = (post.site.id, language.code)
+            index = self.__indexes.get(key)
+            if index is None:
+                index = self.__indexes[key] = _LanguageIndex()
+            index.add(post.id, tokens)
+            languages[language.code] = language
+
+        self.__posts[post.id] = post
+        self.__languages[post.id] = languages
+        self.__versions[post.id] = post.version
+
+    def __remove(self, post_id: int):
+        post = self.__posts.get(post_id)
+        if post is None:
+            return
+        for code in self.__languages.pop(post_id, {}):
+            self.__indexes[(post.site.id, code)].remove(post_id)
+        self.__versions.pop(post_id, None)
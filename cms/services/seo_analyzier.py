@@ -1,54 +1,247 @@
-from cms.models import MediaBlock, Post, TextBlock, Language
-from cms.views.menu import clear_screen
+"""
+análise de SEO dos posts.
 
+a análise de um conteúdo é uma função pura sobre o título, os textos e os alts,
+então a auditoria de um site inteiro roda num pool de processos. os relatórios
+ficam guardados pelo hash do conteúdo, e numa nova auditoria só o conteúdo que
+mudou é analisado de novo.
+"""
+import hashlib
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator
 
-def display_seo_report(post: Post, language: Language):
-    content = post.get_content_by_language(language)
-    title = content.title
-    blocks = content.body
+from cms.models import (
+    CaroulselBlock,
+    Content,
+    Language,
+    LanguageCode,
+    MediaBlock,
+    Post,
+    Site,
+    TextBlock,
+)
 
-    word_count = 0
-    alt_texts: list[str] = []
-    text_blocks: list[str] = []
-    keywords: dict[str, int] = {}
+TITLE_MAX_LENGTH = 60
+MIN_WORD_COUNT = 300
+# palavras com até 3 letras não contam como palavra-chave
+KEYWORD_MIN_LENGTH = 4
+TOP_KEYWORDS = 5
+# acima disso uma palavra-chave é considerada repetida demais
+MAX_KEYWORD_REPETITIONS = 5
+
+# abaixo disso não compensa subir um pool de processos
+_MIN_JOBS_FOR_POOL = 64
+
+# (título, textos, alts das mídias)
+type SeoSource = tuple[str, tuple[str, ...], tuple[str, ...]]
+
+
+@dataclass
+class SeoReport:
+    title: str
+    title_length: int
+    word_count: int
+    top_keywords: list[tuple[str, int]]
+    repeated_words: list[str]
+    media_count: int
+    missing_alt_count: int
+
+    @property
+    def title_too_long(self) -> bool:
+        return self.title_length > TITLE_MAX_LENGTH
+
+    @property
+    def too_few_words(self) -> bool:
+        return self.word_count < MIN_WORD_COUNT
+
+    @property
+    def issue_count(self) -> int:
+        return (
+            self.title_too_long
+            + self.too_few_words
+            + bool(self.repeated_words)
+            + bool(self.missing_alt_count)
+        )
 
-    for block in blocks:
-        if isinstance(block, TextBlock):
-            text_blocks.append(block.text)
-            words = block.text.lower().split()
-            word_count += len(words)
-            for word in words:
-                if len(word) > 3:
-                    keywords[word] = keywords.get(word, 0) + 1
 
+@dataclass
+class SeoAuditResult:
+    post: Post
+    language: Language
+    report: SeoReport
+
+
+@dataclass
+class SeoAuditSummary:
+    results: list[SeoAuditResult] = field(default_factory=list)
+    analyzed: int = 0
+    cached: int = 0
+
+
+def content_source(content: Content) -> SeoSource:
+    """extrai do Content só o que a análise usa, sem o grafo de objetos."""
+    texts: list[str] = []
+    alts: list[str] = []
+    for block in content.body:
+        if isinstance(block, TextBlock):
+            texts.append(block.text)
         elif isinstance(block, MediaBlock):
-            alt_texts.append(block.alt)
+            alts.append(block.alt)
+        elif isinstance(block, CaroulselBlock):
+            # o alt do carrossel vale para todas as mídias dele
+            alts.extend(block.alt for _ in block.medias)
+    return content.title, tuple(texts), tuple(alts)
+
+
+def source_hash(source: SeoSource) -> str:
+    title, texts, alts = source
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(title.encode())
+    for text in texts:
+        digest.update(b"\0t")
+        digest.update(text.encode())
+    for alt in alts:
+        digest.update(b"\0a")
+        digest.update(alt.encode())
+    return digest.hexdigest()
+
+
+def analyze_source(source: SeoSource) -> SeoReport:
+    title, texts, alts = source
+    word_count = 0
+    keywords: Counter[str] = Counter()
+    for text in texts:
+        words = text.lower().split()
+        word_count += len(words)
+        keywords.update(word for word in words if len(word) >= KEYWORD_MIN_LENGTH)
 
-    title_length = len(title)
-    top_keywords = sorted(
-        keywords.items(), key=lambda x: x[1], reverse=True)[:5]
-    repeated_words = [k for k, v in keywords.items() if v > 5]
+    return SeoReport(
+        title=title,
+        title_length=len(title),
+        word_count=word_count,
+        top_keywords=keywords.most_common(TOP_KEYWORDS),
+        repeated_words=[
+            word for word, count in keywords.items() if count > MAX_KEYWORD_REPETITIONS
+        ],
+        media_count=len(alts),
+        missing_alt_count=sum(1 for alt in alts if not alt.strip()),
+    )
+
+
+def analyze_content(content: Content) -> SeoReport:
+    return analyze_source(content_source(content))
+
+
+def display_seo_report(post: Post, language: Language):
+    # import local: os processos da auditoria importam este módulo e não
+    # precisam carregar os menus
+    from cms.views.menu import clear_screen
+
+    report = analyze_content(post.get_content_by_language(language))
 
     clear_screen()
     print("Análise SEO do Post\n")
-    print(f"Título: {title}")
-    print(f"- Tamanho do título: {title_length} caracteres")
-    if title_length > 60:
-        print("[!] O título está muito longo (ideal < 60).")
+    print(f"Título: {report.title}")
+    print(f"- Tamanho do título: {report.title_length} caracteres")
+    if report.title_too_long:
+        print(f"[!] O título está muito longo (ideal < {TITLE_MAX_LENGTH}).")
 
-    print(f"- Número total de palavras: {word_count}")
-    if word_count < 300:
-        print("[!] O texto tem poucas palavras (ideal > 300).")
+    print(f"- Número total de palavras: {report.word_count}")
+    if report.too_few_words:
+        print(f"[!] O texto tem poucas palavras (ideal > {MIN_WORD_COUNT}).")
 
     print("- Principais palavras-chave:")
-    for word, count in top_keywords:
+    for word, count in report.top_keywords:
         print(f"  - {word} ({count}x)")
 
-    if repeated_words:
+    if report.repeated_words:
         print("[!] Palavras muito repetidas:")
-        print(", ".join(repeated_words))
+        print(", ".join(report.repeated_words))
 
-    if not alt_texts or any(alt.strip() == "" for alt in alt_texts):
+    if report.missing_alt_count:
         print("[!] Algumas imagens estão sem texto alternativo (alt).")
 
     print("\nAnálise finalizada.", end=" ")
+
+
+def _analyze_batch(sources: list[SeoSource]) -> list[SeoReport]:
+    return [analyze_source(source) for source in sources]
+
+
+class SeoAuditor:
+    """
+    auditoria de SEO de todos os posts e idiomas de um site. o auditor guarda
+    os relatórios entre execuções; mantenha a mesma instância para que só o
+    conteúdo alterado seja analisado de novo.
+    """
+
+    def __init__(self, context, workers: int | None = None):
+        self.__context = context
+        self.__workers = workers
+        # hash do conteúdo -> relatório, por site
+        self.__reports: dict[int, dict[str, SeoReport]] = {}
+        # (post, idioma) -> (versão do post, hash), para não recalcular o hash
+        self.__hashes: dict[tuple[int, LanguageCode], tuple[int, str]] = {}
+
+    def audit_site(self, site: Site) -> SeoAuditSummary:
+        """
+        analisa todos os posts do site, inclusive os agendados, e devolve os
+        resultados com mais problemas primeiro.
+        """
+        cached = self.__reports.get(site.id, {})
+        reports: dict[str, SeoReport] = {}
+        pending: dict[str, SeoSource] = {}
+        entries: list[tuple[Post, Language, str]] = []
+
+        for post, language, content in self.__iter_site_contents(site):
+            key = (post.id, language.code)
+            known = self.__hashes.get(key)
+            source = None
+            if known and known[0] == post.version:
+                digest = known[1]
+            else:
+                source = content_source(content)
+                digest = source_hash(source)
+                self.__hashes[key] = (post.version, digest)
+
+            if digest in cached:
+                reports[digest] = cached[digest]
+            elif digest not in pending:
+                pending[digest] = source or content_source(content)
+            entries.append((post, language, digest))
+
+        summary = SeoAuditSummary(cached=len(entries) - len(pending), analyzed=len(pending))
+        reports.update(zip(pending, self.__run(list(pending.values()))))
+        # fica só com o que o site ainda usa, para o cache não crescer sem limite
+        self.__reports[site.id] = reports
+
+        summary.results = [
+            SeoAuditResult(post, language, reports[digest]) for post, language, digest in entries
+        ]
+        summary.results.sort(key=lambda result: (-result.report.issue_count, result.post.id))
+        return summary
+
+    def __iter_site_contents(self, site: Site) -> Iterator[tuple[Post, Language, Content]]:
+        for post in self.__context.post_repo.iter_posts():
+            if post.site.id != site.id:
+                continue
+            for language in post.get_languages():
+                yield post, language, post.get_content_by_language(language)
+
+    def __run(self, sources: list[SeoSource]) -> list[SeoReport]:
+        workers = self.__workers or os.cpu_count() or 1
+        if len(sources) < _MIN_JOBS_FOR_POOL or workers == 1:
+            return _analyze_batch(sources)
+
+        # lotes grandes: cada análise é rápida e o custo está no envio entre processos
+        size = max(1, len(sources) // (workers * 4))
+        batches = [sources[i:i + size] for i in range(0, len(sources), size)]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            return [report for batch in pool.map(_analyze_batch, batches) for report in batch]
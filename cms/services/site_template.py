@@ -1,7 +1,11 @@
+import html
+import threading
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Type
-from cms.models import MediaBlock, Post, Site, SiteTemplateType
+from cms.events import Observer
+from cms.models import Language, MediaBlock, Post, Site, SiteTemplateType
 from cms.repository import PostRepository, AnalyticsRepository
 
 
@@ -22,38 +26,91 @@ class SiteTemplate(ABC):
     def select_posts(self) -> list[Post]:
         pass
 
-    def display(self):
-        print(f"<========== {self.site.name} ==========>")
-        print(self.site.description)
-        print(" ")
+    def display(self, language: Language | None = None):
+        print(self.render(language))
 
-        posts = self.select_posts()
-
-        for post in posts[:3]:
-            self.display_post(post)
+    def render(self, language: Language | None = None) -> str:
+        """renderiza a página inicial do site como texto para o terminal."""
+        lines = [
+            f"<========== {self.site.name} ==========>",
+            self.site.description,
+            " ",
+        ]
 
-        print(" ")
+        for post in self.select_posts()[:3]:
+            rendered = self.render_post(post, _post_language(post, language))
+            if rendered is not None:
+                lines.append(rendered)
+
+        lines.append(" ")
+        return "\n".join(lines)
+
+    def render_html(self, language: Language | None = None) -> str:
+        """renderiza a página inicial do site como um documento HTML."""
+        articles = []
+        for post in self.select_posts()[:3]:
+            rendered = self.render_post_html(post, _post_language(post, language))
+            if rendered is not None:
+                articles.append(rendered)
+
+        lang = language.code if language else ""
+        return (
+            "<!DOCTYPE html>\n"
+            f"<html lang='{lang}'>\n"
+            f"<head><meta charset='utf-8'><title>{html.escape(self.site.name)}</title></head>\n"
+            "<body>\n"
+            f"<header><h1>{html.escape(self.site.name)}</h1>"
+            f"<p>{html.escape(self.site.description)}</p></header>\n"
+            "<main>\n" + "\n".join(articles) + "\n</main>\n"
+            "</body>\n"
+            "</html>\n"
+        )
 
     def display_post(self, post: Post):
-        post.display_post_short()
+        rendered = self.render_post(post)
+        if rendered is not None:
+            print(rendered)
+
+    def render_post(self, post: Post, language: Language | None = None) -> str | None:
+        return post.format_post_short(language)
+
+    def render_post_html(self, post: Post, language: Language | None = None) -> str | None:
+        content = post.get_content_by_language(language)
+        return (
+            f"<article lang='{content.language.code}'>"
+            f"<h2><a href='/{self.site.get_domain()}/posts/{post.id}'>"
+            f"{html.escape(content.title)}</a></h2>"
+            f"<p>{html.escape(post.poster.username)}@{post.created_at}</p>"
+            "</article>"
+        )
+
+
+def _post_language(post: Post, language: Language | None) -> Language | None:
+    # nem todo post tem tradução para o idioma pedido, então cai no idioma padrão
+    if language and post.has_language(language):
+        return language
+    return None
 
 # implementação do strategy
 class TopPostsFirstTemplate(SiteTemplate):
     def select_posts(self):
-        return sorted(
-            self.post_repo.get_site_posts(self.site),
-            key=lambda p: self.analytics_repo.get_post_views(p.id),
-            reverse=True,
-        )
+        posts = self.post_repo.get_site_posts(self.site)
+        # uma consulta para todos os posts (no pipeline, uma ida ao agregador)
+        views = self.analytics_repo.get_posts_views([p.id for p in posts])
+        return _sorted_by(posts, views)
 
 # implementação do strategy
 class TopCommentsFirstTemplate(SiteTemplate):
     def select_posts(self):
-        return sorted(
-            self.post_repo.get_site_posts(self.site),
-            key=lambda p: self.analytics_repo.get_post_comments(p.id),
-            reverse=True,
-        )
+        posts = self.post_repo.get_site_posts(self.site)
+        comments = self.analytics_repo.get_posts_comments([p.id for p in posts])
+        return _sorted_by(posts, comments)
+
+
+def _sorted_by(posts: list[Post], counts: list[int]) -> list[Post]:
+    # decrescente e estável, como sorted(..., reverse=True)
+    ranked = sorted(zip(counts, posts), key=lambda pair: pair[0], reverse=True)
+    return [post for _, post in ranked]
 
 # implementação do strategy
 class FocusOnMediaTemplate(SiteTemplate):
@@ -64,8 +121,13 @@ class FocusOnMediaTemplate(SiteTemplate):
             if any(isinstance(b, MediaBlock) for b in p.get_default_body())
         ]
 
-    def display_post(self, post: Post):
-        post.display_first_post_image()
+    def render_post(self, post: Post, language: Language | None = None) -> str | None:
+        block = post.get_first_media_block()
+        return f"{block.get_content()}\n " if block else None
+
+    def render_post_html(self, post: Post, language: Language | None = None) -> str | None:
+        block = post.get_first_media_block()
+        return f"<figure>{block.get_html()}</figure>" if block else None
 
 # implementação do strategy
 class LatestPostsTemplate(SiteTemplate):
@@ -95,3 +157,93 @@ def build_site_template(
         raise ValueError(f"Unknown template: {site.template}")
 
     return template_cls(site, post_repo, analytics_repo)
+
+
+# templates cuja ordem depende de analytics, que muda sem nenhum evento de post
+ANALYTICS_DRIVEN_TEMPLATES = {
+    SiteTemplateType.TOP_POSTS_FIRST,
+    SiteTemplateType.TOP_COMMENTS_FIRST,
+}
+
+
+class SiteTemplateCache(Observer):
+    """
+    cache das páginas iniciais renderizadas, por (site, template, idioma, formato).
+    é um observador: criação de post e troca de template invalidam o site.
+    templates guiados por analytics expiram depois de `analytics_max_age` segundos
+    e qualquer página expira quando o próximo post agendado do site fica visível.
+
+    as invalidações chegam de outras threads (o agendador publica os posts e
+    emite POST_PUBLISHED na thread dele), então cada site tem uma geração: uma
+    página renderizada enquanto o site era invalidado não entra no cache.
+    """
+
+    def __init__(
+        self,
+        post_repo: PostRepository,
+        analytics_repo: AnalyticsRepository,
+        analytics_max_age: float = 30.0,
+    ):
+        self.post_repo = post_repo
+        self.analytics_repo = analytics_repo
+        self.analytics_max_age = analytics_max_age
+        self.__pages: dict[int, dict[tuple, tuple[str, float]]] = {}
+        # gerações de cada site e de todos (invalidate sem site), sob a trava
+        self.__generations: dict[int, int] = {}
+        self.__epoch = 0
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        site = kwargs.get("site")
+        if site:
+            self.invalidate(site)
+        # eventos de lote trazem os posts; cada site afetado é invalidado uma vez
+        for site in {post.site.id: post.site for post in kwargs.get("posts", ())}.values():
+            self.invalidate(site)
+
+    def invalidate(self, site: Site | None = None):
+        with self.__lock:
+            if site is None:
+                self.__epoch += 1
+                self.__pages.clear()
+            else:
+                self.__generations[site.id] = self.__generations.get(site.id, 0) + 1
+                self.__pages.pop(site.id, None)
+
+    def render(self, site: Site, language: Language | None = None) -> str:
+        return self.__get(site, language, as_html=False)
+
+    def render_html(self, site: Site, language: Language | None = None) -> str:
+        return self.__get(site, language, as_html=True)
+
+    def __get(self, site: Site, language: Language | None, as_html: bool) -> str:
+        key = (site.template, language.code if language else None, as_html)
+        with self.__lock:
+            cached = self.__pages.get(site.id, {}).get(key)
+            if cached and cached[1] > time.time():
+                return cached[0]
+            generation = self.__generation(site)
+
+        # renderiza fora da trava: as leituras do repositório podem publicar posts
+        template = build_site_template(site, self.post_repo, self.analytics_repo)
+        rendered = template.render_html(language) if as_html else template.render(language)
+        expires_at = self.__expires_at(site)
+
+        with self.__lock:
+            if self.__generation(site) == generation:
+                self.__pages.setdefault(site.id, {})[key] = (rendered, expires_at)
+        return rendered
+
+    def __generation(self, site: Site) -> tuple[int, int]:
+        return self.__epoch, self.__generations.get(site.id, 0)
+
+    def __expires_at(self, site: Site) -> float:
+        expires_at = float("inf")
+        if site.template in ANALYTICS_DRIVEN_TEMPLATES:
+            expires_at = time.time() + self.analytics_max_age
+
+        next_scheduled = self.post_repo.get_next_scheduled_time(site)
+        if next_scheduled:
+            expires_at = min(expires_at, next_scheduled.timestamp())
+
+        return expires_at
@@ -1,17 +1,20 @@
 import re
+import threading
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
-from typing import Type
+from typing import Iterable, Type
 
 from cms.models import (
     Post,
     Language,
+    LanguageCode,
     Content,
     TextBlock,
     MediaBlock,
     CaroulselBlock,
     MediaType,
+    Site,
 )
 
 
@@ -21,10 +24,52 @@ class SocialMedia(Enum):
     INSTAGRAM = "Instagram"
 
 
+@dataclass(frozen=True)
+class ShareableContent:
+    """
+    partes de um post num idioma que as sugestões usam. extraídas uma vez e
+    compartilhadas entre as redes sociais.
+    """
+
+    content: Content
+    text_blocks: tuple[str, ...]
+    media_blocks: tuple[MediaBlock, ...]
+    title_hashtags: tuple[str, ...]
+
+
+def extract_shareable_content(post: Post, language: Language) -> ShareableContent:
+    content = post.get_content_by_language(language)
+    text_blocks: list[str] = []
+    media_blocks: list[MediaBlock] = []
+
+    for block in content.body:
+        if isinstance(block, TextBlock):
+            text_blocks.append(block.text)
+        elif isinstance(block, MediaBlock):
+            media_blocks.append(block)
+        elif isinstance(block, CaroulselBlock):
+            media_blocks.extend(
+                MediaBlock(order=block.order, media=media, alt=block.alt)
+                for media in block.medias
+            )
+
+    title_hashtags: list[str] = []
+    for word in post.get_default_title().lower().split()[:3]:
+        clean_word = re.sub(r"[^a-zA-Z0-9]", "", word)
+        if len(clean_word) > 2:
+            title_hashtags.append(f"#{clean_word}")
+
+    return ShareableContent(
+        content, tuple(text_blocks), tuple(media_blocks), tuple(title_hashtags)
+    )
+
+
 @dataclass
 class SocialMediaPost(ABC):
     original_post: Post
     language: Language
+    # extraído no primeiro uso; a geração em lote passa o mesmo para todas as redes
+    shareable: ShareableContent | None = field(default=None, repr=False, compare=False)
 
     @abstractmethod
     def get_suggested_text(self) -> str:
@@ -42,64 +87,42 @@ class SocialMediaPost(ABC):
     def get_media_recommendation(self) -> str:
         pass
 
+    def _get_shareable(self) -> ShareableContent:
+        if self.shareable is None:
+            self.shareable = extract_shareable_content(self.original_post, self.language)
+        return self.shareable
+
     def _get_post_content(self) -> Content:
-        return self.original_post.get_content_by_language(self.language)
+        return self._get_shareable().content
 
     def _extract_text_blocks(self) -> list[str]:
-        content = self._get_post_content()
-        text_blocks: list[str] = []
-
-        for block in content.body:
-            if isinstance(block, TextBlock):
-                text_blocks.append(block.text)
-
-        return text_blocks
+        return list(self._get_shareable().text_blocks)
 
     def _extract_media_blocks(self) -> list[MediaBlock]:
-        content = self._get_post_content()
-        media_blocks: list[MediaBlock] = []
-
-        for block in content.body:
-            if isinstance(block, MediaBlock):
-                media_blocks.append(block)
-            elif isinstance(block, CaroulselBlock):
-                for media in block.medias:
-                    media_blocks.append(
-                        MediaBlock(order=block.order,
-                                   media=media, alt=block.alt)
-                    )
-
-        return media_blocks
+        return list(self._get_shareable().media_blocks)
 
     def _get_hash_tags_from_title(self) -> list[str]:
-        tags: list[str] = []
-
-        title_words = self.original_post.get_default_title().lower().split()
-        for word in title_words[:3]:
-            clean_word = re.sub(r"[^a-zA-Z0-9]", "", word)
-            if len(clean_word) > 2:
-                tags.append(f"#{clean_word}")
+        return list(self._get_shareable().title_hashtags)
 
-        return tags
+    def _get_site_hashtag(self) -> str:
+        return f"#{self.original_post.site.name.replace(' ', '').replace('-', '')}"
 
     def get_media_summary(self) -> str:
-        media_blocks = self._extract_media_blocks()
+        media_blocks = self._get_shareable().media_blocks
 
         if not media_blocks:
             return "❌ Nenhuma mídia disponível para esta rede social."
 
-        summary = f"📎 {len(media_blocks)} mídia(s) disponível(is) para anexar:\n"
+        lines = [f"📎 {len(media_blocks)} mídia(s) disponível(is) para anexar:\n"]
         for i, media_block in enumerate(media_blocks):
             media = media_block.media
-            summary += f"   {i + 1}. {media.media_type}: {media.filename}\n"
-            summary += f"      URL: {media.url}\n"
+            lines.append(f"   {i + 1}. {media.media_type}: {media.filename}\n")
+            lines.append(f"      URL: {media.url}\n")
             if media.media_type == MediaType.VIDEO:
-                summary += f"      Duração: {media.duration}\n"
-            summary += (
-                f"      Dimensões: {media.dimension} | Alt: {media_block.alt}\n\n"
-            )
+                lines.append(f"      Duração: {media.duration}\n")
+            lines.append(f"      Dimensões: {media.dimension} | Alt: {media_block.alt}\n\n")
 
-        return summary
+        return "".join(lines)
 
     def display_sharing_suggestion(self):
         print(f"\n{'=' * 60}")
@@ -139,27 +162,19 @@ class FacebookPost(SocialMediaPost):
 
     def get_suggested_text(self) -> str:
         content = self._get_post_content()
+        poster = self.original_post.poster
 
-        suggested_text = f"📢 {content.title}\n\n"
-        suggested_text += self._get_text_content_to_display()
-        suggested_text += f"✍️ Por: {self.original_post.poster.first_name} {self.original_post.poster.last_name}\n"
-        suggested_text += (
-            f"🔗 Leia o artigo completo em: {self.original_post.site.get_url()}\n\n"
-        )
-        suggested_text += (
-            f"#{self.original_post.site.name.replace(' ', '').replace('-', '')} "
-        )
-        suggested_text += f"#blog #conteúdo #{content.language.code}"
-
-        return suggested_text
+        return "".join([
+            f"📢 {content.title}\n\n",
+            self._get_text_content_to_display(),
+            f"✍️ Por: {poster.first_name} {poster.last_name}\n",
+            f"🔗 Leia o artigo completo em: {self.original_post.site.get_url()}\n\n",
+            f"{self._get_site_hashtag()} ",
+            f"#blog #conteúdo #{content.language.code}",
+        ])
 
     def _get_text_content_to_display(self) -> str:
-        text_blocks = self._extract_text_blocks()
-
-        content = ""
-        for text in text_blocks:
-            content += f"{text}\n\n"
-
+        content = "".join(f"{text}\n\n" for text in self._get_shareable().text_blocks)
         return content[: self.get_character_limit()]
 
     def get_media_recommendation(self) -> str:
@@ -180,25 +195,23 @@ class InstagramPost(SocialMediaPost):
     def get_suggested_text(self) -> str:
         content = self._get_post_content()
 
-        suggested_text = f"{content.title} ✨\n\n"
+        parts = [f"{content.title} ✨\n\n"]
 
-        text_blocks = self._extract_text_blocks()
+        text_blocks = self._get_shareable().text_blocks
         if text_blocks:
             first_text = text_blocks[0]
             if len(first_text) > 300:
                 first_text = first_text[:297] + "..."
-            suggested_text += f"{first_text}\n\n"
+            parts.append(f"{first_text}\n\n")
 
-        suggested_text += "🔗 Link na bio para ler completo\n\n"
+        parts.append("🔗 Link na bio para ler completo\n\n")
+        parts.append(self._generate_instagram_hashtags(content.language.code))
 
-        hashtags = self._generate_instagram_hashtags(content.language.code)
-        suggested_text += hashtags
-
-        return suggested_text[: self.get_character_limit()]
+        return "".join(parts)[: self.get_character_limit()]
 
     def _generate_instagram_hashtags(self, lang_code: str) -> str:
-        base_tags = [
-            f"#{self.original_post.site.name.replace(' ', '').replace('-', '')}",
+        return " ".join([
+            self._get_site_hashtag(),
             "#blog",
             "#conteudo",
             "#inspiracao",
@@ -209,9 +222,8 @@ class InstagramPost(SocialMediaPost):
             f"#{lang_code}",
             "#post",
             "#novidades",
-        ]
-        base_tags.extend(self._get_hash_tags_from_title())
-        return " ".join(base_tags)
+            *self._get_shareable().title_hashtags,
+        ])
 
     def get_media_recommendation(self) -> str:
         return (
@@ -234,7 +246,7 @@ class TwitterPost(SocialMediaPost):
         available_chars = self.get_character_limit()
 
         link = f" {self.original_post.site.get_url()}"
-        hashtags = f" #{self.original_post.site.name.replace(' ', '').replace('-', '')} #{content.language.code}"
+        hashtags = f" {self._get_site_hashtag()} #{content.language.code}"
         reserved_chars = len(link) + len(hashtags) + 10
 
         title_and_text_limit = available_chars - reserved_chars
@@ -246,10 +258,9 @@ class TwitterPost(SocialMediaPost):
 
     def _get_text_content_limit(self, content: Content, limit: int) -> str:
         main_text = content.title
-        text_blocks = self._extract_text_blocks()
+        text_blocks = self._get_shareable().text_blocks
         if text_blocks and len(main_text) < limit - 50:
-            first_text = text_blocks[0][:100]
-            main_text += f"\n\n{first_text}"
+            main_text = f"{main_text}\n\n{text_blocks[0][:100]}"
 
         if len(main_text) > limit:
             main_text = main_text[: limit - 3] + "..."
@@ -291,9 +302,11 @@ class SocialMediaPoster(ABC):
     def factory_method(self) -> Type[SocialMediaPost]:
         pass
 
-    def create_post(self, post: Post, language: Language) -> SocialMediaPost:
+    def create_post(
+        self, post: Post, language: Language, shareable: ShareableContent | None = None
+    ) -> SocialMediaPost:
         product_class = self.factory_method()
-        return product_class(original_post=post, language=language)
+        return product_class(original_post=post, language=language, shareable=shareable)
 
 
 class FacebookPoster(SocialMediaPoster):
@@ -328,3 +341,84 @@ def get_social_media_poster(platform: SocialMedia) -> SocialMediaPoster:
     if not factory_class:
         raise ValueError(f"Plataforma desconhecida: {platform}")
     return factory_class()
+
+
+@dataclass
+class ShareSuggestion:
+    post: Post
+    platform: SocialMedia
+    language: Language
+    text: str
+    media_summary: str
+    character_limit: int
+
+    @property
+    def fits(self) -> bool:
+        return len(self.text) <= self.character_limit
+
+
+class SocialShareGenerator:
+    """
+    gera as sugestões de compartilhamento de muitos posts de uma vez (post x
+    rede social x idioma). o conteúdo de cada post e idioma é extraído uma vez
+    para todas as redes, e as sugestões ficam guardadas até o post mudar.
+    """
+
+    def __init__(self, context):
+        self.__context = context
+        # (post, idioma, rede) -> (carimbo do post, sugestão)
+        self.__cache: dict[tuple[int, LanguageCode, SocialMedia], tuple[tuple, ShareSuggestion]] = {}
+        # o SocialPublisher gera sugestões na thread do agendador (POST_PUBLISHED)
+        self.__lock = threading.Lock()
+
+    def generate(
+        self, posts: Iterable[Post], platforms: Iterable[SocialMedia] = tuple(SocialMedia)
+    ) -> list[ShareSuggestion]:
+        platforms = list(platforms)
+        posters = {platform: get_social_media_poster(platform) for platform in platforms}
+        suggestions: list[ShareSuggestion] = []
+
+        for post in posts:
+            # o texto também depende do nome do site e do autor
+            stamp = (post.version, post.site.name, post.poster.first_name, post.poster.last_name)
+            for language in post.get_languages():
+                shareable = None
+                for platform in platforms:
+                    key = (post.id, language.code, platform)
+                    with self.__lock:
+                        cached = self.__cache.get(key)
+                    if cached and cached[0] == stamp:
+                        suggestions.append(cached[1])
+                        continue
+
+                    if shareable is None:
+                        shareable = extract_shareable_content(post, language)
+                    social_post = posters[platform].create_post(post, language, shareable)
+                    suggestion = ShareSuggestion(
+                        post,
+                        platform,
+                        language,
+                        social_post.get_suggested_text(),
+                        social_post.get_media_summary(),
+                        social_post.get_character_limit(),
+                    )
+                    with self.__lock:
+                        self.__cache[key] = (stamp, suggestion)
+                    suggestions.append(suggestion)
+
+        return suggestions
+
+    def generate_site(
+        self,
+        site: Site,
+        platforms: Iterable[SocialMedia] = tuple(SocialMedia),
+        include_scheduled: bool = False,
+    ) -> list[ShareSuggestion]:
+        """sugestões de todos os posts do site; por padrão só os já publicados."""
+        if include_scheduled:
+            posts = [
+                post for post in self.__context.post_repo.iter_posts() if post.site.id == site.id
+            ]
+        else:
+            posts = self.__context.post_repo.get_site_posts(site)
+        return self.generate(posts, platforms)
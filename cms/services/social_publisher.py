@@ -0,0 +1,632 @@
+"""
+publicação das sugestões de compartilhamento nas redes sociais.
+
+os jobs (post, rede, idioma, texto) entram numa fila persistente: cada operação
+é uma linha NDJSON num diário, relido na inicialização, então um processo que
+cai não perde nem repete publicações confirmadas. cada rede tem um worker que
+respeita um balde de tokens (a cota da API), publica em lotes e, em caso de
+falha, agenda nova tentativa com espera exponencial. cada publicação confirmada
+vira uma entrada SHARE no analytics. a fila lembra de cada (post, rede, idioma)
+já enfileirado, inclusive os publicados, e não aceita o mesmo de novo.
+
+o cliente é plugável: HttpSocialClient fala com qualquer endpoint no formato de
+cms.web.social_stub, o stub local usado em testes e demonstrações.
+"""
+import heapq
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from typing import Callable, Iterable
+from urllib.parse import urlsplit
+
+from cms.events import Observer
+from cms.exceptions import CMSException, SocialPublishError
+from cms.models import LanguageCode, Post, PostAction, PostAnalyticsEntry, Site
+from cms.services.social_media import SocialMedia
+
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+MAX_ATTEMPTS = 5
+# espera antes da n-ésima nova tentativa: BACKOFF_BASE * 2^(n-1), com variação
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 300.0
+# o diário é reescrito só com os jobs pendentes depois de tantos concluídos
+COMPACT_AFTER = 10_000
+
+
+@dataclass
+class RateLimit:
+    """cota de uma plataforma: publicações por segundo, rajada e tamanho do lote."""
+
+    per_second: float
+    burst: int
+    batch_size: int
+
+
+DEFAULT_LIMITS: dict[SocialMedia, RateLimit] = {
+    SocialMedia.TWITTER: RateLimit(per_second=5, burst=10, batch_size=10),
+    SocialMedia.FACEBOOK: RateLimit(per_second=10, burst=50, batch_size=50),
+    SocialMedia.INSTAGRAM: RateLimit(per_second=2, burst=10, batch_size=10),
+}
+
+
+# (post, rede, idioma): um compartilhamento só é feito uma vez
+type ShareKey = tuple[int, SocialMedia, LanguageCode]
+
+
+@dataclass
+class ShareJob:
+    id: int
+    post_id: int
+    platform: SocialMedia
+    language: LanguageCode
+    text: str
+    # momento (epoch) a partir do qual pode ser publicado
+    not_before: float
+    attempts: int = 0
+    status: str = JOB_PENDING
+    external_id: str | None = None
+    error: str | None = None
+
+    @property
+    def key(self) -> "ShareKey":
+        return self.post_id, self.platform, self.language
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        record["platform"] = self.platform.name
+        return record
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "ShareJob":
+        return cls(**{**record, "platform": SocialMedia[record["platform"]]})
+
+
+class TokenBucket:
+    """balde de tokens: enche `rate` tokens por segundo até `capacity`."""
+
+    def __init__(self, rate: float, capacity: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.__clock = clock
+        self.__tokens = float(capacity)
+        self.__updated = clock()
+        self.__lock = threading.Lock()
+
+    def take(self, tokens: int = 1) -> float:
+        """
+        tira os tokens e retorna 0, ou não tira nada e retorna quantos
+        segundos faltam para haver tokens suficientes.
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            if self.__tokens >= tokens:
+                self.__tokens -= tokens
+                return 0.0
+            return (tokens - self.__tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """esvazia o balde por `seconds` (ex: a plataforma respondeu 429)."""
+        with self.__lock:
+            self.__tokens = -seconds * self.rate
+            self.__updated = self.__clock()
+
+
+class ShareQueue:
+    """
+    fila de jobs por plataforma, ordenada pelo momento de publicação. com
+    `path`, cada operação é gravada num diário NDJSON e a fila sobrevive a
+    reinícios; sem `path`, vive só em memória.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.__jobs: dict[int, ShareJob] = {}
+        # plataforma -> heap de (not_before, id) dos jobs prontos para tentar
+        self.__ready: dict[SocialMedia, list[tuple[float, int]]] = {
+            platform: [] for platform in SocialMedia
+        }
+        self.__in_flight: set[int] = set()
+        # chaves de todos os jobs já enfileirados, inclusive os concluídos e removidos
+        self.__known: set[ShareKey] = set()
+        self.__finished = 0
+        self.__ids = count(1)
+        self.__path = Path(path) if path else None
+        self.__journal = None
+        self.__condition = threading.Condition()
+
+        if self.__path:
+            self.__replay()
+            self.__journal = open(self.__path, "a", encoding="utf-8")
+
+    def close(self):
+        with self.__condition:
+            if self.__journal:
+                self.__journal.close()
+                self.__journal = None
+
+    def add(self, jobs: Iterable[tuple[int, SocialMedia, LanguageCode, str, float]]) -> list[ShareJob]:
+        """
+        enfileira (post_id, plataforma, idioma, texto, not_before) de uma vez e
+        retorna os jobs criados. o que a fila já conhece (pendente, com falha ou
+        publicado) é ignorado, então enfileirar de novo não publica duas vezes.
+        """
+        with self.__condition:
+            added = []
+            for post_id, platform, language, text, not_before in jobs:
+                if (post_id, platform, language) in self.__known:
+                    continue
+                job = ShareJob(next(self.__ids), post_id, platform, language, text, not_before)
+                self.__known.add(job.key)
+                self.__jobs[job.id] = job
+                heapq.heappush(self.__ready[platform], (not_before, job.id))
+                added.append(job)
+            self.__write([{"op": "add", "job": job.to_dict()} for job in added])
+            self.__condition.notify_all()
+            return added
+
+    def take(self, platform: SocialMedia, limit: int, timeout: float) -> list[ShareJob]:
+        """
+        tira até `limit` jobs prontos da plataforma, esperando no máximo
+        `timeout` segundos por um. os jobs ficam em andamento até
+        complete/retry/fail.
+        """
+        deadline = time.time() + timeout
+        with self.__condition:
+            ready = self.__ready[platform]
+            while True:
+                now = time.time()
+                if ready and ready[0][0] <= now:
+                    break
+                wait = deadline - now
+                if ready:
+                    wait = min(wait, ready[0][0] - now)
+                if wait <= 0 and now >= deadline:
+                    return []
+                self.__condition.wait(max(wait, 0.001))
+
+            taken = []
+            while ready and ready[0][0] <= now and len(taken) < limit:
+                _, job_id = heapq.heappop(ready)
+                taken.append(self.__jobs[job_id])
+                self.__in_flight.add(job_id)
+            return taken
+
+    def complete(self, job: ShareJob, external_id: str):
+        with self.__condition:
+            job.status, job.external_id = JOB_DONE, external_id
+            self.__finish(job, {"op": "done", "id": job.id, "external_id": external_id})
+
+    def retry(self, job: ShareJob, not_before: float, error: str, count_attempt: bool = True):
+        """reagenda o job; estouro de cota não conta como tentativa."""
+        with self.__condition:
+            if count_attempt:
+                job.attempts += 1
+            job.not_before, job.error = not_before, error
+            self.__in_flight.discard(job.id)
+            heapq.heappush(self.__ready[job.platform], (not_before, job.id))
+            self.__write([{
+                "op": "retry", "id": job.id, "attempts": job.attempts,
+                "not_before": not_before, "error": error,
+            }])
+            self.__condition.notify_all()
+
+    def fail(self, job: ShareJob, error: str):
+        with self.__condition:
+            job.attempts += 1
+            job.status, job.error = JOB_FAILED, error
+            self.__finish(job, {"op": "failed", "id": job.id, "error": error})
+
+    def release(self, jobs: list[ShareJob]):
+        """devolve jobs tirados e não tentados (ex: o worker está parando)."""
+        with self.__condition:
+            for job in jobs:
+                self.__in_flight.discard(job.id)
+                heapq.heappush(self.__ready[job.platform], (job.not_before, job.id))
+            self.__condition.notify_all()
+
+    def pending_count(self) -> int:
+        with self.__condition:
+            return sum(1 for job in self.__jobs.values() if job.status == JOB_PENDING)
+
+    def failed_jobs(self) -> list[ShareJob]:
+        with self.__condition:
+            return [job for job in self.__jobs.values() if job.status == JOB_FAILED]
+
+    def wait_until_drained(self, timeout: float | None = None) -> bool:
+        """espera até não haver jobs pendentes nem em andamento."""
+        with self.__condition:
+            return self.__condition.wait_for(
+                lambda: not self.__in_flight and not any(self.__ready.values()), timeout
+            )
+
+    def __finish(self, job: ShareJob, record: dict):
+        self.__in_flight.discard(job.id)
+        if job.status == JOB_DONE:
+            del self.__jobs[job.id]
+        self.__finished += 1
+        self.__write([record])
+        if self.__finished >= COMPACT_AFTER:
+            self.__compact()
+        self.__condition.notify_all()
+
+    def __write(self, records: list[dict]):
+        if self.__journal and records:
+            self.__journal.write("".join(json.dumps(record) + "\n" for record in records))
+            self.__journal.flush()
+
+    def __replay(self):
+        if not self.__path.exists():
+            return
+        last_id = 0
+        with open(self.__path, encoding="utf-8") as journal:
+            for line in journal:
+                if not line.strip():
+                    continue
+                try:
+                    last_id = max(last_id, self.__apply(json.loads(line)))
+                except (ValueError, KeyError, TypeError):
+                    # linha cortada no fim (queda durante a escrita)
+                    continue
+
+        self.__ids = count(last_id + 1)
+        for job in self.__jobs.values():
+            if job.status == JOB_PENDING:
+                heapq.heappush(self.__ready[job.platform], (job.not_before, job.id))
+        self.__compact()
+
+    def __apply(self, record: dict) -> int:
+        """aplica um registro do diário e retorna o id do job criado (ou 0)."""
+        op = record["op"]
+        if op == "add":
+            job = ShareJob.from_dict(record["job"])
+            self.__jobs[job.id] = job
+            self.__known.add(job.key)
+            return job.id
+        if op == "shared":
+            self.__known.add(
+                (record["post_id"], SocialMedia[record["platform"]], record["language"])
+            )
+            return 0
+        # retry/done/failed de um job que não está no diário (ex: o add se perdeu)
+        job = self.__jobs.get(record["id"])
+        if job is None:
+            return 0
+        if op == "done":
+            del self.__jobs[job.id]
+        elif op == "retry":
+            job.attempts, job.not_before = record["attempts"], record["not_before"]
+            job.error = record["error"]
+        elif op == "failed":
+            job.attempts += 1
+            job.status, job.error = JOB_FAILED, record["error"]
+        return 0
+
+    def __compact(self):
+        """
+        reescreve o diário só com o estado atual dos jobs que sobraram e as
+        chaves dos já publicados.
+        """
+        self.__finished = 0
+        if not self.__path:
+            return
+        tmp_path = self.__path.with_suffix(self.__path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for job in self.__jobs.values():
+                f.write(json.dumps({"op": "add", "job": job.to_dict()}) + "\n")
+            current = {job.key for job in self.__jobs.values()}
+            for post_id, platform, language in self.__known - current:
+                record = {
+                    "op": "shared", "post_id": post_id, "platform": platform.name,
+                    "language": language,
+                }
+                f.write(json.dumps(record) + "\n")
+        if self.__journal:
+            self.__journal.close()
+        os.replace(tmp_path, self.__path)
+        if self.__journal:
+            self.__journal = open(self.__path, "a", encoding="utf-8")
+
+
+class SocialPlatformClient(ABC):
+    """interface de publicação numa rede social."""
+
+    @abstractmethod
+    def publish(self, platform: SocialMedia, jobs: list[ShareJob]) -> list[str | SocialPublishError]:
+        """
+        publica o lote e retorna, para cada job, o id externo ou o erro daquele
+        item.
+
+        raises:
+            SocialPublishError: Se o lote inteiro falhou (ex: cota excedida)
+        """
+        pass
+
+
+class HttpSocialClient(SocialPlatformClient):
+    """
+    cliente HTTP/JSON: POST {url}/{plataforma}/posts/batch. uma conexão
+    keep-alive por thread, então cada worker reaproveita a sua.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10.0):
+        parts = urlsplit(base_url)
+        self.__host = parts.hostname or "127.0.0.1"
+        self.__port = parts.port or 80
+        self.__prefix = parts.path.rstrip("/")
+        self.__timeout = timeout
+        self.__local = threading.local()
+        # conexões de todas as threads, para close()
+        self.__connections: list[http.client.HTTPConnection] = []
+        self.__connections_lock = threading.Lock()
+
+    def close(self):
+        with self.__connections_lock:
+            for connection in self.__connections:
+                connection.close()
+            self.__connections.clear()
+
+    def publish(self, platform: SocialMedia, jobs: list[ShareJob]) -> list[str | SocialPublishError]:
+        body = json.dumps({
+            "items": [{"ref": job.id, "text": job.text, "language": job.language} for job in jobs]
+        }).encode("utf-8")
+        path = f"{self.__prefix}/{platform.name.lower()}/posts/batch"
+
+        status, headers, payload = self.__post(path, body)
+        if status == 429:
+            retry_after = float(headers.get("retry-after") or 1)
+            raise SocialPublishError("Cota da plataforma excedida.", retry_after=retry_after)
+        if status >= 500:
+            raise SocialPublishError(f"Plataforma respondeu {status}.")
+        if status != 200:
+            raise SocialPublishError(f"Plataforma recusou o lote ({status}).", permanent=True)
+
+        try:
+            return self.__parse_results(jobs, payload)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # uma exceção qualquer aqui mataria o worker com o lote em andamento
+            raise SocialPublishError(f"Resposta inválida da plataforma: {e!r}.")
+
+    @staticmethod
+    def __parse_results(jobs: list[ShareJob], payload: bytes) -> list[str | SocialPublishError]:
+        by_ref = {result["ref"]: result for result in json.loads(payload)["results"]}
+        results: list[str | SocialPublishError] = []
+        for job in jobs:
+            result = by_ref.get(job.id)
+            if result is None:
+                results.append(SocialPublishError("Item sem resposta da plataforma."))
+            elif "id" in result:
+                results.append(str(result["id"]))
+            else:
+                results.append(
+                    SocialPublishError(str(result["error"]), permanent=not result.get("retryable"))
+                )
+        return results
+
+    def __post(self, path: str, body: bytes) -> tuple[int, dict[str, str], bytes]:
+        try:
+            return self.__request(path, body)
+        except (OSError, http.client.HTTPException):
+            # a conexão keep-alive pode ter sido fechada pelo servidor: reconecta uma vez
+            pass
+        try:
+            return self.__request(path, body)
+        except (OSError, http.client.HTTPException) as e:
+            raise SocialPublishError(f"Falha de conexão com a plataforma: {e}")
+
+    def __request(self, path: str, body: bytes) -> tuple[int, dict[str, str], bytes]:
+        connection = getattr(self.__local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.__host, self.__port, timeout=self.__timeout)
+            self.__local.connection = connection
+            with self.__connections_lock:
+                self.__connections.append(connection)
+        try:
+            connection.request("POST", path, body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.__local.connection = None
+            raise
+        headers = {name.lower(): value for name, value in response.getheaders()}
+        return response.status, headers, payload
+
+
+class SocialPublisher(Observer):
+    """
+    enfileira compartilhamentos e os publica com um worker por plataforma.
+    use start() para subir os workers e stop() para pará-los; os jobs que
+    sobrarem continuam no diário da fila. se inscrito em POST_PUBLISHED (num
+    processo que fica rodando), compartilha cada post quando o agendador o publica.
+    """
+
+    def __init__(
+        self,
+        context,
+        client: SocialPlatformClient,
+        queue: ShareQueue | None = None,
+        limits: dict[SocialMedia, RateLimit] | None = None,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.__context = context
+        self.__client = client
+        self.queue = queue or ShareQueue()
+        self.__limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.__buckets = {
+            platform: TokenBucket(limit.per_second, limit.burst)
+            for platform, limit in self.__limits.items()
+        }
+        self.__max_attempts = max_attempts
+        self.__stopping = threading.Event()
+        self.__threads: list[threading.Thread] = []
+        # publicações confirmadas que não entraram no analytics, com o erro
+        self.unlogged: list[tuple[ShareJob, str]] = []
+        self.__unlogged_lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        self.enqueue_posts([kwargs["post"]])
+
+    def enqueue_posts(
+        self,
+        posts: Iterable[Post],
+        platforms: Iterable[SocialMedia] = tuple(SocialMedia),
+        at: datetime | None = None,
+    ) -> list[ShareJob]:
+        """
+        enfileira o compartilhamento de cada post em cada rede e idioma. sem
+        `at`, cada post é publicado quando ficar visível (scheduled_to).
+        """
+        suggestions = self.__context.share_generator.generate(posts, platforms)
+        return self.queue.add(
+            (
+                suggestion.post.id,
+                suggestion.platform,
+                suggestion.language.code,
+                suggestion.text,
+                (at or suggestion.post.scheduled_to).timestamp(),
+            )
+            for suggestion in suggestions
+            if suggestion.fits
+        )
+
+    def enqueue_site(
+        self, site: Site, platforms: Iterable[SocialMedia] = tuple(SocialMedia)
+    ) -> list[ShareJob]:
+        posts = [post for post in self.__context.post_repo.iter_posts() if post.site.id == site.id]
+        return self.enqueue_posts(posts, platforms)
+
+    def start(self) -> "SocialPublisher":
+        self.__stopping.clear()
+        for platform in self.__limits:
+            thread = threading.Thread(
+                target=self.__work, args=(platform,), name=f"cms-share-{platform.name.lower()}",
+                daemon=True,
+            )
+            thread.start()
+            self.__threads.append(thread)
+        return self
+
+    def stop(self):
+        self.__stopping.set()
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+    def __work(self, platform: SocialMedia):
+        limit = self.__limits[platform]
+        bucket = self.__buckets[platform]
+        # o lote nunca passa da rajada, senão o balde nunca teria tokens suficientes
+        batch_size = max(1, min(limit.batch_size, limit.burst))
+
+        while not self.__stopping.is_set():
+            jobs = self.queue.take(platform, batch_size, timeout=0.2)
+            if not jobs:
+                continue
+
+            wait = bucket.take(len(jobs))
+            while wait and not self.__stopping.is_set():
+                self.__stopping.wait(wait)
+                wait = bucket.take(len(jobs))
+            if wait:
+                self.queue.release(jobs)
+                return
+
+            try:
+                results = self.__client.publish(platform, jobs)
+                if len(results) != len(jobs):
+                    raise SocialPublishError(
+                        f"Cliente retornou {len(results)} resultados para {len(jobs)} jobs."
+                    )
+            except SocialPublishError as e:
+                if e.retry_after:
+                    bucket.pause(e.retry_after)
+                for job in jobs:
+                    self.__handle_error(job, e)
+                continue
+            except Exception as e:
+                # o cliente é plugável: um erro qualquer dele não pode matar o worker
+                # com o lote em andamento, senão wait_until_drained nunca retorna
+                error = SocialPublishError(f"Erro inesperado do cliente: {e!r}")
+                for job in jobs:
+                    self.__handle_error(job, error)
+                continue
+
+            published = []
+            for job, result in zip(jobs, results):
+                if isinstance(result, SocialPublishError):
+                    self.__handle_error(job, result)
+                else:
+                    self.queue.complete(job, result)
+                    published.append((job, result))
+            self.__log_shares(published)
+
+    def __handle_error(self, job: ShareJob, error: SocialPublishError):
+        if error.retry_after:
+            # cota excedida: o job não tem culpa, volta quando a cota liberar
+            self.queue.retry(job, time.time() + error.retry_after, str(error), count_attempt=False)
+            return
+        if error.permanent or job.attempts + 1 >= self.__max_attempts:
+            self.queue.fail(job, str(error))
+            return
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** job.attempts)
+        # variação aleatória para os jobs do mesmo lote não voltarem juntos
+        delay *= random.uniform(1.0, 1.5)
+        self.queue.retry(job, time.time() + delay, str(error))
+
+    def __log_shares(self, published: list[tuple[ShareJob, str]]):
+        # roda no worker depois de complete(): um erro aqui é reportado e não
+        # derruba a thread (a publicação já foi confirmada)
+        entries = []
+        for job, external_id in published:
+            try:
+                post = self.__context.post_repo.get_post(job.post_id)
+            except CMSException as e:
+                self.__report_unlogged(job, str(e))
+                continue
+            entries.append(
+                (
+                    job,
+                    PostAnalyticsEntry(
+                        user=post.poster,
+                        site=post.site,
+                        post=post,
+                        action=PostAction.SHARE,
+                        metadata={
+                            "platform": job.platform.name.lower(),
+                            "language": job.language,
+                            "external_id": external_id,
+                        },
+                    ),
+                )
+            )
+        if not entries:
+            return
+
+        analytics = self.__context.analytics_repo
+        try:
+            analytics.log_many([entry for _, entry in entries])
+            return
+        except Exception:
+            pass
+        # o lote falhou: tenta cada entrada, para saber quais ficaram de fora
+        for job, entry in entries:
+            try:
+                analytics.log(entry)
+            except Exception as e:
+                self.__report_unlogged(job, repr(e))
+
+    def __report_unlogged(self, job: ShareJob, error: str):
+        with self.__unlogged_lock:
+            self.unlogged.append((job, error))
@@ -0,0 +1,269 @@
+"""
+exportação de um Site como HTML estático.
+
+gera a página inicial com o SiteTemplate do site e uma página por post e idioma.
+a exportação é incremental: um manifesto guarda o carimbo de cada post (versão,
+número de comentários e updated_at) e o hash de cada página escrita, então só os
+posts que mudaram são renderizados de novo, sem ler o conteúdo dos outros.
+a escrita das páginas roda num pool de processos; posts muito grandes são
+escritos em streaming no próprio processo, bloco a bloco.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from cms.context import AppContext
+from cms.exceptions import OperationFailedError
+from cms.models import RENDER_CACHE_MAX_BLOCKS, Post, Site
+from cms.services.post_renderer import CommentSource, iter_post_document, iter_post_html
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+# abaixo disso não compensa subir um pool de processos
+_MIN_JOBS_FOR_POOL = 64
+
+# (idioma, título, corpo em HTML)
+type PageSource = tuple[str, str, str]
+
+
+@dataclass
+class PostExportJob:
+    """dados já extraídos de um post, sem referências ao grafo de objetos."""
+
+    post_dir: str
+    site_name: str
+    poster: str
+    created_at: str
+    pages: list[PageSource]
+    comments: list[CommentSource]
+    previous_hashes: dict[str, str]
+
+
+@dataclass
+class ExportResult:
+    written_pages: int = 0
+    rendered_posts: int = 0
+    skipped_posts: int = 0
+    removed_posts: int = 0
+
+
+def _write_if_changed(
+    path: Path, chunks: Iterable[str], previous_hash: str | None
+) -> tuple[str, bool]:
+    """grava o documento em streaming, calculando o hash enquanto escreve."""
+    digest = hashlib.sha256()
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            digest.update(data)
+            f.write(data)
+
+    hexdigest = digest.hexdigest()
+    if hexdigest == previous_hash and path.exists():
+        tmp_path.unlink()
+        return hexdigest, False
+
+    os.replace(tmp_path, path)
+    return hexdigest, True
+
+
+def _write_post_pages(
+    post_dir: Path,
+    languages: list[str],
+    page_for: Callable[[str], Iterable[str]],
+    previous_hashes: dict[str, str],
+) -> tuple[dict[str, str], int]:
+    post_dir.mkdir(parents=True, exist_ok=True)
+
+    hashes: dict[str, str] = {}
+    written = 0
+    for i, lang in enumerate(languages):
+        hashes[lang], changed = _write_if_changed(
+            post_dir / f"{lang}.html", page_for(lang), previous_hashes.get(lang)
+        )
+        written += changed
+
+        # o idioma padrão também é servido como index.html do post
+        if i == 0:
+            hashes["index"], changed = _write_if_changed(
+                post_dir / "index.html", page_for(lang), previous_hashes.get("index")
+            )
+            written += changed
+
+    return hashes, written
+
+
+def _export_post(job: PostExportJob) -> tuple[dict[str, str], int]:
+    """roda no processo de trabalho: renderiza, compara hash e grava as páginas."""
+    pages = {lang: (title, body_html) for lang, title, body_html in job.pages}
+
+    def page_for(lang: str) -> Iterable[str]:
+        title, body_html = pages[lang]
+        return iter_post_document(
+            lang=lang,
+            title=title,
+            site_name=job.site_name,
+            poster=job.poster,
+            created_at=job.created_at,
+            body_chunks=(body_html,),
+            comments=job.comments,
+            other_languages=[code for code in pages if code != lang],
+        )
+
+    return _write_post_pages(Path(job.post_dir), list(pages), page_for, job.previous_hashes)
+
+
+class StaticSiteExporter:
+    """
+    exporta um site para `output_dir/<domínio>`. o que decide se um post é
+    renderizado de novo é o carimbo guardado no manifesto, então uma instância
+    nova por exportação não perde nada.
+    """
+
+    def __init__(self, context: AppContext, output_dir: Path, workers: int | None = None):
+        self.__context = context
+        self.__output_dir = Path(output_dir)
+        self.__workers = workers
+
+    def export(self, site: Site) -> ExportResult:
+        site_dir = self.__output_dir / site.get_domain()
+        site_dir.mkdir(parents=True, exist_ok=True)
+        manifest = self.__load_manifest(site_dir)
+        previous_posts: dict[str, dict] = manifest["posts"]
+
+        result = ExportResult()
+        jobs: list[tuple[str, str, PostExportJob]] = []
+        current_posts: dict[str, dict] = {}
+
+        for post in self.__context.post_repo.get_site_posts(site):
+            key = str(post.id)
+            fingerprint = self.__fingerprint(post)
+            previous = previous_posts.get(key)
+            if previous and previous["fingerprint"] == fingerprint:
+                current_posts[key] = previous
+                result.skipped_posts += 1
+                continue
+
+            if self.__is_large(post):
+                # posts enormes não vão para o pool: são escritos em streaming aqui
+                hashes, written = self.__export_large_post(post, site_dir, previous)
+                current_posts[key] = {"fingerprint": fingerprint, "pages": hashes}
+                result.written_pages += written
+                result.rendered_posts += 1
+                continue
+
+            job = self.__build_job(site, post, site_dir, previous)
+            jobs.append((key, fingerprint, job))
+
+        for (key, fingerprint, _), (hashes, written) in zip(
+            jobs, self.__run_jobs([job for _, _, job in jobs])
+        ):
+            current_posts[key] = {"fingerprint": fingerprint, "pages": hashes}
+            result.written_pages += written
+        result.rendered_posts += len(jobs)
+
+        # posts que saíram do site (ou deixaram de estar visíveis)
+        for key in previous_posts.keys() - current_posts.keys():
+            shutil.rmtree(site_dir / "posts" / key, ignore_errors=True)
+            result.removed_posts += 1
+
+        index = self.__context.template_cache.render_html(site)
+        manifest["index"], changed = _write_if_changed(
+            site_dir / "index.html", (index,), manifest.get("index")
+        )
+        result.written_pages += changed
+
+        manifest["posts"] = current_posts
+        self.__save_manifest(site_dir, manifest)
+        return result
+
+    def __fingerprint(self, post: Post) -> str:
+        # Post.version e updated_at mudam a cada conteúdo novo e a cada touch (ex: uma
+        # mídia usada foi renomeada); updated_at também distingue processos diferentes,
+        # em que as versões recomeçam do zero
+        comments = self.__context.comment_repo.get_post_comments(post)
+        return f"{post.version}:{len(comments)}:{post.updated_at.isoformat()}"
+
+    @staticmethod
+    def __is_large(post: Post) -> bool:
+        return any(
+            len(post.get_content_by_language(language).body) > RENDER_CACHE_MAX_BLOCKS
+            for language in post.get_languages()
+        )
+
+    def __export_large_post(
+        self, post: Post, site_dir: Path, previous: dict | None
+    ) -> tuple[dict[str, str], int]:
+        languages = {language.code: language for language in post.get_languages()}
+        comments = self.__context.comment_repo.get_post_comments(post)
+
+        return _write_post_pages(
+            site_dir / "posts" / str(post.id),
+            list(languages),
+            lambda lang: iter_post_html(post, languages[lang], comments),
+            previous["pages"] if previous else {},
+        )
+
+    def __build_job(
+        self, site: Site, post: Post, site_dir: Path, previous: dict | None
+    ) -> PostExportJob:
+        pages: list[PageSource] = []
+        for language in post.get_languages():
+            content = post.get_content_by_language(language)
+            pages.append((language.code, content.title, content.render_body_html()))
+
+        comments = [
+            (comment.commenter.username, comment.body, str(comment.created_at))
+            for comment in self.__context.comment_repo.get_post_comments(post)
+        ]
+
+        return PostExportJob(
+            post_dir=str(site_dir / "posts" / str(post.id)),
+            site_name=site.name,
+            poster=post.poster.username,
+            created_at=str(post.created_at),
+            pages=pages,
+            comments=comments,
+            previous_hashes=previous["pages"] if previous else {},
+        )
+
+    def __run_jobs(self, jobs: list[PostExportJob]) -> list[tuple[dict[str, str], int]]:
+        if len(jobs) < _MIN_JOBS_FOR_POOL or self.__workers == 1:
+            return [_export_post(job) for job in jobs]
+
+        with ProcessPoolExecutor(
+            max_workers=self.__workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            chunksize = max(1, len(jobs) // ((self.__workers or os.cpu_count() or 1) * 4))
+            return list(pool.map(_export_post, jobs, chunksize=chunksize))
+
+    @staticmethod
+    def __load_manifest(site_dir: Path) -> dict:
+        path = site_dir / MANIFEST_NAME
+        if not path.exists():
+            return {"version": MANIFEST_VERSION, "index": None, "posts": {}}
+
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise OperationFailedError(f"Manifesto de exportação inválido: {e}")
+
+        if manifest.get("version") != MANIFEST_VERSION:
+            # formato antigo: faz um build completo
+            return {"version": MANIFEST_VERSION, "index": None, "posts": {}}
+        return manifest
+
+    @staticmethod
+    def __save_manifest(site_dir: Path, manifest: dict):
+        tmp_path = site_dir / (MANIFEST_NAME + ".tmp")
+        tmp_path.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp_path, site_dir / MANIFEST_NAME)
@@ -0,0 +1,225 @@
+"""
+contabilidade de armazenamento por site: bytes e número de mídias.
+
+os contadores são atualizados pelos eventos do MediaRepository (MEDIA_ADDED,
+MEDIAS_ADDED e MEDIA_REMOVED) com o MediaFile.size gravado na importação,
+então consultar o uso ou checar a cota é O(1), sem stat nos arquivos. cada
+site paga pelo tamanho lógico das suas mídias, mesmo quando o blob é
+compartilhado no armazenamento.
+
+importações concorrentes usam reserve: a checagem e a reserva do espaço são
+um passo só, e o espaço reservado conta na cota até a mídia entrar no
+repositório.
+
+a reconciliação confere os contadores com o disco: faz stat de todas as
+mídias num pool de threads e aponta arquivos ausentes e tamanhos divergentes.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from cms.events import Observer
+from cms.exceptions import QuotaExceededError
+from cms.models import MediaFile, Site
+
+
+def _env_limit(name: str) -> int | None:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+# cota padrão dos sites; sem a variável, não há limite
+DEFAULT_MAX_BYTES = _env_limit("CMS_SITE_QUOTA_BYTES")
+DEFAULT_MAX_FILES = _env_limit("CMS_SITE_QUOTA_FILES")
+# stat é uma chamada de sistema que solta o GIL; threads escondem a latência do disco
+RECONCILE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+@dataclass
+class StorageUsage:
+    bytes: int = 0
+    count: int = 0
+
+
+@dataclass(frozen=True)
+class StorageQuota:
+    # None é sem limite
+    max_bytes: int | None = DEFAULT_MAX_BYTES
+    max_files: int | None = DEFAULT_MAX_FILES
+
+
+@dataclass
+class SiteReconciliation:
+    site: Site
+    counted: StorageUsage
+    on_disk: StorageUsage
+    # mídias cujo arquivo não existe mais
+    missing: list[MediaFile] = field(default_factory=list)
+    # mídias cujo arquivo tem tamanho diferente do registrado
+    resized: list[MediaFile] = field(default_factory=list)
+
+    @property
+    def consistent(self) -> bool:
+        return self.counted == self.on_disk and not self.missing and not self.resized
+
+
+class StorageReservation:
+    """espaço reservado para uma importação em andamento; solto ao sair do with."""
+
+    def __init__(self, release: Callable[[], None]):
+        self.__release = release
+
+    def release(self):
+        if self.__release:
+            self.__release()
+            self.__release = None
+
+    def __enter__(self) -> "StorageReservation":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class StorageAccounting(Observer):
+    def __init__(self, default_quota: StorageQuota | None = None):
+        self.default_quota = default_quota or StorageQuota()
+        self.__usage: dict[int, StorageUsage] = {}
+        # espaço de importações em andamento, que ainda não viraram MEDIA_ADDED
+        self.__reserved: dict[int, StorageUsage] = {}
+        self.__sites: dict[int, Site] = {}
+        self.__quotas: dict[int, StorageQuota] = {}
+        self.__lock = threading.Lock()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        if event_type == "MEDIA_REMOVED":
+            medias, sign = [kwargs["media"]], -1
+        elif event_type == "MEDIAS_ADDED":
+            medias, sign = kwargs["medias"], 1
+        else:
+            medias, sign = [kwargs["media"]], 1
+        with self.__lock:
+            for media in medias:
+                self.__sites[media.site.id] = media.site
+                usage = self.__usage.setdefault(media.site.id, StorageUsage())
+                usage.bytes += sign * (media.size or 0)
+                usage.count += sign
+
+    def usage(self, site: Site) -> StorageUsage:
+        with self.__lock:
+            usage = self.__usage.get(site.id)
+            return StorageUsage(usage.bytes, usage.count) if usage else StorageUsage()
+
+    def quota(self, site: Site) -> StorageQuota:
+        return self.__quotas.get(site.id, self.default_quota)
+
+    def set_quota(self, site: Site, quota: StorageQuota | None):
+        """define a cota do site; None volta para a cota padrão."""
+        with self.__lock:
+            if quota is None:
+                self.__quotas.pop(site.id, None)
+            else:
+                self.__quotas[site.id] = quota
+
+    def check(self, site: Site, size: int, count: int = 1):
+        """
+        confere se o site comporta mais `count` mídias somando `size` bytes.
+
+        raises:
+            QuotaExceededError: Se a importação passaria da cota do site
+        """
+        with self.__lock:
+            self.__ensure_room(site, size, count)
+
+    def reserve(self, site: Site, size: int, count: int = 1) -> StorageReservation:
+        """
+        confere a cota e reserva o espaço no mesmo passo. a reserva deve ser
+        solta (with ou release) depois que a mídia entra no repositório ou
+        quando a importação desiste.
+
+        raises:
+            QuotaExceededError: Se a importação passaria da cota do site
+        """
+        with self.__lock:
+            self.__ensure_room(site, size, count)
+            reserved = self.__reserved.setdefault(site.id, StorageUsage())
+            reserved.bytes += size
+            reserved.count += count
+
+        def release():
+            with self.__lock:
+                reserved = self.__reserved[site.id]
+                reserved.bytes -= size
+                reserved.count -= count
+                if not reserved.count and not reserved.bytes:
+                    del self.__reserved[site.id]
+
+        return StorageReservation(release)
+
+    def __ensure_room(self, site: Site, size: int, count: int):
+        quota = self.__quotas.get(site.id, self.default_quota)
+        usage = self.__usage.get(site.id, StorageUsage())
+        reserved = self.__reserved.get(site.id, StorageUsage())
+        used_bytes = usage.bytes + reserved.bytes
+        used_count = usage.count + reserved.count
+        if quota.max_bytes is not None and used_bytes + size > quota.max_bytes:
+            raise QuotaExceededError(
+                f"O site '{site.name}' usa {used_bytes:,} de {quota.max_bytes:,} bytes; "
+                f"não há espaço para mais {size:,} bytes."
+            )
+        if quota.max_files is not None and used_count + count > quota.max_files:
+            raise QuotaExceededError(
+                f"O site '{site.name}' tem {used_count} de {quota.max_files} mídias permitidas; "
+                f"não há espaço para mais {count}."
+            )
+
+    def reconcile(
+        self, medias: Iterable[MediaFile], workers: int | None = None, fix: bool = False
+    ) -> list[SiteReconciliation]:
+        """
+        confere os contadores com o tamanho dos arquivos em disco, site a site.
+        com fix=True, os contadores e os MediaFile.size passam a refletir o disco.
+        as importações devem estar paradas, senão a comparação pega contadores
+        no meio de uma atualização.
+        """
+        medias = list(medias)
+        with ThreadPoolExecutor(workers or RECONCILE_WORKERS) as pool:
+            sizes = list(pool.map(_disk_size, medias, chunksize=256))
+
+        results: dict[int, SiteReconciliation] = {}
+        with self.__lock:
+            for media in medias:
+                self.__sites[media.site.id] = media.site
+            for site_id, site in self.__sites.items():
+                usage = self.__usage.get(site_id, StorageUsage())
+                results[site_id] = SiteReconciliation(
+                    site, StorageUsage(usage.bytes, usage.count), StorageUsage()
+                )
+
+            for media, size in zip(medias, sizes):
+                result = results[media.site.id]
+                result.on_disk.count += 1
+                if size is None:
+                    result.missing.append(media)
+                    continue
+                result.on_disk.bytes += size
+                if media.size != size:
+                    result.resized.append(media)
+                    if fix:
+                        media.size = size
+
+            if fix:
+                for site_id, result in results.items():
+                    self.__usage[site_id] = StorageUsage(
+                        result.on_disk.bytes, result.on_disk.count
+                    )
+        return sorted(results.values(), key=lambda result: result.site.id)
+
+
+def _disk_size(media: MediaFile) -> int | None:
+    try:
+        return os.stat(media.path).st_size
+    except OSError:
+        return None
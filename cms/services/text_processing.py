@@ -0,0 +1,64 @@
+"""
+normalização e tokenização de texto para os índices de busca.
+
+o texto é dobrado para minúsculas e sem acentos ("Ação" -> "acao"), e quebrado
+em palavras. ideogramas (chinês, japonês) não têm espaços entre palavras, então
+cada caractere vira um token.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Iterator
+
+from cms.models import Content, TextBlock
+
+# sequência de letras/dígitos, ou um único ideograma/kana
+_CJK = r"\u3040-\u30ff\u3400-\u9fff"
+_TOKEN_RE = re.compile(rf"[{_CJK}]|[^\W{_CJK}]+")
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+
+
+@lru_cache(maxsize=65536)
+def fold(word: str) -> str:
+    """minúsculas e sem acentos; palavras se repetem muito, por isso o cache."""
+    decomposed = unicodedata.normalize("NFKD", word.lower())
+    return _COMBINING_RE.sub("", decomposed)
+
+
+def fold_text(text: str) -> str:
+    """
+    como fold, para textos inteiros (títulos, nomes de arquivo): sem cache, já
+    que quase não se repetem, e com os espaços normalizados.
+    """
+    decomposed = unicodedata.normalize("NFKD", " ".join(text.lower().split()))
+    return _COMBINING_RE.sub("", decomposed)
+
+
+# palavras muito frequentes que não ajudam a ranquear e só pesam no índice
+STOPWORDS = frozenset(
+    fold(word)
+    for word in (
+        # pt
+        "a o as os e de do da dos das em no na nos nas um uma uns umas por para com "
+        "sem que se ao aos à às é ou mas como mais seu sua seus suas "
+        # en
+        "the an and or of to in on at for with by from is are was be it this that as "
+        # es
+        "el la los las y del en un una por con para es"
+    ).split()
+)
+
+
+def tokenize(text: str, keep_stopwords: bool = False) -> list[str]:
+    tokens = [fold(word) for word in _TOKEN_RE.findall(text)]
+    if keep_stopwords:
+        return tokens
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+def iter_content_text(content: Content) -> Iterator[str]:
+    """o texto indexável de um Content: o título e os blocos de texto."""
+    yield content.title
+    for block in content.body:
+        if isinstance(block, TextBlock):
+            yield block.text
@@ -0,0 +1,350 @@
+"""
+memória de tradução e tradução de posts em lote.
+
+cada segmento (título, texto de um TextBlock, alt de uma mídia ou carrossel)
+é guardado na memória pela chave (hash do texto, idioma de origem, idioma de
+destino). textos repetidos entre posts, como parágrafos padrão e alts, são
+traduzidos uma vez só.
+
+o BatchTranslator junta os segmentos de um lote de posts, tira os que a
+memória já tem e os repetidos, e manda o resto para o motor de tradução em
+pedaços, num pool de threads (motores costumam ser serviços remotos, que
+passam o tempo esperando). as traduções voltam para a memória e os conteúdos
+novos entram no PostRepository de uma vez, com um único POSTS_CONTENT_ADDED.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import partial
+from itertools import batched
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from cms.exceptions import CMSException, LanguageError, ValidationError
+from cms.models import CaroulselBlock, Content, Language, LanguageCode, MediaBlock, Post, TextBlock
+
+DEFAULT_BATCH_SIZE = 500
+# segmentos por chamada ao motor
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_WORKERS = min(16, (os.cpu_count() or 1) * 4)
+SEGMENT_HASH_SIZE = 16
+
+# palavras (com acentos) e o que fica entre elas, para a tradução palavra a palavra
+_WORD_RE = re.compile(r"(\w+)")
+
+# (hash do texto, origem, destino)
+type SegmentKey = tuple[bytes, LanguageCode, LanguageCode]
+# (posts processados, total)
+type ProgressCallback = Callable[[int, int], None]
+
+
+def segment_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=SEGMENT_HASH_SIZE).digest()
+
+
+class TranslationEngine(ABC):
+    @abstractmethod
+    def translate(self, texts: list[str], source: Language, target: Language) -> list[str]:
+        """
+        traduz os segmentos e devolve as traduções na mesma ordem.
+        é chamado de várias threads ao mesmo tempo.
+
+        raises:
+            LanguageError: Se o motor não traduz entre os dois idiomas
+        """
+        pass
+
+
+class DictionaryTranslationEngine(TranslationEngine):
+    """
+    motor local, sem rede: procura o segmento inteiro no glossário e, se não
+    achar, troca palavra por palavra (as desconhecidas ficam como estão).
+    """
+
+    def __init__(self, glossary: dict[tuple[LanguageCode, LanguageCode], dict[str, str]]):
+        self.__glossary = {
+            pair: {text.lower().strip(): translation for text, translation in entries.items()}
+            for pair, entries in glossary.items()
+        }
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "DictionaryTranslationEngine":
+        """
+        lê um glossário JSON no formato {"pt-br>en-us": {"bom dia": "good morning"}}.
+
+        raises:
+            ValidationError: Se o arquivo não é um glossário válido
+        """
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except OSError as e:
+            raise ValidationError(f"Não foi possível ler o glossário '{path}': {e.strerror}.")
+        except ValueError as e:
+            raise ValidationError(f"Glossário '{path}' não é um JSON válido: {e}.")
+
+        if not isinstance(data, dict):
+            raise ValidationError(f"Glossário '{path}' deve ser um objeto JSON.")
+        glossary = {}
+        for pair, entries in data.items():
+            source, sep, target = pair.partition(">")
+            if not sep or not isinstance(entries, dict):
+                raise ValidationError(f"Par de idiomas inválido no glossário: '{pair}'.")
+            glossary[(source.strip().lower(), target.strip().lower())] = entries
+        return cls(glossary)
+
+    def translate(self, texts: list[str], source: Language, target: Language) -> list[str]:
+        entries = self.__glossary.get((source.code, target.code))
+        if entries is None:
+            raise LanguageError(f"Sem glossário de {source.name} para {target.name}.")
+        return [self.__translate(text, entries) for text in texts]
+
+    @staticmethod
+    def __translate(text: str, entries: dict[str, str]) -> str:
+        whole = entries.get(text.lower().strip())
+        if whole is not None:
+            return whole
+
+        def word(match: re.Match) -> str:
+            original = match.group(1)
+            translated = entries.get(original.lower())
+            if translated is None:
+                return original
+            return translated.capitalize() if original[0].isupper() else translated
+
+        return _WORD_RE.sub(word, text)
+
+
+class TranslationMemory:
+    """
+    traduções por (hash do texto, origem, destino). com um arquivo, as
+    entradas são lidas na criação e as novas são acrescentadas a ele (NDJSON).
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.__entries: dict[SegmentKey, str] = {}
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            self.__load(path)
+            self.__file = open(path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def lookup(self, text: str, source: LanguageCode, target: LanguageCode) -> str | None:
+        with self.__lock:
+            translation = self.__entries.get((segment_hash(text), source, target))
+            if translation is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return translation
+
+    def store(self, text: str, source: LanguageCode, target: LanguageCode, translation: str):
+        self.store_many([(text, translation)], source, target)
+
+    def store_many(
+        self, pairs: Iterable[tuple[str, str]], source: LanguageCode, target: LanguageCode
+    ):
+        """guarda vários (texto, tradução) de uma vez, com uma única escrita no arquivo."""
+        lines = []
+        with self.__lock:
+            for text, translation in pairs:
+                key = segment_hash(text)
+                self.__entries[(key, source, target)] = translation
+                if self.__file:
+                    record = {"hash": key.hex(), "source": source, "target": target,
+                              "text": translation}
+                    lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if lines:
+                self.__file.writelines(lines)
+                self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            if self.__file:
+                self.__file.close()
+                self.__file = None
+
+    def __load(self, path: str | Path):
+        try:
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                        key = bytes.fromhex(record["hash"])
+                        self.__entries[(key, record["source"], record["target"])] = record["text"]
+                    except (ValueError, KeyError, TypeError):
+                        # linha cortada no fim (queda durante a escrita)
+                        continue
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class TranslationSummary:
+    # posts que ganharam o idioma
+    translated: int = 0
+    # posts que já tinham o idioma
+    skipped: int = 0
+    segments: int = 0
+    # segmentos enviados ao motor; o resto veio da memória ou repetia outro
+    engine_segments: int = 0
+    failed: list[tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def reused(self) -> int:
+        return self.segments - self.engine_segments
+
+
+def content_segments(content: Content) -> list[str]:
+    """os textos traduzíveis do conteúdo: título, textos e alts, em ordem."""
+    segments = [content.title]
+    for block in content.body:
+        if isinstance(block, TextBlock):
+            segments.append(block.text)
+        elif isinstance(block, (MediaBlock, CaroulselBlock)):
+            segments.append(block.alt)
+    return segments
+
+
+def translated_content(content: Content, language: Language, translations: Iterator[str]) -> Content:
+    """o conteúdo no novo idioma, com os segmentos na ordem de content_segments."""
+    title = next(translations)
+    body = []
+    for block in content.body:
+        if isinstance(block, TextBlock):
+            block = TextBlock(order=block.order, text=next(translations))
+        elif isinstance(block, MediaBlock):
+            block = MediaBlock(order=block.order, media=block.media, alt=next(translations))
+        elif isinstance(block, CaroulselBlock):
+            block = CaroulselBlock(
+                order=block.order, medias=list(block.medias), alt=next(translations)
+            )
+        else:
+            block = replace(block)
+        body.append(block)
+    return Content(title=title, body=body, language=language)
+
+
+class BatchTranslator:
+    def __init__(
+        self,
+        context,
+        engine: TranslationEngine,
+        memory: TranslationMemory | None = None,
+        workers: int | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        if batch_size < 1 or chunk_size < 1:
+            raise ValueError("batch_size e chunk_size devem ser positivos.")
+        self.__context = context
+        self.__engine = engine
+        self.__memory = memory if memory is not None else context.translation_memory
+        self.__workers = workers or DEFAULT_WORKERS
+        self.__batch_size = batch_size
+        self.__chunk_size = chunk_size
+
+    def translate_posts(
+        self,
+        posts: Iterable[Post],
+        target: Language,
+        source: Language | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> TranslationSummary:
+        """
+        traduz os posts para `target`, a partir de `source` quando o post tem
+        esse idioma ou do idioma padrão do post.
+        """
+        posts = list(posts)
+        summary = TranslationSummary()
+        with ThreadPoolExecutor(self.__workers, thread_name_prefix="cms-translate") as pool:
+            done = 0
+            for batch in batched(posts, self.__batch_size):
+                self.__translate_batch(pool, batch, target, source, summary)
+                done += len(batch)
+                if progress:
+                    progress(done, len(posts))
+        return summary
+
+    def __translate_batch(
+        self,
+        pool: ThreadPoolExecutor,
+        posts: tuple[Post, ...],
+        target: Language,
+        source: Language | None,
+        summary: TranslationSummary,
+    ):
+        jobs: list[tuple[Post, Content, list[str]]] = []
+        # origem -> textos que a memória não tem, sem repetição (o dict mantém a ordem)
+        missing: dict[LanguageCode, dict[str, None]] = {}
+        languages: dict[LanguageCode, Language] = {}
+        known: dict[tuple[LanguageCode, str], str] = {}
+
+        for post in posts:
+            if post.has_language(target):
+                summary.skipped += 1
+                continue
+            content = post.get_content_by_language(
+                source if source and post.has_language(source) else None
+            )
+            code = content.language.code
+            languages[code] = content.language
+            segments = content_segments(content)
+            for text in segments:
+                if not text.strip() or (code, text) in known or text in missing.get(code, ()):
+                    continue
+                translation = self.__memory.lookup(text, code, target.code)
+                if translation is None:
+                    missing.setdefault(code, {})[text] = None
+                else:
+                    known[(code, text)] = translation
+            jobs.append((post, content, segments))
+
+        errors: dict[LanguageCode, str] = {}
+        for code, texts in missing.items():
+            chunks = list(batched(texts, self.__chunk_size))
+            translate = partial(_translate_chunk, self.__engine, languages[code], target)
+            for chunk, result in zip(chunks, pool.map(translate, chunks)):
+                if isinstance(result, CMSException):
+                    errors[code] = str(result)
+                    continue
+                summary.engine_segments += len(chunk)
+                self.__memory.store_many(zip(chunk, result), code, target.code)
+                known.update(((code, text), translation) for text, translation in zip(chunk, result))
+
+        contents: list[tuple[Post, Content]] = []
+        for post, content, segments in jobs:
+            code = content.language.code
+            try:
+                translations = [text if not text.strip() else known[(code, text)] for text in segments]
+            except KeyError:
+                summary.failed.append((post.id, errors.get(code, "Segmento sem tradução.")))
+                continue
+            summary.segments += len(segments)
+            contents.append((post, translated_content(content, target, iter(translations))))
+
+        self.__context.post_repo.add_contents(contents)
+        summary.translated += len(contents)
+
+
+def _translate_chunk(
+    engine: TranslationEngine, source: Language, target: Language, texts: tuple[str, ...]
+) -> list[str] | CMSException:
+    # roda nas threads do pool: o erro volta como valor para não parar o lote
+    try:
+        translations = engine.translate(list(texts), source, target)
+    except CMSException as e:
+        return e
+    if len(translations) != len(texts):
+        return LanguageError("O motor de tradução devolveu um número errado de segmentos.")
+    return translations
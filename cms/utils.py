@@ -164,6 +164,11 @@ def read_datetime_from_cli() -> datetime:
             print(f"{e}\n")
 
 
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp"})
+VIDEO_EXTENSIONS = frozenset({".mp4", ".mov", ".avi"})
+MEDIA_EXTENSIONS = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+
+
 def infer_media_type(extension: str) -> MediaType:
     """
     Infere o tipo de mídia a partir da extensão do arquivo.
@@ -177,9 +182,9 @@ def infer_media_type(extension: str) -> MediaType:
             raise ValidationError("Extensão de arquivo não pode estar vazia.")
         
         ext = extension.lower()
-        if ext in [".jpg", ".jpeg", ".png", ".gif", ".webp"]:
+        if ext in IMAGE_EXTENSIONS:
             return MediaType.IMAGE
-        elif ext in [".mp4", ".mov", ".avi"]:
+        elif ext in VIDEO_EXTENSIONS:
             return MediaType.VIDEO
         else:
             raise MediaError(f"Tipo de arquivo '{ext}' não é suportado.")
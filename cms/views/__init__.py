@@ -3,6 +3,8 @@ from cms.views.logged_menu import LoggedMenu
 from cms.views.menu import AbstractMenu, MenuOptions, clear_screen
 from cms.context import AppContext
 from cms.populate import populate
+from cms.services.notification_adapter import ConsoleNotificationAdapter
+from cms.services.scheduler import PublishNotifier
 from cms.exceptions import ValidationError, AuthenticationError, RepositoryError, InvalidNameError, CMSException
 from cms.utils import validate_name, validate_email, validate_username, validate_password
 
@@ -16,6 +18,13 @@ class Menu(AbstractMenu):
             print(f"Erro ao popula dados: {str(e)}")
             raise
 
+        # avisa os autores quando os posts agendados forem publicados
+        context = AppContext()
+        context.event_manager.subscribe(
+            "POST_PUBLISHED", PublishNotifier(ConsoleNotificationAdapter())
+        )
+        context.scheduler.start()
+
     def show(self):
         try:
             self._main_menu()
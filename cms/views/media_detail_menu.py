@@ -1,5 +1,6 @@
 # cms/views/media_detail_menu.py
 
+from cms.exceptions import CMSException
 from cms.models import MediaFile
 from cms.views.menu import AbstractMenu, MenuOptions
 from cms.context import AppContext
@@ -17,6 +18,8 @@ class MediaMenu(AbstractMenu):
             return
 
         options: list[MenuOptions] = [
+            {"message": "Ver onde a mídia é usada", "function": self._show_usages},
+            {"message": "Renomear mídia", "function": self._rename_selected_media},
             {"message": "Deletar mídia", "function": self._delete_selected_media},
         ]
 
@@ -26,11 +29,46 @@ class MediaMenu(AbstractMenu):
             print(f"ID: {media.id}")
             print(f"Tipo: {media.media_type.name}")
             print(f"Caminho: {media.path}")
+            print(f"Dimensões: {media.dimension}")
+            if media.content_hash:
+                shared = AppContext().media_store.references(media.content_hash) - 1
+                if shared > 0:
+                    print(f"Arquivo compartilhado com outras {shared} mídias.")
+            used_in = len(AppContext().media_usage.posts_using(media))
+            print(f"Usada em {used_in} posts." if used_in else "Não é usada por nenhum post.")
             print(" ")
 
         MediaMenu.prompt_menu_option(options, display_title)
 
+    def _show_usages(self):
+        usages = AppContext().media_usage.usages(self.selected_media)
+        if not usages:
+            print("A mídia não é usada por nenhum post.")
+        for usage in usages:
+            print(
+                f"Post {usage.post.id} '{usage.post.get_default_title()}'"
+                f" ({usage.language.name}), bloco {usage.block.order}"
+            )
+        input("Clique Enter para voltar ao menu.")
+
+    def _rename_selected_media(self):
+        filename = input("Novo nome da mídia: ")
+        try:
+            media = AppContext().media_repo.rename_media(self.selected_media.id, filename)
+            print(f"Mídia renomeada para '{media.filename}'.")
+        except CMSException as e:
+            print(f"Erro: {e}")
+        input("Clique Enter para voltar ao menu.")
+
     def _delete_selected_media(self):
+        # uma mídia ainda usada deixaria blocos apontando para uma mídia que não existe mais
+        try:
+            AppContext().media_usage.ensure_unused(self.selected_media)
+        except CMSException as e:
+            print(f"{e} Remova-a desses posts antes de deletar.")
+            input("Clique Enter para voltar ao menu.")
+            return
+
         confirm = (
             input(
                 f"Tem certeza que deseja deletar a mídia '{self.selected_media.filename}'? (y/n): "
@@ -2,6 +2,8 @@
 
 from pathlib import Path
 from cms.models import MediaFile, Site, SiteAction, SiteAnalyticsEntry, User
+from cms.services.media_import import BulkMediaImporter
+from cms.services.media_probe import probe_media
 from cms.utils import infer_media_type
 from cms.views.media_detail_menu import MediaMenu
 from cms.views.menu import AbstractMenu, MenuOptions
@@ -28,15 +30,24 @@ class MediaLibraryMenu(AbstractMenu):
 
         options: list[MenuOptions] = [
             {"message": "Importar nova mídia", "function": self._import_media},
+            {"message": "Importar diretório de mídias", "function": self._import_media_directory},
             {"message": "Listar mídias", "function": self._select_media},
         ]
 
         MediaLibraryMenu.prompt_menu_option(
             options,
-            lambda: print(
-                f"Biblioteca de mídias do site {self.selected_site.name}\n"),
+            self._display_title,
         )
 
+    def _display_title(self):
+        accounting = self.context.storage_accounting
+        usage = accounting.usage(self.selected_site)
+        quota = accounting.quota(self.selected_site)
+        print(f"Biblioteca de mídias do site {self.selected_site.name}")
+        limit = f" de {quota.max_bytes:,}" if quota.max_bytes is not None else ""
+        files = f" de {quota.max_files}" if quota.max_files is not None else ""
+        print(f"Armazenamento: {usage.bytes:,}{limit} bytes, {usage.count}{files} mídias\n")
+
     def _import_media(self):
         try:
             filepath = input(
@@ -62,18 +73,31 @@ class MediaLibraryMenu(AbstractMenu):
                 input("Clique Enter para voltar.")
                 return
 
+            # só o cabeçalho é lido, então funciona igual para vídeos grandes
+            info = probe_media(path)
+            context = AppContext()
+            # a cota é conferida pelo stat, antes de ler ou copiar o arquivo
+            context.storage_accounting.check(self.selected_site, path.stat().st_size)
+            blob = context.media_store.put(path)
+            existing = context.media_repo.get_site_media_by_hash(self.selected_site, blob.digest)
+            if existing:
+                print(f"Esta mídia já está no site com id {existing.id} ('{existing.filename}').")
+                input("Clique Enter para voltar ao menu.")
+                return
+
             media = MediaFile(
                 uploader=self.logged_user,
                 filename=filename,
-                path=path,
+                path=blob.path,
                 media_type=media_type,
                 site=self.selected_site,
-                width="1000",
-                height="1000",
-                duration=None,
+                width=info.width,
+                height=info.height,
+                duration=info.duration,
+                size=blob.size,
+                content_hash=blob.digest,
             )
 
-            context = AppContext()
             media_id = context.media_repo.add_midia(media)
             print(f"Mídia importada com id {media_id}.")
 
@@ -94,6 +118,30 @@ class MediaLibraryMenu(AbstractMenu):
             print(f"Erro ao importar mídia: {str(e)}")
             input("Clique Enter para voltar.")
 
+    def _import_media_directory(self):
+        directory = input("Digite o caminho do diretório a ser importado:\n> ").strip()
+        if not directory:
+            print("Nenhum caminho informado.")
+            input("Clique Enter para voltar.")
+            return
+
+        def progress(done: int, total: int):
+            print(f"\r{done}/{total} arquivos lidos", end="", flush=True)
+
+        try:
+            summary = BulkMediaImporter(self.context).import_tree(
+                directory, self.selected_site, self.logged_user, progress=progress
+            )
+        except CMSException as e:
+            print(f"Erro ao importar diretório: {str(e)}")
+            input("Clique Enter para voltar.")
+            return
+
+        print(f"\n{summary.imported} mídias importadas, {summary.skipped} já estavam no site.")
+        for path, error in summary.failed:
+            print(f"[!] {path}: {error}")
+        input("Clique Enter para voltar ao menu.")
+
     def _select_media(self):
         try:
             # singleton!
@@ -1,5 +1,6 @@
 import os
 from cms.models import Comment, Post, PostAction, PostAnalyticsEntry, Site, User
+from cms.services.languages import system_accept_language
 from cms.services.post_translator import PostTranslator
 from cms.services.seo_analyzier import display_seo_report
 from cms.services.social_media import SocialMedia, get_social_media_poster
@@ -25,7 +26,13 @@ class PostMenu(AbstractMenu):
         self.selected_post = selected_post
 
     def show(self):
-        self.selected_post_language = self.selected_post.default_language
+        # começa no idioma do sistema, se o post tiver conteúdo nele
+        self.selected_post_language = (
+            AppContext().lang_service.negotiate(
+                system_accept_language(), self.selected_post.get_languages()
+            )
+            or self.selected_post.default_language
+        )
 
         options: list[MenuOptions] = [
             {"message": "Mostrar comentários do post", "function": self._show_post_comments},
@@ -163,4 +170,18 @@ class PostMenu(AbstractMenu):
         if not language:
             return
         display_seo_report(self.selected_post, language)
-        input("Clique Enter para voltar ao menu.")
\ No newline at end of file
+
+        corpus_index = AppContext().corpus_index
+        keywords = corpus_index.keywords(self.selected_post, language, limit=5)
+        if keywords:
+            print("\n- Palavras-chave distintivas no site (TF-IDF):")
+            for keyword in keywords:
+                print(f"  - {keyword.term} ({keyword.count}x, em {keyword.document_frequency} posts)")
+
+        duplicates = corpus_index.near_duplicates(self.selected_post, language)
+        if duplicates:
+            print("\n[!] Conteúdo quase duplicado em outros posts do site:")
+            for match in duplicates:
+                print(f"  - {match.other_post.get_default_title()} "
+                      f"({match.other_language.code}, {match.similarity:.0%} similar)")
+        input("\nClique Enter para voltar ao menu.")
\ No newline at end of file
@@ -1,8 +1,7 @@
+from pathlib import Path
 from cms.models import (
     Permission,
     Post,
-    PostAction,
-    PostAnalyticsEntry,
     Site,
     SiteAction,
     SiteAnalyticsEntry,
@@ -10,12 +9,13 @@ from cms.models import (
     User,
 )
 from cms.services.post_management_facade import PostManagementFacade
-from cms.services.site_template import build_site_template
+from cms.services.static_export import StaticSiteExporter
 from cms.utils import select_enum
 from cms.views.media_library_menu import MediaLibraryMenu
 from cms.views.menu import AbstractMenu, MenuOptions
 from cms.context import AppContext
 from cms.views.post_menu import PostMenu
+from cms.exceptions import CMSException, ValidationError
 
 
 class SiteMenu(AbstractMenu):
@@ -33,6 +33,7 @@ class SiteMenu(AbstractMenu):
     def show(self):
         options: list[MenuOptions] = [
             {"message": "Selecionar posts do site", "function": self._select_post},
+            {"message": "Buscar posts", "function": self._search_posts},
         ]
 
         # singleton!
@@ -49,6 +50,10 @@ class SiteMenu(AbstractMenu):
                         "function": self._show_site_analytics},
                     {"message": "Mudar template do site",
                         "function": self._configure_site_template},
+                    {"message": "Exportar site como HTML estático",
+                        "function": self._export_static_site},
+                    {"message": "Auditoria de SEO do site",
+                        "function": self._audit_site_seo},
                 ]
             )
 
@@ -57,12 +62,8 @@ class SiteMenu(AbstractMenu):
                     [{"message": "Adicionar Gerente", "function": self._add_manager}])
 
         def display_title():
-            template = build_site_template(
-                site=self.selected_site,
-                post_repo=AppContext().post_repo,  # singleton
-                analytics_repo=AppContext().analytics_repo,  # singleton
-            )
-            template.display()
+            # a página vem do cache, só é renderizada de novo quando algo muda
+            print(AppContext().template_cache.render(self.selected_site))
 
         SiteMenu.prompt_menu_option(options, display_title)
 
@@ -141,31 +142,86 @@ class SiteMenu(AbstractMenu):
             SiteTemplateType, "Escolha o layout de apresentação do site:")
         if new_template:
             self.selected_site.template = new_template
+            AppContext().event_manager.notify(
+                "SITE_TEMPLATE_CHANGED", user=self.logged_user, site=self.selected_site
+            )
             print(f"Template atualizado para: {new_template.value}.", end=" ")
         else:
             print("Opção inválida.", end=" ")
         input("Clique enter para voltar ao menu.")
 
+    def _export_static_site(self):
+        try:
+            output_dir = input(
+                "Diretório de saída (Enter para 'public'): ").strip() or "public"
+            result = StaticSiteExporter(AppContext(), Path(output_dir)).export(
+                self.selected_site)
+
+            print(f"Posts renderizados: {result.rendered_posts}")
+            print(f"Posts sem alteração: {result.skipped_posts}")
+            print(f"Páginas gravadas: {result.written_pages}")
+        except (OSError, CMSException) as e:
+            print(f"Erro ao exportar site: {e}")
+        input("\nClique Enter para voltar ao Menu.")
+
+    def _audit_site_seo(self):
+        try:
+            summary = AppContext().seo_auditor.audit_site(self.selected_site)
+        except (OSError, CMSException) as e:
+            print(f"Erro na auditoria de SEO: {e}")
+            input("\nClique Enter para voltar ao Menu.")
+            return
+
+        print(f"Auditoria de SEO: {len(summary.results)} conteúdos "
+              f"({summary.analyzed} analisados, {summary.cached} sem alteração)\n")
+        for result in summary.results:
+            report = result.report
+            problems = []
+            if report.title_too_long:
+                problems.append("título longo")
+            if report.too_few_words:
+                problems.append(f"{report.word_count} palavras")
+            if report.repeated_words:
+                problems.append("palavras repetidas")
+            if report.missing_alt_count:
+                problems.append(f"{report.missing_alt_count} mídias sem alt")
+            print(f"- {report.title} ({result.language.code}): "
+                  f"{', '.join(problems) or 'sem problemas'}")
+        input("\nClique Enter para voltar ao Menu.")
+
     def _select_post(self):
         posts: list[Post] = AppContext(
         ).post_repo.get_site_posts(self.selected_site)
 
-        def execute_for_option(selected_post: Post):
-            AppContext().analytics_repo.log(
-                PostAnalyticsEntry(
-                    user=self.logged_user,
-                    site=self.selected_site,
-                    post=selected_post,
-                    action=PostAction.VIEW,
-                )
-            )
-            # construtor simplificado
-            PostMenu(self.logged_user, self.selected_site,
-                     selected_post).show()
+        SiteMenu.prompt_generic(
+            posts, "Posts do site", self._open_post, lambda m: m.get_default_title()
+        )
+
+    def _search_posts(self):
+        query = input("Buscar (use aspas para frases exatas): ").strip()
+        if not query:
+            return
+
+        results = AppContext().search_index.search(self.selected_site, query, limit=20)
+        if not results:
+            input(f"Nenhum post encontrado para '{query}'. Clique Enter para voltar.")
+            return
 
         SiteMenu.prompt_generic(
-            posts, "Posts do site", execute_for_option, lambda m: m.get_default_title()
+            results,
+            f"Resultados para '{query}'",
+            lambda result: self._open_post(result.post),
+            lambda result: f"{result.title} ({result.language.code})",
+        )
+
+    def _open_post(self, selected_post: Post):
+        # o analytics registra a visualização e avisa o autocompletar
+        AppContext().event_manager.notify(
+            "POST_VIEWED", user=self.logged_user, site=self.selected_site, post=selected_post
         )
+        # construtor simplificado
+        PostMenu(self.logged_user, self.selected_site,
+                 selected_post).show()
 
     def _media_library_menu(self):
         # construtor simplificado
@@ -0,0 +1,218 @@
+"""
+front end HTTP somente leitura do CMS.
+
+serve a página inicial de cada site (pelo domínio de Site.get_domain) e a página
+de cada post, lendo direto dos repositórios do AppContext, e o autocompletar
+de títulos em /<domínio>/autocomplete?q=<prefixo>&k=<quantos>. as páginas levam
+ETag forte e Last-Modified, e requisições condicionais recebem 304. o idioma vem
+de ?lang= ou, sem ele, do Accept-Language. os arquivos
+das mídias saem de /<domínio>/media/<id>, com Range (ver media_streaming).
+
+execute com: python -m cms.web.frontend --port 8080 --populate
+"""
+import argparse
+import asyncio
+import hashlib
+import html
+import secrets
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http import HTTPStatus
+
+from cms.context import AppContext
+from cms.exceptions import ResourceNotFoundError
+from cms.models import Comment, Language, Post, Site
+from cms.services.autocomplete import POST_KIND
+from cms.services.post_renderer import iter_post_html
+from cms.web.http_server import BadRequestError, HttpServer, Request, Response, is_not_modified
+from cms.web.media_streaming import MediaStreamer, OpenFileCache
+
+HTML_CONTENT_TYPE = "text/html; charset=utf-8"
+MAX_AUTOCOMPLETE_K = 50
+# os ids e versões dos posts recomeçam a cada processo; o nonce impede que uma
+# ETag guardada pelo cliente antes de um reinício bata com outro conteúdo
+BOOT_ID = secrets.token_hex(4)
+
+
+def _to_utc(moment: datetime) -> datetime:
+    # as datas do CMS são locais e sem fuso; o HTTP usa GMT
+    return moment.astimezone(timezone.utc)
+
+
+class FrontendServer(HttpServer):
+    def __init__(self, context: AppContext, host: str = "127.0.0.1", port: int = 8080):
+        super().__init__(host, port)
+        self.__context = context
+        # os blobs do armazenamento são imutáveis: o descritor em cache nunca fica velho
+        self.__media_streamer = MediaStreamer(
+            OpenFileCache(immutable_root=context.media_store.root)
+        )
+
+    async def dispatch(self, request: Request) -> Response:
+        if request.method not in ("GET", "HEAD"):
+            response = Response.text(HTTPStatus.METHOD_NOT_ALLOWED, "Somente leitura.")
+            response.headers["Allow"] = "GET, HEAD"
+            return response
+
+        segments = [segment for segment in request.path.split("/") if segment]
+        if not segments:
+            return self._site_list()
+
+        site = self.__context.site_repo.get_site_by_domain(segments[0])
+        if len(segments) == 1:
+            return self._front_page(request, site)
+        if len(segments) == 2 and segments[1] == "autocomplete":
+            return self._autocomplete(request, site)
+        if len(segments) == 3 and segments[1] == "posts" and segments[2].isdigit():
+            return self._post_page(request, site, int(segments[2]))
+        if len(segments) == 3 and segments[1] == "media" and segments[2].isdigit():
+            return self._media_file(request, site, int(segments[2]))
+
+        raise ResourceNotFoundError(f"Caminho '{request.path}' não encontrado.")
+
+    def _requested_language(
+        self, request: Request, available: list[Language] | None = None
+    ) -> Language | None:
+        # ?lang= manda; sem ele, o Accept-Language é negociado com os idiomas disponíveis
+        code = request.query.get("lang")
+        if not code:
+            return self.__context.lang_service.negotiate(
+                request.headers.get("accept-language"), available
+            )
+        try:
+            return self.__context.lang_service.get_language_by_code(code)
+        except ValueError:
+            raise BadRequestError(f"Idioma '{code}' não é suportado.")
+
+    def _site_list(self) -> Response:
+        items = "".join(
+            f"<li><a href='/{site.get_domain()}/'>{html.escape(site.name)}</a></li>"
+            for site in self.__context.site_repo.get_sites()
+        )
+        document = (
+            "<!DOCTYPE html>\n<html>\n<head><meta charset='utf-8'><title>CMS</title></head>\n"
+            f"<body>\n<h1>Sites</h1>\n<ul>{items}</ul>\n</body>\n</html>\n"
+        )
+        return Response(HTTPStatus.OK, {"Content-Type": HTML_CONTENT_TYPE}, document.encode())
+
+    def _front_page(self, request: Request, site: Site) -> Response:
+        language = self._requested_language(request)
+        document = self.__context.template_cache.render_html(site, language).encode()
+        # a página vem do cache, então o hash é de um documento pequeno e estável
+        etag = f'"{hashlib.blake2b(document, digest_size=12).hexdigest()}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Language"}
+
+        if is_not_modified(request, etag, None):
+            return Response(HTTPStatus.NOT_MODIFIED, headers)
+
+        headers["Content-Type"] = HTML_CONTENT_TYPE
+        return Response(HTTPStatus.OK, headers, document)
+
+    def _autocomplete(self, request: Request, site: Site) -> Response:
+        try:
+            limit = int(request.query.get("k", "10"))
+        except ValueError:
+            raise BadRequestError("Parâmetro 'k' deve ser um inteiro.")
+        if not 1 <= limit <= MAX_AUTOCOMPLETE_K:
+            raise BadRequestError(f"Parâmetro 'k' deve estar entre 1 e {MAX_AUTOCOMPLETE_K}.")
+
+        completions = self.__context.autocomplete.complete(
+            site, request.query.get("q", ""), limit, include_scheduled=False
+        )
+        domain = site.get_domain()
+        response = Response.json([
+            {
+                "kind": completion.kind,
+                "id": completion.item.id,
+                "text": completion.text,
+                "views": completion.views,
+                "url": (
+                    f"/{domain}/posts/{completion.item.id}"
+                    if completion.kind == POST_KIND
+                    else completion.item.url
+                ),
+            }
+            for completion in completions
+        ])
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def _post_page(self, request: Request, site: Site, post_id: int) -> Response:
+        post = self.__context.post_repo.get_post(post_id)
+        if post.site.id != site.id or not self.__context.post_repo.is_published(post):
+            raise ResourceNotFoundError(f"Post com ID {post_id} não encontrado.")
+
+        language = self._requested_language(request, post.get_languages())
+        if language and not post.has_language(language):
+            language = None
+        lang = post.get_content_by_language(language).language.code
+
+        comments = self.__context.comment_repo.get_post_comments(post)
+        etag, last_modified = self._post_validators(post, lang, comments)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Content-Language": lang,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Language",
+        }
+
+        if is_not_modified(request, etag, last_modified):
+            return Response(HTTPStatus.NOT_MODIFIED, headers)
+
+        headers["Content-Type"] = HTML_CONTENT_TYPE
+        return Response(
+            HTTPStatus.OK,
+            headers,
+            iter_post_html(post, language, comments, index_href=f"/{site.get_domain()}/"),
+        )
+
+    def _media_file(self, request: Request, site: Site, media_id: int) -> Response:
+        media = self.__context.media_repo.get_media_by_id(media_id)
+        if media.site.id != site.id:
+            raise ResourceNotFoundError(f"Mídia com ID {media_id} não encontrada.")
+        return self.__media_streamer.serve(request, media)
+
+    @staticmethod
+    def _post_validators(
+        post: Post, lang: str, comments: list[Comment]
+    ) -> tuple[str, datetime]:
+        # a página muda quando entra conteúdo novo (version) ou um comentário
+        etag = f'"{BOOT_ID}-p{post.id}-v{post.version}-{lang}-c{len(comments)}"'
+        last_modified = post.updated_at
+        if comments:
+            last_modified = max(last_modified, comments[-1].created_at)
+        return etag, _to_utc(last_modified)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Front end HTTP somente leitura do CMS.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--populate", action="store_true", help="carrega os dados de exemplo antes de servir"
+    )
+    args = parser.parse_args(argv)
+
+    context = AppContext()
+    if args.populate:
+        from cms.populate import populate
+
+        populate(context)
+    # a página inicial é invalidada assim que um post agendado é publicado
+    context.scheduler.start()
+
+    async def run():
+        server = FrontendServer(context, args.host, args.port)
+        await server.start()
+        print(f"Servindo em http://{server.host}:{server.port}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n Saindo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+servidor HTTP/1.1 mínimo em asyncio, só com a biblioteca padrão.
+
+cuida de ler requisições, manter conexões keep-alive e escrever respostas,
+inclusive corpos gerados em streaming (transfer-encoding chunked) e trechos
+de arquivos, enviados com sendfile sem passar pela memória do Python.
+as subclasses só implementam `dispatch`.
+"""
+import asyncio
+import json
+import mmap
+import sys
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from typing import AsyncIterable, BinaryIO, Callable, Iterable
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from cms.exceptions import CMSException, ResourceNotFoundError
+
+MAX_HEADERS = 100
+MAX_BODY_SIZE = 16 * 1024 * 1024
+# junta pedaços pequenos do gerador antes de escrever no socket
+STREAM_FLUSH_SIZE = 64 * 1024
+
+
+class BadRequestError(CMSException):
+    """requisição HTTP malformada."""
+    pass
+
+
+@dataclass
+class Request:
+    method: str
+    target: str
+    version: str
+    headers: dict[str, str]
+    body: bytes = b""
+    path: str = field(init=False)
+    query: dict[str, str] = field(init=False)
+
+    def __post_init__(self):
+        parts = urlsplit(self.target)
+        self.path = unquote(parts.path)
+        self.query = dict(parse_qsl(parts.query))
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError as e:
+            raise BadRequestError(f"JSON inválido: {e}")
+
+
+@dataclass
+class FileBody:
+    """trecho [offset, offset + count) de um arquivo aberto, enviado como corpo."""
+
+    file: BinaryIO
+    offset: int
+    count: int
+    # chamado quando a resposta termina (ou é descartada), para soltar o arquivo
+    on_close: Callable[[], None] | None = None
+
+    def close(self):
+        if self.on_close:
+            self.on_close()
+            self.on_close = None
+
+
+@dataclass
+class Response:
+    status: HTTPStatus = HTTPStatus.OK
+    headers: dict[str, str] = field(default_factory=dict)
+    # bytes prontos, um gerador de pedaços de texto para streaming ou um trecho de arquivo
+    body: bytes | Iterable[str] | AsyncIterable[bytes] | FileBody = b""
+
+    @classmethod
+    def text(cls, status: HTTPStatus, message: str) -> "Response":
+        return cls(
+            status,
+            {"Content-Type": "text/plain; charset=utf-8"},
+            message.encode("utf-8"),
+        )
+
+    @classmethod
+    def json(cls, payload, status: HTTPStatus = HTTPStatus.OK) -> "Response":
+        return cls(
+            status,
+            {"Content-Type": "application/json"},
+            json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        )
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None) -> bool:
+    """avalia If-None-Match e, na ausência dele, If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request | None:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    if not request_line.endswith(b"\n"):
+        raise BadRequestError("Linha de requisição incompleta.")
+
+    try:
+        method, target, version = request_line.decode("latin-1").rstrip("\r\n").split(" ")
+    except ValueError:
+        raise BadRequestError("Linha de requisição inválida.")
+
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise BadRequestError("Cabeçalhos demais.")
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise BadRequestError("Cabeçalho inválido.")
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    length = headers.get("content-length")
+    if length:
+        if not length.isdigit() or int(length) > MAX_BODY_SIZE:
+            raise BadRequestError("Content-Length inválido.")
+        body = await reader.readexactly(int(length))
+
+    return Request(method.upper(), target, version, headers, body)
+
+
+async def write_response(
+    writer: asyncio.StreamWriter,
+    response: Response,
+    version: str,
+    keep_alive: bool,
+    head_only: bool = False,
+) -> bool:
+    """
+    escreve a resposta e retorna se a conexão pode continuar aberta.
+    """
+    body = response.body
+    no_body = head_only or response.status in (HTTPStatus.NOT_MODIFIED, HTTPStatus.NO_CONTENT)
+    streaming = not isinstance(body, bytes)
+    chunked = streaming and version == "HTTP/1.1" and "Content-Length" not in response.headers
+    if (
+        streaming and not no_body and not chunked and not isinstance(body, FileBody)
+        and "Content-Length" not in response.headers
+    ):
+        # streaming sem tamanho no HTTP/1.0: o fim do corpo é o fechamento da conexão
+        keep_alive = False
+
+    headers = {
+        "Date": formatdate(usegmt=True),
+        "Server": "cms",
+        **response.headers,
+        "Connection": "keep-alive" if keep_alive else "close",
+    }
+
+    if not streaming:
+        headers["Content-Length"] = str(len(body))
+    elif isinstance(body, FileBody):
+        headers["Content-Length"] = str(body.count)
+        chunked = False
+    elif chunked:
+        headers["Transfer-Encoding"] = "chunked"
+
+    head = f"HTTP/1.1 {response.status.value} {response.status.phrase}\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+    writer.write(head.encode("latin-1") + b"\r\n")
+
+    if no_body:
+        _close_body(body)
+    elif not streaming:
+        writer.write(body)
+    elif isinstance(body, FileBody):
+        try:
+            await _send_file(writer, body)
+        finally:
+            body.close()
+    elif hasattr(body, "__aiter__"):
+        async for data in body:
+            writer.write(_chunk(data) if chunked else data)
+            await writer.drain()
+    else:
+        pending: list[bytes] = []
+        pending_size = 0
+        for text in body:
+            data = text.encode("utf-8")
+            pending.append(data)
+            pending_size += len(data)
+            if pending_size >= STREAM_FLUSH_SIZE:
+                data = b"".join(pending)
+                writer.write(_chunk(data) if chunked else data)
+                pending, pending_size = [], 0
+                await writer.drain()
+        if pending:
+            data = b"".join(pending)
+            writer.write(_chunk(data) if chunked else data)
+
+    if chunked and not no_body:
+        writer.write(b"0\r\n\r\n")
+    await writer.drain()
+    return keep_alive
+
+
+async def _send_file(writer: asyncio.StreamWriter, body: FileBody):
+    if not body.count:
+        return
+    try:
+        # sendfile copia do cache de páginas direto para o socket; o offset é
+        # explícito, então o mesmo arquivo aberto serve várias respostas ao mesmo tempo
+        await asyncio.get_running_loop().sendfile(
+            writer.transport, body.file, body.offset, body.count, fallback=False
+        )
+        return
+    except (asyncio.SendfileNotAvailableError, NotImplementedError):
+        pass
+
+    # sem sendfile (ex: TLS): pedaços de um mmap, sem ler o trecho inteiro para a memória
+    with mmap.mmap(body.file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        end = body.offset + body.count
+        for start in range(body.offset, end, STREAM_FLUSH_SIZE):
+            writer.write(mapped[start:min(start + STREAM_FLUSH_SIZE, end)])
+            await writer.drain()
+
+
+def _chunk(data: bytes) -> bytes:
+    return b"%x\r\n%s\r\n" % (len(data), data) if data else b""
+
+
+def _close_body(body):
+    # geradores descartados sem consumir (HEAD, 304) são fechados explicitamente
+    close = getattr(body, "close", None) or getattr(body, "aclose", None)
+    if close and not hasattr(body, "__aiter__"):
+        close()
+
+
+class HttpServer(ABC):
+    """base dos servidores HTTP do CMS."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080):
+        self.host = host
+        self.port = port
+        self._server: asyncio.Server | None = None
+
+    @abstractmethod
+    async def dispatch(self, request: Request) -> Response:
+        pass
+
+    async def start(self) -> asyncio.Server:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # com porta 0 o sistema escolhe uma livre
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        server = self._server or await self.start()
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (BadRequestError, asyncio.LimitOverrunError, ValueError) as e:
+                    await write_response(
+                        writer, Response.text(HTTPStatus.BAD_REQUEST, str(e)), "HTTP/1.1", False
+                    )
+                    break
+                if request is None:
+                    break
+
+                response = await self._safe_dispatch(request)
+                keep_alive = await write_response(
+                    writer,
+                    response,
+                    request.version,
+                    request.keep_alive,
+                    head_only=request.method == "HEAD",
+                )
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _safe_dispatch(self, request: Request) -> Response:
+        try:
+            return await self.dispatch(request)
+        except BadRequestError as e:
+            return Response.text(HTTPStatus.BAD_REQUEST, str(e))
+        except ResourceNotFoundError as e:
+            return Response.text(HTTPStatus.NOT_FOUND, str(e))
+        except CMSException as e:
+            return Response.text(HTTPStatus.INTERNAL_SERVER_ERROR, f"Erro: {e}")
+        except Exception as e:
+            # um bug num handler vira 500, sem derrubar a conexão sem resposta
+            print(f"Erro em {request.method} {request.path}: {e!r}", file=sys.stderr)
+            return Response.text(HTTPStatus.INTERNAL_SERVER_ERROR, "Erro interno.")
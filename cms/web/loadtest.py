@@ -0,0 +1,173 @@
+"""
+teste de carga local do front end HTTP, por loopback.
+
+abre várias conexões keep-alive, dispara GETs e reporta requisições por
+segundo e a latência (p50/p90/p99). sem --url, sobe o front end num processo
+separado com os dados de exemplo.
+
+execute com: python -m cms.web.loadtest --connections 50 --requests 20000
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Conexão fechada pelo servidor.")
+    status = int(status_line.split(b" ", 2)[1])
+
+    headers: dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+
+    return status, headers
+
+
+async def _worker(
+    host: str,
+    port: int,
+    paths: list[str],
+    remaining: list[int],
+    latencies: list[float],
+    statuses: dict[int, int],
+    conditional: bool,
+):
+    reader, writer = await asyncio.open_connection(host, port)
+    etags: dict[str, str] = {}
+    i = 0
+    try:
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            path = paths[i % len(paths)]
+            i += 1
+
+            request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+            if conditional and path in etags:
+                request += f"If-None-Match: {etags[path]}\r\n"
+            request += "\r\n"
+
+            start = time.perf_counter()
+            writer.write(request.encode("latin-1"))
+            status, headers = await _read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if "etag" in headers:
+                etags[path] = headers["etag"]
+    finally:
+        writer.close()
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+async def run_load_test(
+    host: str,
+    port: int,
+    paths: list[str],
+    connections: int,
+    requests: int,
+    conditional: bool,
+) -> dict:
+    remaining = [requests]
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _worker(host, port, paths, remaining, latencies, statuses, conditional)
+            for _ in range(connections)
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p90_ms": _percentile(latencies, 90) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "statuses": statuses,
+    }
+
+
+def _start_local_server() -> tuple[subprocess.Popen, str, int]:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "cms.web.frontend", "--port", "0", "--populate"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # primeira linha: "Servindo em http://host:porta"
+    line = process.stdout.readline().strip()
+    if not line.startswith("Servindo em "):
+        process.kill()
+        raise RuntimeError(f"Falha ao iniciar o servidor: {line!r}")
+    url = urlsplit(line.removeprefix("Servindo em "))
+    return process, url.hostname, url.port
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Teste de carga do front end HTTP.")
+    parser.add_argument("--url", help="servidor já em execução (ex: http://127.0.0.1:8080)")
+    parser.add_argument("--path", action="append", dest="paths", help="caminho a requisitar")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument(
+        "--conditional",
+        action="store_true",
+        help="reenvia o ETag recebido com If-None-Match (mede o caminho do 304)",
+    )
+    args = parser.parse_args(argv)
+    paths = args.paths or ["/meu-blog/", "/meu-blog/posts/1", "/meu-blog/posts/2"]
+
+    process = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        process, host, port = _start_local_server()
+
+    try:
+        result = asyncio.run(
+            run_load_test(host, port, paths, args.connections, args.requests, args.conditional)
+        )
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print(f"Requisições: {result['requests']} em {result['seconds']:.2f}s")
+    print(f"Requisições por segundo: {result['rps']:,.0f}")
+    print(
+        f"Latência: p50 {result['p50_ms']:.2f}ms | p90 {result['p90_ms']:.2f}ms "
+        f"| p99 {result['p99_ms']:.2f}ms"
+    )
+    print(f"Status: {result['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+entrega dos arquivos das mídias por HTTP, com suporte a Range.
+
+o corpo da resposta é um FileBody: o servidor manda o trecho pedido com
+sendfile, então avançar um vídeo grande não lê o arquivo para a memória do
+Python. os arquivos abertos ficam num cache LRU limitado, e um arquivo que sai
+do cache enquanto ainda está sendo enviado só é fechado no fim do envio.
+
+a ETag vem do hash do conteúdo (MediaFile.content_hash), que já identifica o
+arquivo; If-None-Match, If-Modified-Since e If-Range usam esse validador.
+"""
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http import HTTPStatus
+from pathlib import Path
+
+from cms.exceptions import ResourceNotFoundError
+from cms.models import MediaFile, MediaType
+from cms.web.http_server import FileBody, Request, Response, is_not_modified
+
+# arquivos mantidos abertos entre as requisições
+DEFAULT_MAX_OPEN_FILES = 64
+# as mídias nunca mudam de conteúdo (o blob é endereçado pelo hash)
+MEDIA_CACHE_CONTROL = "public, max-age=86400"
+
+
+class _OpenFile:
+    __slots__ = ("file", "size", "mtime", "identity", "leases", "evicted")
+
+    def __init__(self, path: Path):
+        self.file = open(path, "rb", buffering=0)
+        stat = os.fstat(self.file.fileno())
+        self.size = stat.st_size
+        self.mtime = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        # respostas em andamento usando o arquivo
+        self.leases = 0
+        self.evicted = False
+
+
+class OpenFileCache:
+    """
+    cache LRU de arquivos abertos. acquire devolve o arquivo com uma
+    referência, que deve ser solta com release quando a resposta termina.
+    """
+
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN_FILES, immutable_root: Path | None = None):
+        if max_open < 1:
+            raise ValueError("max_open deve ser positivo.")
+        self.__max_open = max_open
+        # arquivos sob essa raiz nunca mudam e não precisam de stat a cada acesso
+        self.__immutable_root = immutable_root
+        self.__files: OrderedDict[Path, _OpenFile] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def acquire(self, path: Path) -> _OpenFile:
+        """
+        raises:
+            OSError: Se o arquivo não pode ser aberto
+        """
+        with self.__lock:
+            entry = self.__files.get(path)
+            if entry is not None and not self.__is_current(path, entry):
+                self.__evict(path)
+                entry = None
+            if entry is None:
+                entry = self.__files[path] = _OpenFile(path)
+                while len(self.__files) > self.__max_open:
+                    self.__evict(next(iter(self.__files)))
+            else:
+                self.__files.move_to_end(path)
+            entry.leases += 1
+            return entry
+
+    def release(self, entry: _OpenFile):
+        with self.__lock:
+            entry.leases -= 1
+            if entry.evicted and not entry.leases:
+                entry.file.close()
+
+    def clear(self):
+        with self.__lock:
+            for path in list(self.__files):
+                self.__evict(path)
+
+    def __len__(self) -> int:
+        return len(self.__files)
+
+    def __is_current(self, path: Path, entry: _OpenFile) -> bool:
+        if self.__immutable_root is not None and path.is_relative_to(self.__immutable_root):
+            return True
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) == entry.identity
+
+    def __evict(self, path: Path):
+        entry = self.__files.pop(path)
+        entry.evicted = True
+        if not entry.leases:
+            entry.file.close()
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    interpreta um Range de um único trecho e devolve (início, fim exclusivo).
+    None quando o cabeçalho deve ser ignorado (unidade desconhecida ou vários
+    trechos): a resposta é o arquivo inteiro.
+
+    raises:
+        ValueError: Se o trecho não existe no arquivo (416)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.partition("-"))
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+    if not first:
+        # sufixo: os últimos N bytes
+        length = int(last)
+        if not length or not size:
+            raise ValueError("Trecho vazio.")
+        return max(0, size - length), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Trecho fora do arquivo.")
+    return start, min(int(last) + 1, size) if last else size
+
+
+def media_content_type(media: MediaFile) -> str:
+    guessed, _ = mimetypes.guess_type(media.filename)
+    if guessed:
+        return guessed
+    return "image/*" if media.media_type == MediaType.IMAGE else "video/*"
+
+
+class MediaStreamer:
+    def __init__(self, files: OpenFileCache | None = None):
+        # um cache vazio é falso (__len__), então a comparação é com None
+        self.files = files if files is not None else OpenFileCache()
+
+    def serve(self, request: Request, media: MediaFile) -> Response:
+        """
+        resposta com o arquivo da mídia: 200 inteiro, 206 com o trecho do
+        Range, 304 para validadores que batem e 416 para trechos inválidos.
+
+        raises:
+            ResourceNotFoundError: Se o arquivo da mídia não existe mais
+        """
+        try:
+            entry = self.files.acquire(Path(media.path))
+        except OSError:
+            raise ResourceNotFoundError(f"Arquivo da mídia {media.id} não encontrado.")
+
+        try:
+            return self.__respond(request, media, entry)
+        except BaseException:
+            self.files.release(entry)
+            raise
+
+    def __respond(self, request: Request, media: MediaFile, entry: _OpenFile) -> Response:
+        etag = self.__etag(media, entry)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(entry.mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": MEDIA_CACHE_CONTROL,
+        }
+        if is_not_modified(request, etag, entry.mtime):
+            self.files.release(entry)
+            return Response(HTTPStatus.NOT_MODIFIED, headers)
+
+        start, end = 0, entry.size
+        status = HTTPStatus.OK
+        range_header = request.headers.get("range")
+        if range_header and self.__range_applies(request, etag):
+            try:
+                byte_range = parse_range(range_header, entry.size)
+            except ValueError:
+                self.files.release(entry)
+                headers["Content-Range"] = f"bytes */{entry.size}"
+                return Response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, headers)
+            if byte_range is not None:
+                start, end = byte_range
+                status = HTTPStatus.PARTIAL_CONTENT
+                headers["Content-Range"] = f"bytes {start}-{end - 1}/{entry.size}"
+
+        headers["Content-Type"] = media_content_type(media)
+        body = FileBody(entry.file, start, end - start, lambda: self.files.release(entry))
+        return Response(status, headers, body)
+
+    @staticmethod
+    def __etag(media: MediaFile, entry: _OpenFile) -> str:
+        if media.content_hash:
+            return f'"{media.content_hash}"'
+        # mídias antigas, sem hash: inode, mtime e tamanho identificam a versão do arquivo
+        inode, mtime_ns, size = entry.identity
+        return f'"f{inode:x}-{mtime_ns:x}-{size:x}"'
+
+    @staticmethod
+    def __range_applies(request: Request, etag: str) -> bool:
+        # If-Range: o trecho só vale se o cliente tem a mesma versão do arquivo
+        if_range = request.headers.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith('"'):
+            return if_range == etag
+        # datas em If-Range não são comparadas (validador fraco): manda o arquivo inteiro
+        return False
+
@@ -0,0 +1,111 @@
+"""
+stub local das APIs das redes sociais, para testar a publicação sem rede.
+
+aceita POST /<plataforma>/posts/batch com {"items": [{"ref", "text", "language"}]}
+e responde {"results": [{"ref", "id"} | {"ref", "error", "retryable"}]}. cada
+plataforma tem sua cota (429 com Retry-After quando estoura) e seu limite de
+caracteres; --failure-rate simula instabilidade com respostas 503.
+GET /<plataforma>/posts retorna quantas publicações a plataforma recebeu.
+
+execute com: python -m cms.web.social_stub --port 8090
+"""
+import argparse
+import asyncio
+import math
+import random
+from http import HTTPStatus
+from itertools import count
+
+from cms.services.social_publisher import TokenBucket
+from cms.web.http_server import BadRequestError, HttpServer, Request, Response
+
+PLATFORM_CHARACTER_LIMITS = {"twitter": 280, "facebook": 63206, "instagram": 2200}
+
+
+class SocialPlatformStub(HttpServer):
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8090,
+        per_second: float = 100.0,
+        burst: int = 200,
+        failure_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        super().__init__(host, port)
+        self.__quotas = {
+            platform: TokenBucket(per_second, burst) for platform in PLATFORM_CHARACTER_LIMITS
+        }
+        self.__failure_rate = failure_rate
+        self.__random = random.Random(seed)
+        self.__ids = count(1)
+        self.published: dict[str, list[dict]] = {platform: [] for platform in PLATFORM_CHARACTER_LIMITS}
+
+    async def dispatch(self, request: Request) -> Response:
+        segments = [segment for segment in request.path.split("/") if segment]
+        if len(segments) < 2 or segments[0] not in PLATFORM_CHARACTER_LIMITS or segments[1] != "posts":
+            return Response.json({"error": "Não encontrado."}, HTTPStatus.NOT_FOUND)
+        platform = segments[0]
+
+        if request.method == "GET" and len(segments) == 2:
+            return Response.json({"published": len(self.published[platform])})
+        if request.method != "POST" or segments[2:] != ["batch"]:
+            return Response.json({"error": "Método não permitido."}, HTTPStatus.METHOD_NOT_ALLOWED)
+
+        items = request.json().get("items")
+        if not isinstance(items, list) or not items:
+            raise BadRequestError("Campo 'items' deve ser uma lista não vazia.")
+
+        if self.__random.random() < self.__failure_rate:
+            return Response.json({"error": "Instabilidade simulada."}, HTTPStatus.SERVICE_UNAVAILABLE)
+
+        wait = self.__quotas[platform].take(len(items))
+        if wait:
+            response = Response.json({"error": "Cota excedida."}, HTTPStatus.TOO_MANY_REQUESTS)
+            response.headers["Retry-After"] = str(math.ceil(wait))
+            return response
+
+        limit = PLATFORM_CHARACTER_LIMITS[platform]
+        results = []
+        for item in items:
+            text = item.get("text") or ""
+            if len(text) > limit:
+                results.append({
+                    "ref": item.get("ref"),
+                    "error": f"Texto com {len(text)} caracteres (máximo {limit}).",
+                    "retryable": False,
+                })
+                continue
+            post_id = next(self.__ids)
+            self.published[platform].append({"id": post_id, **item})
+            results.append({"ref": item.get("ref"), "id": f"{platform}-{post_id}"})
+        return Response.json({"results": results})
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Stub local das APIs das redes sociais.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--per-second", type=float, default=100.0, help="cota por plataforma")
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument(
+        "--failure-rate", type=float, default=0.0, help="fração de lotes que recebem 503"
+    )
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = SocialPlatformStub(
+            args.host, args.port, args.per_second, args.burst, args.failure_rate
+        )
+        await server.start()
+        print(f"Stub das redes sociais em http://{server.host}:{server.port}/")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
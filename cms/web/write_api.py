@@ -0,0 +1,486 @@
+"""
+API HTTP de escrita do CMS, em JSON.
+
+cria posts, comentários, registros de mídia e permissões sem passar pelos
+prompts do PostBuilder. os handlers são síncronos e rodam num pool de threads
+limitado, fora do loop de eventos; quando o pool está cheio a API responde 503.
+os endpoints de lote usam as inserções em lote dos repositórios e devolvem um
+resultado por item.
+
+autenticação: HTTP Basic com usuário e senha do CMS.
+
+/api/media só registra arquivos que já estão no servidor, dentro do diretório
+de importação (--import-root ou CMS_MEDIA_IMPORT_ROOT); sem ele configurado,
+caminhos de arquivo são recusados. /api/permissions só é aceito do dono do site
+ou de um admin, e /api/analytics/batch aceita de qualquer usuário apenas VIEW e
+COMMENT em posts publicados e ACCESS em sites; as demais ações exigem permissão
+no site.
+
+execute com: python -m cms.web.write_api --port 8081 --workers 8 --populate
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Callable
+
+from cms.context import AppContext
+from cms.exceptions import (
+    AuthenticationError,
+    CMSException,
+    PermissionDeniedError,
+    QuotaExceededError,
+    ResourceNotFoundError,
+    ValidationError,
+)
+from cms.models import (
+    AnalyticsEntry,
+    Comment,
+    MediaFile,
+    Permission,
+    PostAction,
+    PostAnalyticsEntry,
+    Site,
+    SiteAction,
+    SiteAnalyticsEntry,
+    User,
+    UserRole,
+)
+from cms.services.media_probe import probe_media
+from cms.services.post_builder import PostBuilder, PostSpec
+from cms.utils import infer_media_type
+from cms.web.http_server import BadRequestError, HttpServer, Request, Response
+
+MAX_BATCH_SIZE = 1000
+# raiz dos arquivos que /api/media pode registrar
+MEDIA_IMPORT_ROOT = os.environ.get("CMS_MEDIA_IMPORT_ROOT")
+# ações que qualquer usuário autenticado pode registrar; as demais exigem
+# permissão no site
+READER_POST_ACTIONS = frozenset({PostAction.VIEW, PostAction.COMMENT})
+READER_SITE_ACTIONS = frozenset({SiteAction.ACCESS})
+
+type Handler = Callable[[User, dict], tuple[HTTPStatus, dict]]
+type ItemResult = dict[str, object]
+
+
+class WriteApiServer(HttpServer):
+    def __init__(
+        self,
+        context: AppContext,
+        host: str = "127.0.0.1",
+        port: int = 8081,
+        workers: int = 8,
+        max_pending: int | None = None,
+        import_root: str | Path | None = MEDIA_IMPORT_ROOT,
+    ):
+        super().__init__(host, port)
+        self.__context = context
+        self.__import_root = Path(import_root).resolve() if import_root else None
+        self.__pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cms-write")
+        # requisições aceitas além das que já estão rodando no pool
+        self.__slots = threading.BoundedSemaphore(workers + (max_pending or workers * 4))
+        # as inserções compostas (repositório + analytics) não se intercalam
+        self.__write_lock = threading.Lock()
+        self.__routes: dict[str, Handler] = {
+            "/api/posts": self._create_post,
+            "/api/comments": self._create_comment,
+            "/api/comments/batch": self._create_comments,
+            "/api/media": self._create_media,
+            "/api/permissions": self._grant_permission,
+            "/api/analytics/batch": self._log_events,
+        }
+
+    async def dispatch(self, request: Request) -> Response:
+        handler = self.__routes.get(request.path.rstrip("/"))
+        if handler is None:
+            return Response.text(HTTPStatus.NOT_FOUND, f"Caminho '{request.path}' não encontrado.")
+        if request.method != "POST":
+            response = Response.text(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST.")
+            response.headers["Allow"] = "POST"
+            return response
+
+        if not self.__slots.acquire(blocking=False):
+            response = Response.json({"error": "Servidor ocupado."}, HTTPStatus.SERVICE_UNAVAILABLE)
+            response.headers["Retry-After"] = "1"
+            return response
+
+        try:
+            loop = asyncio.get_running_loop()
+            status, payload = await loop.run_in_executor(
+                self.__pool, self._run_handler, handler, request
+            )
+        finally:
+            self.__slots.release()
+
+        response = Response.json(payload, status)
+        if status == HTTPStatus.UNAUTHORIZED:
+            response.headers["WWW-Authenticate"] = 'Basic realm="cms"'
+        return response
+
+    async def close(self):
+        await super().close()
+        self.__pool.shutdown(wait=True)
+
+    def _run_handler(self, handler: Handler, request: Request) -> tuple[HTTPStatus, dict]:
+        """roda na thread de trabalho: autentica, lê o JSON e chama o handler."""
+        try:
+            user = self._authenticate(request)
+            data = request.json()
+            if not isinstance(data, dict):
+                raise BadRequestError("O corpo deve ser um objeto JSON.")
+            return handler(user, data)
+        except AuthenticationError as e:
+            return HTTPStatus.UNAUTHORIZED, {"error": str(e)}
+        except PermissionDeniedError as e:
+            return HTTPStatus.FORBIDDEN, {"error": str(e)}
+        except (BadRequestError, ValidationError) as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except CMSException as e:
+            return _status_for(e), {"error": str(e)}
+
+    def _authenticate(self, request: Request) -> User:
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "basic" or not credentials:
+            raise AuthenticationError("Autenticação necessária.")
+        try:
+            decoded = base64.b64decode(credentials, validate=True).decode("utf-8")
+        except (binascii.Error, UnicodeDecodeError):
+            raise AuthenticationError("Credenciais malformadas.")
+        username, _, password = decoded.partition(":")
+        try:
+            return self.__context.user_repo.validate_user(username, password)
+        except ValidationError as e:
+            raise AuthenticationError(str(e))
+
+    # ---- handlers (rodam nas threads do pool) ----
+
+    def _create_post(self, user: User, data: dict) -> tuple[HTTPStatus, dict]:
+        site = self._managed_site(user, data)
+        spec = PostSpec.from_dict(site, user, data)
+        post = PostBuilder(site, user).apply_spec(spec).build()
+
+        with self.__write_lock:
+            post_id = self.__context.post_repo.add_post(post)
+            self.__context.analytics_repo.log(
+                SiteAnalyticsEntry(
+                    user=user,
+                    site=site,
+                    action=SiteAction.CREATE_POST,
+                    metadata={"post_id": str(post_id)},
+                )
+            )
+        return HTTPStatus.CREATED, {"id": post_id}
+
+    def _create_comment(self, user: User, data: dict) -> tuple[HTTPStatus, dict]:
+        comment = self._build_comment(user, data)
+        context = self.__context
+
+        with self.__write_lock:
+            comment_id = context.comment_repo.add_comment(comment)
+            context.event_manager.notify(
+                "POST_COMMENTED",
+                user=user,
+                site=comment.post.site,
+                post=comment.post,
+                comment_id=comment_id,
+            )
+        return HTTPStatus.CREATED, {"id": comment_id}
+
+    def _create_comments(self, user: User, data: dict) -> tuple[HTTPStatus, dict]:
+        items = _batch_items(data, "comments")
+        results: list[ItemResult] = []
+        comments: list[tuple[int, Comment]] = []
+
+        for index, item in enumerate(items):
+            try:
+                comments.append((index, self._build_comment(user, item)))
+            except CMSException as e:
+                results.append(_item_error(index, e))
+
+        if comments:
+            with self.__write_lock:
+                ids = self.__context.comment_repo.add_comments([c for _, c in comments])
+                # um único lote no analytics em vez de um evento por comentário
+                self.__context.analytics_repo.log_many(
+                    [
+                        PostAnalyticsEntry(
+                            user=user,
+                            site=comment.post.site,
+                            post=comment.post,
+                            action=PostAction.COMMENT,
+                            metadata={"comment_id": str(comment_id)},
+                        )
+                        for (_, comment), comment_id in zip(comments, ids)
+                    ]
+                )
+            results.extend(
+                {"index": index, "ok": True, "id": comment_id}
+                for (index, _), comment_id in zip(comments, ids)
+            )
+
+        return _batch_response(results)
+
+    def _create_media(self, user: User, data: dict) -> tuple[HTTPStatus, dict]:
+        site = self._managed_site(user, data)
+        path = self._import_path(_required_str(data, "path"))
+        filename = _optional_str(data, "filename") or path.name
+        media_type = infer_media_type(path.suffix)
+        width = _optional_int(data, "width")
+        height = _optional_int(data, "height")
+        duration = _optional_float(data, "duration")
+        if not path.is_file():
+            raise ValidationError(
+                f"Arquivo '{path.name}' não encontrado no diretório de importação."
+            )
+        # o que o cliente não informou vem do cabeçalho do arquivo
+        info = probe_media(path)
+        width = info.width if width is None else width
+        height = info.height if height is None else height
+        duration = info.duration if duration is None else duration
+
+        # a cota é conferida pelo stat, antes de ler ou copiar o arquivo, e o espaço
+        # fica reservado até a mídia entrar no repositório: envios simultâneos não
+        # passam juntos da cota
+        with self.__context.storage_accounting.reserve(site, path.stat().st_size):
+            blob = self.__context.media_store.put(path)
+
+            media = MediaFile(
+                uploader=user,
+                filename=filename,
+                path=blob.path,
+                media_type=media_type,
+                site=site,
+                width=width,
+                height=height,
+                duration=duration,
+                size=blob.size,
+                content_hash=blob.digest,
+            )
+
+            with self.__write_lock:
+                # conferido sob a trava: dois envios do mesmo arquivo não viram duas mídias
+                existing = self.__context.media_repo.get_site_media_by_hash(site, blob.digest)
+                if existing:
+                    return HTTPStatus.OK, {"id": existing.id, "url": existing.url}
+                media_id = self.__context.media_repo.add_midia(media)
+                self.__context.analytics_repo.log(
+                    SiteAnalyticsEntry(user=user, site=site, action=SiteAction.UPLOAD_MEDIA)
+                )
+        return HTTPStatus.CREATED, {"id": media_id, "url": media.url}
+
+    def _grant_permission(self, user: User, data: dict) -> tuple[HTTPStatus, dict]:
+        site = self.__context.site_repo.get_site(_required_int(data, "site_id"))
+        # como no menu do site: só o dono (ou um admin) adiciona gerentes
+        if user.role != UserRole.ADMIN and site.owner.id != user.id:
+            raise PermissionDeniedError(
+                f"Só o dono do site '{site.name}' pode conceder permissões."
+            )
+        grantee = self.__context.user_repo.get_user(_required_int(data, "user_id"))
+        self.__context.permission_repo.grant_permission(Permission(user=grantee, site=site))
+        return HTTPStatus.CREATED, {"user_id": grantee.id, "site_id": site.id}
+
+    def _log_events(self, user: User, data: dict) -> tuple[HTTPStatus, dict]:
+        items = _batch_items(data, "events")
+        results: list[ItemResult] = []
+        entries: list[tuple[int, AnalyticsEntry]] = []
+
+        for index, item in enumerate(items):
+            try:
+                entries.append((index, self._build_event(user, item)))
+            except CMSException as e:
+                results.append(_item_error(index, e))
+
+        if entries:
+            with self.__write_lock:
+                ids = self.__context.analytics_repo.log_many([entry for _, entry in entries])
+            results.extend(
+                {"index": index, "ok": True, "id": entry_id}
+                for (index, _), entry_id in zip(entries, ids)
+            )
+
+        return _batch_response(results)
+
+    # ---- construção dos objetos a partir do JSON ----
+
+    def _import_path(self, value: str) -> Path:
+        """
+        raises:
+            PermissionDeniedError: Se o caminho fica fora do diretório de importação
+        """
+        if self.__import_root is None:
+            raise PermissionDeniedError("Este servidor não aceita caminhos de arquivo.")
+        # resolve segue links simbólicos e '..' antes da comparação
+        path = (self.__import_root / value).resolve()
+        if not path.is_relative_to(self.__import_root):
+            raise PermissionDeniedError(f"Caminho '{value}' fora do diretório de importação.")
+        return path
+
+    def _managed_site(self, user: User, data: dict) -> Site:
+        site = self.__context.site_repo.get_site(_required_int(data, "site_id"))
+        self._check_manages(user, site)
+        return site
+
+    def _check_manages(self, user: User, site: Site):
+        if user.role != UserRole.ADMIN and not self.__context.permission_repo.has_permission(
+            user, site
+        ):
+            raise PermissionDeniedError(f"Sem permissão para gerenciar o site '{site.name}'.")
+
+    def _build_comment(self, user: User, data: object) -> Comment:
+        if not isinstance(data, dict):
+            raise ValidationError("Comentário deve ser um objeto.")
+        post = self.__context.post_repo.get_post(_required_int(data, "post_id"))
+        body = _required_str(data, "body")
+        return Comment(post=post, commenter=user, body=body)
+
+    def _build_event(self, user: User, data: object) -> AnalyticsEntry:
+        if not isinstance(data, dict):
+            raise ValidationError("Evento deve ser um objeto.")
+
+        action = _required_str(data, "action").upper()
+        metadata = _metadata(data)
+
+        if "post_id" in data:
+            if action not in PostAction.__members__:
+                raise ValidationError(f"Ação de post '{action}' não suportada.")
+            post = self.__context.post_repo.get_post(_required_int(data, "post_id"))
+            # leitores só registram o que um leitor faz num post publicado; o resto
+            # é ação de quem gerencia o site
+            if PostAction[action] not in READER_POST_ACTIONS or not (
+                self.__context.post_repo.is_published(post)
+            ):
+                self._check_manages(user, post.site)
+            return PostAnalyticsEntry(
+                user=user,
+                site=post.site,
+                post=post,
+                action=PostAction[action],
+                metadata=metadata,
+            )
+
+        if action not in SiteAction.__members__:
+            raise ValidationError(f"Ação de site '{action}' não suportada.")
+        site = self.__context.site_repo.get_site(_required_int(data, "site_id"))
+        if SiteAction[action] not in READER_SITE_ACTIONS:
+            self._check_manages(user, site)
+        return SiteAnalyticsEntry(
+            user=user, site=site, action=SiteAction[action], metadata=metadata
+        )
+
+
+def _status_for(error: CMSException) -> HTTPStatus:
+    if isinstance(error, ResourceNotFoundError):
+        return HTTPStatus.NOT_FOUND
+    if isinstance(error, QuotaExceededError):
+        return HTTPStatus.INSUFFICIENT_STORAGE
+    return HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def _item_error(index: int, error: Exception) -> ItemResult:
+    return {"index": index, "ok": False, "error": str(error)}
+
+
+def _batch_items(data: dict, key: str) -> list:
+    items = data.get(key)
+    if not isinstance(items, list):
+        raise BadRequestError(f"Campo '{key}' deve ser uma lista.")
+    if len(items) > MAX_BATCH_SIZE:
+        raise BadRequestError(f"Lote com mais de {MAX_BATCH_SIZE} itens.")
+    return items
+
+
+def _batch_response(results: list[ItemResult]) -> tuple[HTTPStatus, dict]:
+    results.sort(key=lambda result: result["index"])
+    created = sum(1 for result in results if result["ok"])
+    return HTTPStatus.OK, {"created": created, "failed": len(results) - created, "results": results}
+
+
+def _required_str(data: dict, key: str) -> str:
+    value = data.get(key)
+    if not isinstance(value, str) or not value.strip():
+        raise ValidationError(f"Campo '{key}' é obrigatório.")
+    return value.strip()
+
+
+def _required_int(data: dict, key: str) -> int:
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValidationError(f"Campo '{key}' deve ser um inteiro.")
+    return value
+
+
+def _optional_str(data: dict, key: str) -> str | None:
+    if data.get(key) is None:
+        return None
+    return _required_str(data, key)
+
+
+def _metadata(data: dict) -> dict[str, str]:
+    metadata = data.get("metadata")
+    if metadata is None:
+        return {}
+    if not isinstance(metadata, dict):
+        raise ValidationError("Campo 'metadata' deve ser um objeto.")
+    return {str(key): str(value) for key, value in metadata.items()}
+
+
+def _optional_int(data: dict, key: str) -> int | None:
+    if data.get(key) is None:
+        return None
+    return _required_int(data, key)
+
+
+def _optional_float(data: dict, key: str) -> float | None:
+    value = data.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValidationError(f"Campo '{key}' deve ser um número.")
+    return float(value)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="API HTTP de escrita do CMS.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--workers", type=int, default=8, help="threads do pool de handlers")
+    parser.add_argument(
+        "--import-root",
+        default=MEDIA_IMPORT_ROOT,
+        help="diretório dos arquivos que /api/media pode registrar (padrão: CMS_MEDIA_IMPORT_ROOT)",
+    )
+    parser.add_argument(
+        "--populate", action="store_true", help="carrega os dados de exemplo antes de servir"
+    )
+    args = parser.parse_args(argv)
+
+    context = AppContext()
+    if args.populate:
+        from cms.populate import populate
+
+        populate(context)
+
+    async def run():
+        server = WriteApiServer(
+            context, args.host, args.port, args.workers, import_root=args.import_root
+        )
+        await server.start()
+        print(f"Servindo em http://{server.host}:{server.port}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n Saindo.")
+
+
+if __name__ == "__main__":
+    main()
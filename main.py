@@ -1,5 +1,13 @@
-from cms.views import Menu
+import sys
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # com argumentos, roda a CLI headless sem montar o menu
+        from cms.cli import main
+
+        sys.exit(main())
+
+    from cms.views import Menu
+
     menu = Menu()
     menu.show()
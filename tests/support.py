@@ -0,0 +1,137 @@
+"""
+utilitários compartilhados pelos testes.
+
+execute com: python -m unittest discover -s tests -t .
+"""
+import asyncio
+import base64
+import http.client
+import json
+import struct
+import tempfile
+import threading
+import unittest
+import zlib
+from datetime import datetime
+from unittest import mock
+
+from cms.context import AppContext
+from cms.models import Content, Permission, Post, Site, TextBlock, User, UserRole
+from cms.web.http_server import HttpServer
+
+
+def png_bytes(width: int = 2, height: int = 2) -> bytes:
+    """um PNG válido e mínimo, em escala de cinza, com as dimensões pedidas."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    pixels = zlib.compress(b"".join(b"\x00" + b"\x80" * width for _ in range(height)))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+class ContextTestCase(unittest.TestCase):
+    """reconstrói o AppContext com as mídias num diretório temporário a cada teste."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch("cms.context.MEDIA_ROOT", f"{self.tmp.name}/store")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.context = AppContext()
+        self.context.reset_context()
+        self.addCleanup(self.context.reset_context)
+
+    def add_user(self, username: str, role: UserRole = UserRole.USER) -> User:
+        user = User(
+            first_name=username.title(),
+            last_name="Teste",
+            email=f"{username}@teste.com",
+            username=username,
+            password="Senha123",
+            role=role,
+        )
+        self.context.user_repo.add_user(user)
+        return user
+
+    def add_site(self, owner: User, *managers: User) -> Site:
+        site = Site(owner=owner, name=f"Site de {owner.username}", description="Um site.")
+        self.context.site_repo.add_site(site)
+        for user in (owner, *managers):
+            self.context.permission_repo.grant_permission(Permission(user=user, site=site))
+        return site
+
+    def add_post(
+        self,
+        site: Site,
+        title: str = "Um post",
+        text: str = "Algum texto.",
+        scheduled_to: datetime | None = None,
+    ) -> Post:
+        post = self.build_post(site, title, text, scheduled_to)
+        self.context.post_repo.add_post(post)
+        return post
+
+    def build_post(
+        self,
+        site: Site,
+        title: str = "Um post",
+        text: str = "Algum texto.",
+        scheduled_to: datetime | None = None,
+    ) -> Post:
+        post = Post(poster=site.owner, site=site, scheduled_to=scheduled_to or datetime.now())
+        post.add_content(
+            "pt-br",
+            Content(
+                title=title,
+                language=self.context.lang_service.get_language_by_code("br"),
+                body=[TextBlock(order=1, text=text)],
+            ),
+        )
+        return post
+
+
+class ServerThread:
+    """roda um HttpServer numa porta livre, com o loop de eventos numa thread própria."""
+
+    def __init__(self, server: HttpServer):
+        self.server = server
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+
+    def __enter__(self) -> "ServerThread":
+        self.__thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.__loop).result(timeout=5)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.__loop).result(timeout=5)
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join(timeout=5)
+        self.__loop.close()
+
+    def connection(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.server.host, self.server.port, timeout=5)
+
+    def request(
+        self, method: str, path: str, body: bytes | None = None, headers: dict | None = None
+    ) -> tuple[http.client.HTTPResponse, bytes]:
+        connection = self.connection()
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+    def post_json(self, path: str, payload: dict, user: User) -> tuple[int, dict]:
+        credentials = base64.b64encode(f"{user.username}:{user.password}".encode()).decode()
+        response, body = self.request(
+            "POST",
+            path,
+            json.dumps(payload).encode(),
+            {"Authorization": f"Basic {credentials}", "Content-Type": "application/json"},
+        )
+        return response.status, json.loads(body)
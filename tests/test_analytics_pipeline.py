@@ -0,0 +1,67 @@
+import threading
+from unittest import mock
+
+from cms.models import PostAction, PostAnalyticsEntry, SiteTemplateType
+from tests.support import ContextTestCase
+
+
+class AnalyticsPipelineTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.context.enable_analytics_pipeline(staleness=0)
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+        self.site.template = SiteTemplateType.TOP_POSTS_FIRST
+        self.posts = [self.add_post(self.site, title=f"Post {i}") for i in range(6)]
+        # o post i recebe i visualizações
+        self.client.log_many(
+            [
+                PostAnalyticsEntry(user=self.owner, site=self.site, post=post, action=PostAction.VIEW)
+                for i, post in enumerate(self.posts)
+                for _ in range(i)
+            ]
+        )
+
+    def test_front_page_fetches_all_views_in_one_query(self):
+        with (
+            mock.patch.object(self.client, "get_counts", wraps=self.client.get_counts) as counts,
+            mock.patch.object(self.client, "get_post_views") as single,
+        ):
+            page = self.context.template_cache.render(self.site)
+        self.assertEqual(counts.call_count, 1)
+        single.assert_not_called()
+        # os três mais vistos, do mais para o menos visto
+        self.assertLess(page.index("Post 5"), page.index("Post 4"))
+        self.assertLess(page.index("Post 4"), page.index("Post 3"))
+        self.assertNotIn("Post 2", page)
+
+    def test_autocomplete_ranks_with_one_query(self):
+        with (
+            mock.patch.object(self.client, "get_counts", wraps=self.client.get_counts) as counts,
+            mock.patch.object(self.client, "get_post_views") as single,
+        ):
+            completions = self.context.autocomplete.complete(self.site, "post", limit=3)
+        self.assertEqual(counts.call_count, 1)
+        single.assert_not_called()
+        self.assertEqual([c.item.id for c in completions], [p.id for p in self.posts[:2:-1]])
+
+    def test_concurrent_queries_share_the_cache(self):
+        ids = [post.id for post in self.posts]
+        expected = list(range(len(self.posts)))
+        results, errors = [], []
+
+        def query():
+            try:
+                for _ in range(50):
+                    results.append(self.client.get_posts_views(ids))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 400)
+        self.assertTrue(all(result == expected for result in results))
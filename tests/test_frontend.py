@@ -0,0 +1,81 @@
+import socket
+from unittest import mock
+
+from cms.models import Comment
+from cms.web import frontend
+from cms.web.frontend import FrontendServer
+from tests.support import ContextTestCase, ServerThread
+
+
+class FrontendConditionalGetTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+        self.post = self.add_post(self.site, title="Um post", text="Algum texto. " * 2000)
+        self.web = self.enterContext(ServerThread(FrontendServer(self.context, port=0)))
+        self.post_path = f"/{self.site.get_domain()}/posts/{self.post.id}"
+
+    def get(self, path: str, **headers):
+        return self.web.request("GET", path, headers=headers)
+
+    def test_matching_etag_gets_304(self):
+        response, body = self.get(self.post_path)
+        self.assertEqual(response.status, 200)
+        etag = response.getheader("ETag")
+        self.assertIn(frontend.BOOT_ID, etag)
+        self.assertIn(b"Algum texto.", body)
+
+        response, body = self.get(self.post_path, **{"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("ETag"), etag)
+
+        response, _ = self.get(
+            self.post_path, **{"If-Modified-Since": response.getheader("Last-Modified")}
+        )
+        self.assertEqual(response.status, 304)
+
+    def test_new_comment_changes_the_etag(self):
+        response, _ = self.get(self.post_path)
+        etag = response.getheader("ETag")
+        self.context.comment_repo.add_comment(
+            Comment(post=self.post, commenter=self.owner, body="Primeiro!")
+        )
+
+        response, body = self.get(self.post_path, **{"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader("ETag"), etag)
+        self.assertIn(b"Primeiro!", body)
+
+    def test_etag_from_another_process_does_not_match(self):
+        with mock.patch.object(frontend, "BOOT_ID", "00000000"):
+            response, _ = self.get(self.post_path)
+            old_etag = response.getheader("ETag")
+
+        # mesmo post, versão e comentários, mas outro processo: a página é enviada
+        response, _ = self.get(self.post_path, **{"If-None-Match": old_etag})
+        self.assertEqual(response.status, 200)
+
+    def test_front_page_gets_304(self):
+        path = f"/{self.site.get_domain()}/"
+        response, _ = self.get(path)
+        response, body = self.get(path, **{"If-None-Match": response.getheader("ETag")})
+        self.assertEqual((response.status, body), (304, b""))
+
+    def test_http_10_streamed_page_closes_the_connection(self):
+        request = (
+            f"GET {self.post_path} HTTP/1.0\r\nHost: localhost\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode()
+        with socket.create_connection((self.web.server.host, self.web.server.port), 5) as sock:
+            sock.sendall(request)
+            received = b""
+            # sem Content-Length, o fim do corpo é o fechamento: recv devolve b""
+            while chunk := sock.recv(65536):
+                received += chunk
+
+        head, _, body = received.partition(b"\r\n\r\n")
+        self.assertIn(b"Connection: close", head)
+        self.assertNotIn(b"Transfer-Encoding", head)
+        self.assertTrue(body.rstrip().endswith(b"</html>"))
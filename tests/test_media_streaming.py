@@ -0,0 +1,112 @@
+import os
+import time
+from pathlib import Path
+
+from cms.models import MediaFile, MediaType
+from cms.web.http_server import HttpServer, Request, Response
+from cms.web.media_streaming import MediaStreamer, OpenFileCache
+from tests.support import ContextTestCase, ServerThread
+
+
+class _MediaServer(HttpServer):
+    """serve uma única mídia em qualquer caminho, pelo MediaStreamer."""
+
+    def __init__(self, streamer: MediaStreamer, media: MediaFile):
+        super().__init__(port=0)
+        self.streamer = streamer
+        self.media = media
+
+    async def dispatch(self, request: Request) -> Response:
+        return self.streamer.serve(request, self.media)
+
+
+class MediaStreamingTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = self.add_user("dono")
+        site = self.add_site(owner)
+        self.data = os.urandom(256 * 1024)
+        path = Path(self.tmp.name, "video.mp4")
+        path.write_bytes(self.data)
+        self.media = MediaFile(
+            uploader=owner,
+            filename="video.mp4",
+            path=path,
+            media_type=MediaType.VIDEO,
+            site=site,
+            width=None,
+            height=None,
+            duration=None,
+            content_hash="abc123",
+        )
+        self.files = OpenFileCache(max_open=2)
+        self.addCleanup(self.files.clear)
+        self.web = self.enterContext(ServerThread(_MediaServer(MediaStreamer(self.files), self.media)))
+
+    def get(self, **headers):
+        return self.web.request("GET", "/video", headers=headers)
+
+    def test_byte_ranges(self):
+        size = len(self.data)
+        cases = {
+            "bytes=0-99": (0, 100),
+            "bytes=1000-": (1000, size),
+            "bytes=-500": (size - 500, size),
+            f"bytes=100-{size * 2}": (100, size),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response, body = self.get(Range=header)
+                self.assertEqual(response.status, 206)
+                self.assertEqual(response.getheader("Content-Range"), f"bytes {start}-{end - 1}/{size}")
+                self.assertEqual(int(response.getheader("Content-Length")), end - start)
+                self.assertEqual(body, self.data[start:end])
+
+    def test_unsatisfiable_range_gets_416(self):
+        for header in (f"bytes={len(self.data)}-", "bytes=-0"):
+            with self.subTest(range=header):
+                response, body = self.get(Range=header)
+                self.assertEqual(response.status, 416)
+                self.assertEqual(response.getheader("Content-Range"), f"bytes */{len(self.data)}")
+                self.assertEqual(body, b"")
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        response, body = self.get(Range="bytes=0-9", **{"If-Range": '"outra-versao"'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.data)
+
+        response, body = self.get(Range="bytes=0-9", **{"If-Range": '"abc123"'})
+        self.assertEqual((response.status, body), (206, self.data[:10]))
+
+    def test_leases_are_released_after_each_response(self):
+        self.get()
+        self.get(Range="bytes=0-9")
+        self.get(Range="bytes=999999999-")
+        self.get(**{"If-None-Match": '"abc123"'})
+        self.web.request("HEAD", "/video")
+
+        # o servidor solta o arquivo depois do drain, que pode terminar após o cliente ler o corpo
+        entry = self.files.acquire(Path(self.media.path))
+        self.addCleanup(self.files.release, entry)
+        deadline = time.monotonic() + 2
+        while entry.leases > 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(entry.leases, 1)
+        self.assertEqual(len(self.files), 1)
+
+    def test_evicted_file_stays_open_until_released(self):
+        leased = self.files.acquire(Path(self.media.path))
+        for name in ("a.bin", "b.bin"):
+            other = Path(self.tmp.name, name)
+            other.write_bytes(b"x")
+            self.files.release(self.files.acquire(other))
+
+        # saiu do cache, mas uma resposta ainda envia o arquivo
+        self.assertTrue(leased.evicted)
+        self.assertFalse(leased.file.closed)
+        self.files.release(leased)
+        self.assertTrue(leased.file.closed)
+
+    def test_streamer_keeps_the_given_cache_even_when_empty(self):
+        files = OpenFileCache(immutable_root=Path(self.tmp.name))
+        self.assertIs(MediaStreamer(files).files, files)
@@ -0,0 +1,91 @@
+import threading
+from datetime import datetime, timedelta
+
+from cms.events import Observer
+from cms.services.site_template import SiteTemplateCache
+from tests.support import ContextTestCase
+
+
+class _Recorder(Observer):
+    def __init__(self):
+        self.threads: list[str] = []
+        self.published = threading.Event()
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        self.threads.append(threading.current_thread().name)
+        self.published.set()
+
+
+class _InvalidatingRepo:
+    """repositório que invalida o cache no meio da renderização, como o agendador faria."""
+
+    def __init__(self, post_repo):
+        self.post_repo = post_repo
+        self.cache: SiteTemplateCache | None = None
+
+    def get_site_posts(self, site):
+        posts = self.post_repo.get_site_posts(site)
+        self.cache.invalidate(site)
+        return posts
+
+    def __getattr__(self, name):
+        return getattr(self.post_repo, name)
+
+
+class SchedulerTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+
+    def test_publishes_on_scheduler_thread_and_refreshes_front_page(self):
+        recorder = _Recorder()
+        self.context.event_manager.subscribe("POST_PUBLISHED", recorder)
+        self.add_post(self.site, title="Já publicado")
+        self.assertNotIn("Agendado", self.context.template_cache.render(self.site))
+
+        scheduler = self.context.scheduler.start()
+        self.addCleanup(scheduler.stop)
+        post = self.add_post(
+            self.site, title="Agendado", scheduled_to=datetime.now() + timedelta(milliseconds=200)
+        )
+        self.assertFalse(self.context.post_repo.is_published(post))
+
+        self.assertTrue(recorder.published.wait(5))
+        self.assertIn("cms-scheduler", recorder.threads)
+        self.assertTrue(self.context.post_repo.is_published(post))
+        self.assertIn("Agendado", self.context.template_cache.render(self.site))
+
+    def test_reads_while_scheduler_publishes(self):
+        scheduler = self.context.scheduler.start()
+        self.addCleanup(scheduler.stop)
+        due = datetime.now() + timedelta(milliseconds=100)
+        posts = [self.build_post(self.site, f"Post {i}", scheduled_to=due) for i in range(300)]
+        self.context.post_repo.add_posts(posts)
+
+        errors: list[Exception] = []
+
+        def read():
+            try:
+                while len(self.context.post_repo.get_site_posts(self.site)) < len(posts):
+                    self.context.post_repo.is_published(posts[-1])
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join(10)
+        self.assertEqual(errors, [])
+
+    def test_page_rendered_during_invalidation_is_not_cached(self):
+        repo = _InvalidatingRepo(self.context.post_repo)
+        cache = repo.cache = SiteTemplateCache(repo, self.context.analytics_repo)
+        self.add_post(self.site, title="Primeiro")
+        cache.render(self.site)
+
+        # este cache não ouve eventos: só mostra o post novo se a página não ficou guardada
+        repo.cache = SiteTemplateCache(self.context.post_repo, self.context.analytics_repo)
+        self.add_post(self.site, title="Segundo")
+        self.assertIn("Segundo", cache.render(self.site))
@@ -0,0 +1,179 @@
+from pathlib import Path
+from unittest import mock
+
+from cms.exceptions import SocialPublishError
+from cms.models import PostAction
+from cms.services.social_media import SocialMedia
+from cms.services.social_publisher import (
+    JOB_FAILED,
+    HttpSocialClient,
+    RateLimit,
+    ShareQueue,
+    SocialPlatformClient,
+    SocialPublisher,
+)
+from cms.web.social_stub import SocialPlatformStub
+from tests.support import ContextTestCase, ServerThread
+
+TWITTER_ONLY = [SocialMedia.TWITTER]
+
+
+class _BrokenClient(SocialPlatformClient):
+    """cliente plugável com bug: levanta algo que não é SocialPublishError."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def publish(self, platform, jobs):
+        self.calls += 1
+        raise RuntimeError("bug no cliente")
+
+
+class _OkClient(SocialPlatformClient):
+    def publish(self, platform, jobs):
+        return [f"ok-{job.id}" for job in jobs]
+
+
+class SocialPublisherTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+        self.posts = [self.add_post(self.site, title=f"Post {i}") for i in range(3)]
+        # backoff de milissegundos para as novas tentativas não atrasarem os testes
+        patcher = mock.patch("cms.services.social_publisher.BACKOFF_BASE", 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_stub(self, **options) -> tuple[SocialPlatformStub, HttpSocialClient]:
+        stub = SocialPlatformStub(port=0, seed=1, **options)
+        self.enterContext(ServerThread(stub))
+        client = HttpSocialClient(f"http://{stub.host}:{stub.port}", timeout=5)
+        self.addCleanup(client.close)
+        return stub, client
+
+    def run_publisher(self, publisher: SocialPublisher, timeout: float = 10):
+        publisher.start()
+        try:
+            self.assertTrue(publisher.queue.wait_until_drained(timeout))
+        finally:
+            publisher.stop()
+
+    def test_rate_limited_batch_raises_with_retry_after(self):
+        stub, client = self.start_stub(per_second=1, burst=2)
+        queue = ShareQueue()
+        jobs = queue.add(
+            (post.id, SocialMedia.TWITTER, "pt-br", f"texto {post.id}", 0) for post in self.posts
+        )
+
+        with self.assertRaises(SocialPublishError) as raised:
+            client.publish(SocialMedia.TWITTER, jobs)
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+        self.assertEqual(stub.published["twitter"], [])
+
+    def test_rate_limit_waits_without_spending_attempts(self):
+        stub, client = self.start_stub(per_second=2, burst=2)
+        limits = {SocialMedia.TWITTER: RateLimit(per_second=100, burst=100, batch_size=2)}
+        # com uma tentativa só, um 429 contado como tentativa faria o job falhar
+        publisher = SocialPublisher(self.context, client, limits=limits, max_attempts=1)
+        publisher.enqueue_posts(self.posts, TWITTER_ONLY)
+
+        self.run_publisher(publisher)
+        self.assertEqual(len(stub.published["twitter"]), len(self.posts))
+        self.assertEqual(publisher.queue.failed_jobs(), [])
+
+    def test_retries_with_backoff_until_max_attempts(self):
+        _, client = self.start_stub(failure_rate=1.0)
+        publisher = SocialPublisher(self.context, client, max_attempts=3)
+        publisher.enqueue_posts(self.posts[:1], TWITTER_ONLY)
+
+        self.run_publisher(publisher)
+        [job] = publisher.queue.failed_jobs()
+        self.assertEqual(job.status, JOB_FAILED)
+        self.assertEqual(job.attempts, 3)
+
+    def test_unexpected_client_error_fails_the_batch(self):
+        client = _BrokenClient()
+        publisher = SocialPublisher(self.context, client, max_attempts=2)
+        publisher.enqueue_posts(self.posts[:1], TWITTER_ONLY)
+
+        self.run_publisher(publisher)
+        [job] = publisher.queue.failed_jobs()
+        self.assertIn("bug no cliente", job.error)
+        self.assertEqual(client.calls, 2)
+
+    def test_shares_are_logged_in_analytics(self):
+        stub, client = self.start_stub()
+        publisher = SocialPublisher(self.context, client)
+        publisher.enqueue_posts(self.posts, TWITTER_ONLY)
+
+        self.run_publisher(publisher)
+        entries = [
+            entry for entry in self.context.analytics_repo.iter_entries()
+            if getattr(entry, "action", None) == PostAction.SHARE
+        ]
+        self.assertEqual(len(entries), len(self.posts))
+        self.assertEqual(
+            {entry.metadata["external_id"] for entry in entries},
+            {f"twitter-{item['id']}" for item in stub.published["twitter"]},
+        )
+        for post in self.posts:
+            self.assertEqual(self.context.analytics_repo.get_post_shares(post.id), 1)
+
+    def test_analytics_failure_is_reported_without_killing_the_worker(self):
+        publisher = SocialPublisher(self.context, _OkClient())
+        publisher.enqueue_posts(self.posts, TWITTER_ONLY)
+
+        analytics = self.context.analytics_repo
+        with (
+            mock.patch.object(analytics, "log_many", side_effect=OSError("pipe fechado")),
+            mock.patch.object(analytics, "log", side_effect=OSError("pipe fechado")),
+        ):
+            self.run_publisher(publisher)
+        self.assertEqual(len(publisher.unlogged), len(self.posts))
+        self.assertEqual(publisher.queue.pending_count(), 0)
+
+
+class ShareQueueJournalTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = Path(self.tmp.name, "fila.ndjson")
+
+    def add_jobs(self, queue: ShareQueue, post_ids):
+        return queue.add(
+            (post_id, SocialMedia.TWITTER, "pt-br", f"texto {post_id}", 0) for post_id in post_ids
+        )
+
+    def test_replay_after_crash_keeps_pending_and_skips_done(self):
+        queue = ShareQueue(self.path)
+        self.add_jobs(queue, [1, 2, 3])
+        jobs = queue.take(SocialMedia.TWITTER, 3, timeout=1)
+        queue.complete(jobs[0], "twitter-1")
+        queue.retry(jobs[1], 0, "503")
+        queue.close()
+        # queda no meio de uma escrita: a última linha fica cortada
+        with open(self.path, "a", encoding="utf-8") as journal:
+            journal.write('{"op": "done", "id": 3, "exter')
+
+        replayed = ShareQueue(self.path)
+        self.addCleanup(replayed.close)
+        pending = replayed.take(SocialMedia.TWITTER, 10, timeout=1)
+        self.assertEqual(sorted(job.post_id for job in pending), [2, 3])
+        self.assertEqual(next(job for job in pending if job.post_id == 2).attempts, 1)
+
+        # ids novos não colidem com os do diário
+        [new_job] = self.add_jobs(replayed, [4])
+        self.assertGreater(new_job.id, max(job.id for job in pending))
+
+    def test_known_keys_are_not_enqueued_again(self):
+        queue = ShareQueue(self.path)
+        [job] = self.add_jobs(queue, [1])
+        queue.complete(queue.take(SocialMedia.TWITTER, 1, timeout=1)[0], "twitter-1")
+        self.assertEqual(self.add_jobs(queue, [1]), [])
+        queue.close()
+
+        replayed = ShareQueue(self.path)
+        self.addCleanup(replayed.close)
+        self.assertEqual(self.add_jobs(replayed, [1]), [])
+        self.assertEqual([job.post_id for job in self.add_jobs(replayed, [1, 2])], [2])
+        self.assertEqual(replayed.pending_count(), 1)
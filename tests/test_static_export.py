@@ -0,0 +1,47 @@
+from pathlib import Path
+from unittest import mock
+
+from cms.models import Comment, Content
+from cms.services.static_export import StaticSiteExporter
+from tests.support import ContextTestCase
+
+
+class StaticExportTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+        self.posts = [self.add_post(self.site, title=f"Post {i}") for i in range(4)]
+        self.output = Path(self.tmp.name, "public")
+
+    def export(self):
+        # como no menu do site: um exportador novo a cada exportação
+        return StaticSiteExporter(self.context, self.output, workers=1).export(self.site)
+
+    def test_unchanged_posts_are_skipped_without_rendering(self):
+        first = self.export()
+        self.assertEqual(first.rendered_posts, len(self.posts))
+
+        with (
+            mock.patch.object(Content, "render_body_html") as render,
+            mock.patch.object(Content, "iter_body_html") as iterate,
+        ):
+            second = self.export()
+        render.assert_not_called()
+        iterate.assert_not_called()
+        self.assertEqual((second.rendered_posts, second.skipped_posts), (0, len(self.posts)))
+        self.assertEqual(second.written_pages, 0)
+
+    def test_changed_posts_are_rendered_again(self):
+        self.export()
+        commented, touched = self.posts[0], self.posts[1]
+        self.context.comment_repo.add_comment(
+            Comment(post=commented, commenter=self.owner, body="Boa!")
+        )
+        touched.touch()
+
+        result = self.export()
+        self.assertEqual(result.rendered_posts, 2)
+        self.assertEqual(result.skipped_posts, len(self.posts) - 2)
+        page = (self.output / self.site.get_domain() / "posts" / str(commented.id) / "index.html")
+        self.assertIn("Boa!", page.read_text(encoding="utf-8"))
@@ -0,0 +1,87 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cms.exceptions import QuotaExceededError
+from cms.services.storage_quota import StorageAccounting, StorageQuota
+from cms.web.write_api import WriteApiServer
+from tests.support import ContextTestCase, ServerThread, png_bytes
+
+
+class StorageReservationTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.site = self.add_site(self.add_user("dono"))
+
+    def test_concurrent_reservations_do_not_exceed_quota(self):
+        accounting = StorageAccounting(StorageQuota(max_bytes=100, max_files=None))
+
+        for _ in range(50):
+            barrier = threading.Barrier(2)
+            reservations = []
+            refused = []
+
+            def reserve():
+                barrier.wait()
+                try:
+                    reservations.append(accounting.reserve(self.site, 60))
+                except QuotaExceededError as e:
+                    refused.append(e)
+
+            threads = [threading.Thread(target=reserve) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual((len(reservations), len(refused)), (1, 1))
+            # solta a reserva: a próxima rodada começa com o site vazio
+            reservations[0].release()
+
+        accounting.reserve(self.site, 100).release()
+
+    def test_reserved_space_counts_until_released(self):
+        accounting = StorageAccounting(StorageQuota(max_bytes=None, max_files=1))
+
+        with accounting.reserve(self.site, 10):
+            with self.assertRaises(QuotaExceededError):
+                accounting.check(self.site, 10)
+        accounting.check(self.site, 10)
+
+
+class ConcurrentUploadQuotaTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+
+        self.import_root = Path(self.tmp.name, "importar")
+        self.import_root.mkdir()
+        server = WriteApiServer(self.context, port=0, workers=4, import_root=self.import_root)
+        self.api = self.enterContext(ServerThread(server))
+
+    def test_concurrent_uploads_over_quota(self):
+        sizes = []
+        for name, width in (("a.png", 40), ("b.png", 41)):
+            data = png_bytes(width, width)
+            (self.import_root / name).write_bytes(data)
+            sizes.append(len(data))
+        # cada arquivo cabe sozinho, os dois juntos não
+        self.context.storage_accounting.set_quota(
+            self.site, StorageQuota(max_bytes=sum(sizes) - 1, max_files=None)
+        )
+
+        def upload(name: str) -> int:
+            status, _ = self.api.post_json(
+                "/api/media", {"site_id": self.site.id, "path": name}, self.owner
+            )
+            return status
+
+        with ThreadPoolExecutor(2) as pool:
+            statuses = sorted(pool.map(upload, ("a.png", "b.png")))
+
+        self.assertEqual(statuses, [201, 507])
+        medias = self.context.media_repo.get_site_medias(self.site)
+        self.assertEqual(len(medias), 1)
+        usage = self.context.storage_accounting.usage(self.site)
+        self.assertEqual((usage.bytes, usage.count), (medias[0].size, 1))
@@ -0,0 +1,141 @@
+import threading
+from pathlib import Path
+from unittest import mock
+
+from cms.events import Observer
+from cms.exceptions import LanguageError
+from cms.services.post_translator import PostTranslator
+from cms.services.translation import (
+    BatchTranslator,
+    DictionaryTranslationEngine,
+    TranslationMemory,
+)
+from tests.support import ContextTestCase
+
+GLOSSARY = {
+    ("pt-br", "en-us"): {
+        "olá mundo": "hello world",
+        "bom dia": "good morning",
+        "um texto padrão": "a standard text",
+        "gato": "cat",
+        "cachorro": "dog",
+        "peixe": "fish",
+    }
+}
+
+
+class _CountingEngine(DictionaryTranslationEngine):
+    """glossário que registra os segmentos recebidos e recusa os de `failing`."""
+
+    def __init__(self, failing: set[str] = frozenset()):
+        super().__init__(GLOSSARY)
+        self.failing = failing
+        self.texts: list[str] = []
+        self.__lock = threading.Lock()
+
+    def translate(self, texts, source, target):
+        with self.__lock:
+            self.texts.extend(texts)
+        if self.failing.intersection(texts):
+            raise LanguageError("Motor fora do ar.")
+        return super().translate(texts, source, target)
+
+
+class _EventRecorder(Observer):
+    def __init__(self):
+        self.events: list[tuple[str, dict]] = []
+
+    def update(self, event_type: str, *args, **kwargs) -> None:
+        self.events.append((event_type, kwargs))
+
+
+class TranslationTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.site = self.add_site(self.owner)
+        self.english = self.context.lang_service.get_language_by_code("en-us")
+        self.memory_path = Path(self.tmp.name, "tm.ndjson")
+
+    def translator(self, engine, memory=None, **options) -> BatchTranslator:
+        memory = memory if memory is not None else TranslationMemory()
+        self.addCleanup(memory.close)
+        return BatchTranslator(self.context, engine, memory, workers=2, **options)
+
+    def test_memory_is_reused_across_posts_and_runs(self):
+        first = self.add_post(self.site, title="Bom dia", text="Um texto padrão")
+        engine = _CountingEngine()
+        summary = self.translator(engine, TranslationMemory(self.memory_path)).translate_posts(
+            [first], self.english
+        )
+        self.assertEqual((summary.translated, summary.engine_segments), (1, 2))
+        self.assertEqual(first.get_content_by_language(self.english).title, "good morning")
+
+        # outra execução: a memória é relida do arquivo e nada vai ao motor
+        second = self.add_post(self.site, title="Bom dia", text="Um texto padrão")
+        engine = _CountingEngine()
+        memory = TranslationMemory(self.memory_path)
+        self.assertEqual(len(memory), 2)
+        summary = self.translator(engine, memory).translate_posts([second], self.english)
+        self.assertEqual(engine.texts, [])
+        self.assertEqual((summary.translated, summary.reused), (1, 2))
+        self.assertEqual(second.get_content_by_language(self.english).body[0].text, "a standard text")
+
+    def test_repeated_segments_go_to_the_engine_once(self):
+        posts = [self.add_post(self.site, title=f"Gato {i}", text="Olá mundo") for i in range(5)]
+        engine = _CountingEngine()
+
+        summary = self.translator(engine).translate_posts(posts, self.english)
+        self.assertEqual(engine.texts.count("Olá mundo"), 1)
+        self.assertEqual(summary.translated, 5)
+        self.assertEqual(summary.engine_segments, 6)
+        self.assertEqual(summary.reused, 4)
+
+    def test_failing_chunk_only_fails_posts_that_need_it(self):
+        ok = self.add_post(self.site, title="Gato", text="Olá mundo")
+        broken = self.add_post(self.site, title="Cachorro", text="Peixe")
+        shared = self.add_post(self.site, title="Gato", text="Peixe")
+        engine = _CountingEngine(failing={"Peixe"})
+
+        summary = self.translator(engine, chunk_size=1).translate_posts(
+            [ok, broken, shared], self.english
+        )
+        self.assertEqual(summary.translated, 1)
+        self.assertEqual(sorted(post_id for post_id, _ in summary.failed), [broken.id, shared.id])
+        self.assertTrue(ok.has_language(self.english))
+        self.assertFalse(broken.has_language(self.english))
+        self.assertFalse(shared.has_language(self.english))
+
+    def test_batch_reaches_search_and_autocomplete_with_one_event(self):
+        posts = [self.add_post(self.site, title="Gato", text="Bom dia"),
+                 self.add_post(self.site, title="Cachorro", text="Olá mundo")]
+        recorder = _EventRecorder()
+        for event_type in ("POST_CONTENT_ADDED", "POSTS_CONTENT_ADDED"):
+            self.context.event_manager.subscribe(event_type, recorder)
+
+        self.translator(_CountingEngine()).translate_posts(posts, self.english)
+        self.assertEqual([event for event, _ in recorder.events], ["POSTS_CONTENT_ADDED"])
+
+        results = self.context.search_index.search(self.site, "morning", self.english)
+        self.assertEqual([result.post.id for result in results], [posts[0].id])
+        completions = self.context.autocomplete.complete(self.site, "do")
+        self.assertEqual([completion.item.id for completion in completions], [posts[1].id])
+
+    def test_interactive_translation_goes_through_the_repository(self):
+        post = self.add_post(self.site, title="Gato", text="Bom dia")
+        recorder = _EventRecorder()
+        self.context.event_manager.subscribe("POST_CONTENT_ADDED", recorder)
+
+        with (
+            mock.patch.object(
+                self.context.lang_service, "select_language", return_value=self.english
+            ),
+            mock.patch("builtins.input", side_effect=["Cat", "Good morning", ""]),
+            mock.patch("builtins.print"),
+        ):
+            PostTranslator(post).translate()
+
+        [(event, kwargs)] = recorder.events
+        self.assertIs(kwargs["post"], post)
+        self.assertEqual(kwargs["language"], self.english)
+        self.assertEqual(self.context.search_index.search(self.site, "cat")[0].post.id, post.id)
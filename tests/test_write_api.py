@@ -0,0 +1,67 @@
+from pathlib import Path
+
+from cms.web.write_api import WriteApiServer
+from tests.support import ContextTestCase, ServerThread, png_bytes
+
+
+class WriteApiTest(ContextTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.add_user("dono")
+        self.manager = self.add_user("gerente")
+        self.reader = self.add_user("leitor")
+        self.site = self.add_site(self.owner, self.manager)
+        self.post = self.add_post(self.site)
+
+        self.import_root = Path(self.tmp.name, "importar")
+        self.import_root.mkdir()
+        server = WriteApiServer(self.context, port=0, workers=2, import_root=self.import_root)
+        self.api = self.enterContext(ServerThread(server))
+
+    def test_only_owner_grants_permissions(self):
+        payload = {"site_id": self.site.id, "user_id": self.reader.id}
+
+        status, _ = self.api.post_json("/api/permissions", payload, self.manager)
+        self.assertEqual(status, 403)
+        self.assertFalse(self.context.permission_repo.has_permission(self.reader, self.site))
+
+        status, _ = self.api.post_json("/api/permissions", payload, self.owner)
+        self.assertEqual(status, 201)
+        self.assertTrue(self.context.permission_repo.has_permission(self.reader, self.site))
+
+    def test_readers_log_only_reader_actions(self):
+        events = [
+            {"action": "view", "post_id": self.post.id},
+            {"action": "share", "post_id": self.post.id},
+            {"action": "access", "site_id": self.site.id},
+            {"action": "upload_media", "site_id": self.site.id},
+        ]
+
+        status, body = self.api.post_json("/api/analytics/batch", {"events": events}, self.reader)
+        self.assertEqual(status, 200)
+        self.assertEqual([r["ok"] for r in body["results"]], [True, False, True, False])
+
+        status, body = self.api.post_json("/api/analytics/batch", {"events": events}, self.manager)
+        self.assertEqual(body["created"], len(events))
+
+    def test_media_path_must_exist_inside_import_root(self):
+        outside = Path(self.tmp.name, "fora.png")
+        outside.write_bytes(png_bytes())
+
+        for path in ("sumiu.png", "../fora.png"):
+            with self.subTest(path=path):
+                status, _ = self.api.post_json(
+                    "/api/media", {"site_id": self.site.id, "path": path}, self.manager
+                )
+                self.assertIn(status, (400, 403))
+        self.assertEqual(self.context.media_repo.get_site_medias(self.site), [])
+
+        (self.import_root / "foto.png").write_bytes(png_bytes(3, 2))
+        status, body = self.api.post_json(
+            "/api/media", {"site_id": self.site.id, "path": "foto.png"}, self.manager
+        )
+        self.assertEqual(status, 201)
+        media = self.context.media_repo.get_media_by_id(body["id"])
+        self.assertTrue(media.path.is_file())
+        self.assertEqual((media.width, media.height), (3, 2))
+